@@ -0,0 +1,67 @@
+"""Microbenchmark for the resolution of the aliases.
+
+It compares :class:`copyrite.alias.AliasIndex` with the former
+approach of scanning every alias for every contribution, for
+an increasing number of aliases::
+
+    $ python benchmarks/bench_aliases.py --contributions 20000
+"""
+
+import argparse
+import time
+
+from copyrite import alias
+from copyrite import vcs
+
+
+def _aliases(count):
+    return [alias.Alias(b'Author %d' % index,
+                        [b'author%d@home.com' % index, b'author%d@work.com' % index])
+            for index in range(count)]
+
+
+def _contributions(count, authors):
+    return [vcs.Contribution(b'Author', b'author%d@work.com' % (index % authors),
+                             2000 + index % 20, '%040x' % index, 'file.py')
+            for index in range(count)]
+
+
+def _apply_linear(contributions, aliases):
+    transformed = []
+    for contribution in contributions:
+        for candidate_alias in aliases:
+            if contribution.mail in candidate_alias.mails:
+                contribution = contribution._replace(author=candidate_alias.name)
+                break
+        transformed.append(contribution)
+    return transformed
+
+
+def _apply_indexed(contributions, aliases):
+    return alias.apply_aliases(contributions, alias.AliasIndex(aliases))
+
+
+def _measure(apply, contributions, aliases):
+    start = time.perf_counter()
+    apply(contributions, aliases)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--contributions', type=int, default=20000)
+    parser.add_argument('--aliases', type=int, nargs='+', default=[10, 100, 1000, 5000])
+    args = parser.parse_args()
+
+    print('{:>8} {:>10} {:>10}'.format('aliases', 'linear', 'indexed'))
+    for count in args.aliases:
+        aliases = _aliases(count)
+        contributions = _contributions(args.contributions, count)
+        print('{:>8} {:>9.3f}s {:>9.3f}s'.format(
+            count,
+            _measure(_apply_linear, contributions, aliases),
+            _measure(_apply_indexed, contributions, aliases)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Microbenchmark for the parser of ``git log`` output.
+
+It compares the streaming parser used by the git backend with the
+former approach of reading the whole output, splitting it into lines
+and getting the year of each commit through ``datetime.strptime``.
+The log is synthetic and parsed from memory, so only the parsing
+is measured, not git itself::
+
+    $ python benchmarks/bench_log_parser.py --commits 1000000
+"""
+
+import argparse
+import datetime
+import io
+import time
+
+from copyrite.vcs import git
+
+
+def _streaming_log(commits):
+    line = b'John Doe\0john@doe.com\x00%d\x00%s\n'
+    return b''.join(line % (2000 + index % 20, b'%040x' % index)
+                    for index in range(commits))
+
+
+def _legacy_log(commits):
+    line = b'"John Doe##john@doe.com##%d-01-01##%s"\n'
+    return b''.join(line % (2000 + index % 20, b'%040x' % index)
+                    for index in range(commits))
+
+
+def _parse_streaming(raw):
+    backend = git.GitBackend()
+    stream = io.BufferedReader(io.BytesIO(raw))
+    # pylint: disable=protected-access
+    return sum(1 for line in git._iter_records(stream)
+               if backend._parse_log_line(line, 'file.py'))
+
+
+def _parse_legacy(raw):
+    count = 0
+    for line in raw.splitlines():
+        name, mail, date, change = line[1:-1].split(b'##')
+        year = datetime.datetime.strptime(date.decode(), "%Y-%m-%d").year
+        if git.base.Contribution(name, mail, year, change.decode(), 'file.py'):
+            count += 1
+    return count
+
+
+def _measure(name, parser, raw, commits):
+    start = time.perf_counter()
+    parsed = parser(raw)
+    elapsed = time.perf_counter() - start
+    assert parsed == commits
+    print('{:<10} {:>8.2f}s {:>12,.0f} commits/s'.format(name, elapsed, commits / elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--commits', type=int, default=1000000)
+    args = parser.parse_args()
+
+    _measure('streaming', _parse_streaming, _streaming_log(args.commits), args.commits)
+    _measure('legacy', _parse_legacy, _legacy_log(args.commits), args.commits)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+"""Benchmark suite, run over a synthetic git repository.
+
+It times the main steps of copyrite, from parsing the history of the
+files to writing their notices, and the whole command line end to end.
+The results can be saved as a JSON baseline, which later runs are
+compared against, failing if any benchmark became slower than the
+given tolerance::
+
+    $ python benchmarks/suite.py --save baseline.json
+    $ python benchmarks/suite.py --compare baseline.json --tolerance 0.2
+"""
+
+import argparse
+import collections
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from copyrite import alias
+from copyrite import cli
+from copyrite import copyrite
+from copyrite import span
+from copyrite.vcs import git
+
+import synthetic
+
+
+def _reset_caches():
+    # pylint: disable=protected-access
+    git._HISTORY_INDEXES.clear()
+    git._COMMIT_STATS.clear()
+
+
+def _timeit(function, repeat):
+    """Get the best time of *function*, out of *repeat* runs."""
+    best = float('inf')
+    for _ in range(repeat):
+        _reset_caches()
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _benchmarks(repository, filenames, end_to_end):
+    """Get the benchmarks to run, as a mapping of their names to functions."""
+    backend = git.IndexedGitBackend()
+    contributions = [contribution for filename in filenames
+                     for contribution in backend.file_contributions(filename, repository)]
+    mails = sorted({contribution.mail for contribution in contributions})
+    # Half of the authors are merged under the same alias.
+    aliases = [alias.Alias(b'Aliased', mails[::2], b'aliased@example.com')]
+    by_author = collections.defaultdict(list)
+    for contribution in contributions:
+        by_author[contribution.author].append(contribution)
+    spans = [item for author_contributions in by_author.values()
+             for item in copyrite.contribution_spans(author_contributions)]
+    headers = []
+    for filename in filenames:
+        with open(os.path.join(repository, filename), 'rb') as stream:
+            headers.append(stream.readlines())
+    notices = [span.format_span(item, '# Copyright (c) %s %s') + b'\n' for item in spans[:5]]
+
+    def _file_copyrights(backend_type):
+        def _run():
+            backend = backend_type()
+            for filename in filenames:
+                copyrite.file_copyrights(repository, filename, backend, 10, 1, aliases)
+        return _run
+
+    def _log_parsing():
+        backend = git.GitBackend()
+        for filename in filenames:
+            backend.file_contributions(filename, repository)
+
+    def _apply_aliases():
+        alias.apply_aliases(contributions, alias.AliasIndex(aliases))
+
+    def _spans():
+        for author_contributions in by_author.values():
+            for item in copyrite.contribution_spans(author_contributions):
+                span.format_span(item, '# Copyright (c) %s %s')
+
+    def _insert_copyrights():
+        for lines in headers:
+            cli.insert_copyrights(notices, lines, process_missing=True)
+
+    benchmarks = collections.OrderedDict([
+        ('file_copyrights[git]', _file_copyrights(git.GitBackend)),
+        ('file_copyrights[git-index]', _file_copyrights(git.IndexedGitBackend)),
+        ('file_copyrights[git-persistent]', _file_copyrights(git.PersistentGitBackend)),
+        ('git_log_parsing', _log_parsing),
+        ('apply_aliases', _apply_aliases),
+        ('contribution_spans+format_span', _spans),
+        ('insert_copyrights', _insert_copyrights),
+    ])
+    if sys.version_info >= (3, 7):
+        benchmarks['startup[copyrite.cli]'] = _startup
+    if end_to_end:
+        benchmarks['end_to_end[git-index]'] = lambda: _end_to_end(repository)
+    return benchmarks
+
+
+def _startup():
+    """Get how long importing the command line takes, as ``-X importtime`` reports it."""
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import copyrite.cli'],
+                             check=True, stderr=subprocess.PIPE)
+    last = process.stderr.decode().splitlines()[-1]
+    # The cumulative time of the last module, copyrite.cli, in microseconds.
+    return int(last.split('|')[1]) / 1e6
+
+
+def _end_to_end(repository):
+    with tempfile.TemporaryDirectory() as directory:
+        copy = os.path.join(directory, 'repository')
+        shutil.copytree(repository, copy)
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-m', 'copyrite.cli', '--backend-type', 'git-index',
+                        '--process-missing', 'true', '--jobs', '2', copy],
+                       check=True, stdout=subprocess.DEVNULL)
+        # Only the command line is timed, not the copy.
+        return time.perf_counter() - start
+
+
+def _compare(results, baseline, tolerance):
+    """Print the results next to the baseline, returning the regressed benchmarks."""
+    regressions = []
+    print('{:<34} {:>10} {:>10} {:>8}'.format('benchmark', 'baseline', 'current', 'ratio'))
+    for name, elapsed in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            print('{:<34} {:>10} {:>9.4f}s'.format(name, '-', elapsed))
+            continue
+        ratio = elapsed / previous if previous else float('inf')
+        marker = ' !' if ratio > 1 + tolerance else ''
+        print('{:<34} {:>9.4f}s {:>9.4f}s {:>7.2f}x{}'.format(
+            name, previous, elapsed, ratio, marker))
+        if marker:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repository', help='Use this repository, instead of generating one.')
+    parser.add_argument('--files', type=int, default=100)
+    parser.add_argument('--commits', type=int, default=2000)
+    parser.add_argument('--authors', type=int, default=30)
+    parser.add_argument('--renames', type=int, default=20)
+    parser.add_argument('--large-commits', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--sample', type=int, default=50,
+                        help='How many files are processed by each benchmark.')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-end-to-end', dest='end_to_end', action='store_false')
+    parser.add_argument('--save', help='Save the results as a baseline in this file.')
+    parser.add_argument('--compare', help='Compare the results with this baseline.')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='How much slower a benchmark can be than its baseline.')
+    args = parser.parse_args()
+
+    parameters = {name: getattr(args, name)
+                  for name in ('files', 'commits', 'authors', 'renames',
+                               'large_commits', 'seed', 'sample')}
+    with tempfile.TemporaryDirectory() as directory:
+        repository = args.repository
+        if repository is None:
+            repository = synthetic.generate(
+                os.path.join(directory, 'repository'), args.files, args.commits,
+                args.authors, args.renames, args.large_commits, args.seed)
+        repository = os.path.abspath(repository)
+        filenames = sorted(git.GitBackend().tracked_files(repository))[:args.sample]
+
+        results = collections.OrderedDict()
+        for name, function in _benchmarks(repository, filenames, args.end_to_end).items():
+            if name.startswith(('startup', 'end_to_end')):
+                # Timed by themselves, without the caches of this process.
+                results[name] = min(function() for _ in range(args.repeat))
+            else:
+                results[name] = _timeit(function, args.repeat)
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as stream:
+            baseline = json.load(stream)
+        if baseline['parameters'] != parameters:
+            print('The baseline was made with other parameters: %s' % baseline['parameters'])
+        regressions = _compare(results, baseline['results'], args.tolerance)
+    else:
+        for name, elapsed in results.items():
+            print('{:<34} {:>9.4f}s'.format(name, elapsed))
+
+    if args.save:
+        with open(args.save, 'w') as stream:
+            json.dump({'parameters': parameters, 'results': results}, stream, indent=2)
+
+    if regressions:
+        print('Slower than the baseline: %s' % ', '.join(regressions))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Generator of synthetic git repositories, for the benchmarks.
+
+The history is written with a single ``git fast-import``, so even
+repositories with tens of thousands of commits are generated in
+seconds. The same seed always gives the same repository::
+
+    $ python benchmarks/synthetic.py /tmp/repository --files 500 --commits 20000
+"""
+
+import argparse
+import os
+import random
+import subprocess
+
+
+_START = 946684800 # 2000-01-01
+_YEAR = 365 * 24 * 3600
+
+
+def _data(payload):
+    return b'data %d\n%s\n' % (len(payload), payload)
+
+
+def _history(files, commits, authors, renames, large_commits, seed):
+    """Generate the fast-import stream of the repository, in chunks."""
+    rng = random.Random(seed)
+    identities = [(b'Author %d' % index, b'author%d@example.com' % index)
+                  for index in range(authors)]
+    paths = ['pkg%d/module%d.py' % (index % 10, index) for index in range(files)]
+    contents = {path: [b'# %s\n' % path.encode()] for path in paths}
+    large = set(rng.sample(range(1, commits), min(large_commits, commits - 1)))
+    renamed = set(rng.sample(range(1, commits), min(renames, commits - 1)))
+
+    for index in range(commits):
+        name, mail = rng.choice(identities)
+        timestamp = _START + int(index * 20 * _YEAR / commits)
+        yield b'commit refs/heads/master\n'
+        yield b'author %s <%s> %d +0000\n' % (name, mail, timestamp)
+        yield b'committer %s <%s> %d +0000\n' % (name, mail, timestamp)
+        yield _data(b'commit %d' % index)
+
+        if index == 0:
+            touched = paths
+        elif index in large:
+            touched = rng.sample(paths, max(1, len(paths) // 2))
+        else:
+            touched = rng.sample(paths, min(len(paths), rng.randint(1, 3)))
+
+        if index in renamed:
+            old = rng.choice(paths)
+            new = old.replace('.py', '_r%d.py' % index)
+            yield b'R %s %s\n' % (old.encode(), new.encode())
+            paths[paths.index(old)] = new
+            contents[new] = contents.pop(old)
+            touched = [new if path == old else path for path in touched]
+
+        for path in touched:
+            lines = contents[path]
+            for _ in range(rng.randint(1, 20)):
+                lines.append(b'value_%d = %d\n' % (rng.randrange(10 ** 6), index))
+            if len(lines) > 5 and rng.random() < 0.3:
+                del lines[rng.randrange(1, len(lines))]
+            yield b'M 100644 inline %s\n' % path.encode()
+            yield _data(b''.join(lines))
+        yield b'\n'
+
+
+def generate(path, files=100, commits=1000, authors=20, renames=10,
+             large_commits=5, seed=0):
+    """Generate a repository in *path*, which must not exist yet."""
+    os.makedirs(path)
+    subprocess.run(['git', 'init', '-q'], cwd=path, check=True)
+    process = subprocess.Popen(['git', 'fast-import', '--quiet'], cwd=path,
+                               stdin=subprocess.PIPE)
+    for chunk in _history(files, commits, authors, renames, large_commits, seed):
+        process.stdin.write(chunk)
+    process.stdin.close()
+    if process.wait():
+        raise OSError('git fast-import failed')
+    subprocess.run(['git', 'checkout', '-q', '-f', 'master'], cwd=path, check=True)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path')
+    parser.add_argument('--files', type=int, default=100)
+    parser.add_argument('--commits', type=int, default=1000)
+    parser.add_argument('--authors', type=int, default=20)
+    parser.add_argument('--renames', type=int, default=10)
+    parser.add_argument('--large-commits', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    generate(args.path, args.files, args.commits, args.authors, args.renames,
+             args.large_commits, args.seed)
+
+
+if __name__ == '__main__':
+    main()
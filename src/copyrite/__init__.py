@@ -1,3 +1,4 @@
 """Copyrite - a tool for managing missing copyright notices in a project."""
 
-from .copyrite import file_copyrights
+from .copyrite import file_copyrights, afile_copyrights
+from .directory import iter_directory_copyrights
@@ -1,10 +1,13 @@
 """Manages aliases for different authors."""
 
 import collections
+import functools
+import itertools
+import os
 import typing
 
-import jsonschema
-
+from copyrite import mailmap as mailmap_module
+from copyrite import metrics
 from copyrite import vcs
 
 _AliasBase = collections.namedtuple('_AliasBase', 'name mails authoritative_mail')
@@ -79,41 +82,142 @@ class Alias(_AliasBase):
         return cls(encoded_name, encoded_mails, encoded_authoritative_mail)
 
 
-# pylint: disable=invalid-name
-_ContributionsIterableType = typing.Iterable[vcs.Contribution]
-_AliasContributionGroupType = typing.Dict[vcs.Contribution, Alias]
-# pylint: enable=invalid-name
+def _split_mail(mail):
+    """Split *mail* into its local part and its domain, for both str and bytes."""
+    separator = b'@' if isinstance(mail, bytes) else '@'
+    local, _, domain = mail.rpartition(separator)
+    return local, domain
+
 
+# The memos of the indexes which were unpickled in this process, by the
+# index they were copied from. The process engine sends a copy with each
+# task, and the copies which reach the same worker share the same memo.
+_MEMOS = {} # type: typing.Dict[typing.Tuple[int, int], dict]
+_TOKENS = itertools.count()
 
-def _find_proper_alias(aliases: typing.List[Alias],
-                       contribution: vcs.Contribution) -> typing.Optional[Alias]:
 
-    for candidate_alias in aliases:
-        if contribution.mail in candidate_alias.mails:
-            # Valid candidate
-            return candidate_alias
+def _is_wildcard(local) -> bool:
+    return local in (b'*', '*')
 
 
-def _applied_aliases(candidates: _AliasContributionGroupType) -> _ContributionsIterableType:
-    for contribution, alias in candidates.items():
-        if alias:
-            mail = alias.authoritative_mail or b''
-            yield contribution._replace(author=alias.name, mail=mail) # type: ignore
-        else:
-            yield contribution
+class AliasIndex:
+    """Compiled lookup of the alias of a mail.
+
+    The mails of the aliases are stored in a hash map, so a lookup
+    doesn't depend on how many aliases there are. A mail such as
+    ``*@company.com`` is a wildcard, which matches every mail of that
+    domain. The exact mails are tried first, then the wildcards.
+    If *ignore_case* is True, the mails are compared case-insensitively.
+    As with a list of aliases, the first alias which has a mail wins.
+
+    The identities can also be mapped by a *mailmap*, which is applied
+    before the aliases, as git would do. The result is memoised for
+    every identity, which are much fewer than the contributions.
+    The memo isn't pickled, but the copies of the same index share
+    their memo in each process, so each worker of the process engine
+    resolves an identity only once, instead of once for every file.
+    """
+
+    def __init__(self, aliases: typing.Iterable[Alias], ignore_case: bool = False,
+                 mailmap: typing.Optional[mailmap_module.Mailmap] = None) -> None:
+        self.ignore_case = ignore_case
+        self.mailmap = mailmap
+        self._resolved = {} # type: typing.Dict[typing.Tuple[typing.Any, typing.Any], tuple]
+        self._token = (os.getpid(), next(_TOKENS))
+        self._mails = {} # type: typing.Dict[typing.Any, Alias]
+        self._domains = {} # type: typing.Dict[typing.Any, Alias]
+        for candidate_alias in aliases:
+            for mail in candidate_alias.mails:
+                local, domain = _split_mail(self._normalise(mail))
+                if _is_wildcard(local):
+                    self._domains.setdefault(domain, candidate_alias)
+                else:
+                    self._mails.setdefault(self._normalise(mail), candidate_alias)
+
+    def _normalise(self, mail):
+        return mail.lower() if self.ignore_case else mail
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_resolved']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._resolved = _MEMOS.setdefault(self._token, {})
+
+    def find(self, mail) -> typing.Optional[Alias]:
+        """Get the alias of the given mail, if there is any."""
+        mail = self._normalise(mail)
+        try:
+            return self._mails[mail]
+        except KeyError:
+            pass
+        if self._domains:
+            return self._domains.get(_split_mail(mail)[1])
+        return None
+
+    def resolve(self, name, mail) -> tuple:
+        """Get the name and the mail under which the given identity contributes."""
+        key = (name, mail)
+        try:
+            return self._resolved[key]
+        except KeyError:
+            pass
+
+        resolved = key
+        if self.mailmap:
+            resolved = self.mailmap.resolve(name, mail)
+        found = self.find(resolved[1])
+        if found is None and resolved[1] != mail:
+            found = self.find(mail)
+        if found is not None:
+            resolved = (found.name, found.authoritative_mail or b'')
+        self._resolved[key] = resolved
+        return resolved
+
+    def __bool__(self):
+        return bool(self._mails or self._domains or self.mailmap)
+
+
+# pylint: disable=invalid-name
+_AliasesType = typing.Union[typing.List[Alias], AliasIndex]
+# pylint: enable=invalid-name
 
 
 def apply_aliases(contributions: typing.List[vcs.Contribution],
-                  aliases: typing.List[Alias]) -> typing.List[vcs.Contribution]:
+                  aliases: _AliasesType) -> typing.List[vcs.Contribution]:
     """Apply the aliases over the contributions.
 
     The function finds all contributions which can live under a given alias
-    and tries to apply the alias's information over them.
+    and tries to apply the alias's information over them. *aliases* can be
+    a list of aliases or, better when it is used for many files,
+    an :class:`AliasIndex` compiled from them.
     """
 
-    candidates = {contribution: _find_proper_alias(aliases, contribution)
-                  for contribution in contributions}
-    return list(_applied_aliases(candidates))
+    if not aliases:
+        return list(dict.fromkeys(contributions))
+    if not isinstance(aliases, AliasIndex):
+        aliases = AliasIndex(aliases)
+
+    with metrics.current().timer('aliases'):
+        candidates = {}
+        for contribution in contributions:
+            if contribution in candidates:
+                continue
+            name, mail = aliases.resolve(contribution.author, contribution.mail)
+            candidates[contribution] = contribution._replace(author=name, mail=mail) # type: ignore
+        return list(candidates.values())
+
+
+@functools.lru_cache(maxsize=None)
+def _alias_validator():
+    # jsonschema is slow to import and its validators are slow to build,
+    # so both are done only once, and only when there are aliases.
+    import jsonschema
+    validator_class = jsonschema.validators.validator_for(ALIAS_SCHEMA)
+    validator_class.check_schema(ALIAS_SCHEMA)
+    return validator_class(ALIAS_SCHEMA)
 
 
 def build_from_json(aliases):
@@ -121,5 +225,5 @@ def build_from_json(aliases):
 
     The structure should be valid according to the underlying schema.
     """
-    jsonschema.validate(aliases, ALIAS_SCHEMA)
+    _alias_validator().validate(aliases)
     return [Alias.from_keys(**alias) for alias in aliases]
@@ -1,23 +1,31 @@
 """Console API for copyrite."""
 
-import concurrent.futures
-import fnmatch
+import collections
 import json
 import os
+import shutil
+import tempfile
+import threading
+import time
+import typing
 
 import click
 
-from copyrite import file_copyrights
 from copyrite import alias
+from copyrite import discovery
+from copyrite import header
+from copyrite import mailmap as mailmap_module
+from copyrite import metrics
+from copyrite import significance as significance_policies
 from copyrite import span
 from copyrite.vcs import KNOWN_BACKENDS
 
+# The modules needed only by some commands or options, such as the
+# engines, the shards or the manifests, are imported where they are
+# used, so that a short run doesn't pay for them.
 
-_COPYRIGHT_HEADER_MARKS = [
-    b"# Copyright (c)",
-    b"# copyright ",
-    b"# Copyright ",
-]
+# The keys of copyrite.engine.ENGINES.
+_ENGINE_TYPES = ('process', 'asyncio')
 
 
 def _has_encoding_cookie(line):
@@ -33,22 +41,25 @@ def _has_non_ascii_characters(lines):
     return False
 
 
-def insert_copyrights(copyrights, lines, header_marks=None, process_missing=False):
+def insert_copyrights(copyrights, lines, header_marks=None, process_missing=False,
+                      style=header.HASH):
     """Insert the given copyrights into the known lines
 
     This operation will find the proper place where the copyrights
     can live, by replacing the current copyrights notices, if any.
     If *process_missing* is set to True, then the copyrights can
     be added, even if the lines don't contain any copyright notice.
-    It also handles the case of encoding cookies, if the copyrights
+    The notices are searched only in the header of the lines,
+    whose comments are in the given *style*. For Python files,
+    it also handles the case of encoding cookies, if the copyrights
     contain non ASCII characters.
     """
     if header_marks is None:
-        header_marks = _COPYRIGHT_HEADER_MARKS
+        header_marks = header.default_header_marks(style)
 
-    has_cookie = _has_encoding_cookie(lines[0])
-    copyright_indexes = [index for (index, line) in enumerate(lines)
-                         if any(line.startswith(header) for header in header_marks)]
+    has_cookie = style == header.HASH and _has_encoding_cookie(lines[0])
+    detector = header.detector(tuple(header_marks), style)
+    copyright_indexes = detector.find(lines)
     extraheader = []
 
     if not copyright_indexes:
@@ -62,8 +73,13 @@ def insert_copyrights(copyrights, lines, header_marks=None, process_missing=Fals
             lines = copyrights + lines
     else:
         index = copyright_indexes[0]
+        prefix = detector.continuation(lines)
+        if prefix is not None:
+            # The notices are inside a block comment, which they can't close.
+            copyrights = [header.continued_notice(notice, prefix, style)
+                          for notice in copyrights]
 
-        if _has_non_ascii_characters(copyrights):
+        if style == header.HASH and _has_non_ascii_characters(copyrights):
             if not has_cookie:
                 extraheader = [b"# -*- coding: utf-8 -*-\n"]
 
@@ -71,6 +87,86 @@ def insert_copyrights(copyrights, lines, header_marks=None, process_missing=Fals
     return extraheader + lines
 
 
+# How many bytes from the beginning of a file are searched for the
+# copyright notices. The window grows if the header goes beyond it.
+_HEADER_WINDOW = 16 * 1024
+
+
+def _read_header(stream, detector):
+    """Read the lines from the beginning of the file, which can hold the notices.
+
+    Only complete lines are returned, the rest of the file
+    is left in the stream, after the returned lines.
+    """
+    window = _HEADER_WINDOW
+    while True:
+        stream.seek(0)
+        head = stream.read(window)
+        lines = head.splitlines(keepends=True)
+        if len(head) < window:
+            # The whole file was read.
+            return lines
+
+        # The last line might be incomplete, leave it with the rest.
+        lines.pop()
+        if detector.header_length(lines) == len(lines):
+            # The header, with its notices, might continue after the window.
+            window *= 2
+            continue
+        stream.seek(sum(len(line) for line in lines))
+        return lines
+
+
+def write_copyrights(file_path, copyrights, header_marks=None, process_missing=False):
+    """Write the given copyrights into the file, returning True if it was changed.
+
+    Only the beginning of the file is read and processed with
+    :func:`insert_copyrights`, in the comment style of the file.
+    The file is written only if its notices changed, by replacing it
+    with a new file which holds the new notices, followed by the rest
+    of the old one.
+    """
+    style = header.comment_style(file_path)
+    if header_marks is None:
+        header_marks = header.default_header_marks(style)
+
+    with open(file_path, 'rb') as stream:
+        lines = _read_header(stream, header.detector(tuple(header_marks), style))
+        if not lines:
+            return False
+
+        new_lines = insert_copyrights(copyrights, lines,
+                                      process_missing=process_missing,
+                                      header_marks=header_marks,
+                                      style=style)
+        if new_lines == lines:
+            return False
+
+        directory = os.path.dirname(os.path.abspath(file_path))
+        with tempfile.NamedTemporaryFile(dir=directory, delete=False) as output:
+            try:
+                output.write(b"".join(new_lines))
+                shutil.copyfileobj(stream, output)
+                output.close()
+                shutil.copymode(file_path, output.name)
+                os.replace(output.name, file_path)
+            except BaseException:
+                os.unlink(output.name)
+                raise
+    return True
+
+
+def _patterns(patterns):
+    if isinstance(patterns, str):
+        return [patterns]
+    return patterns or []
+
+
+def _relative(filepath, directory):
+    # The same for every checkout and platform.
+    return os.path.relpath(filepath, directory).replace(os.sep, '/')
+
+
 def _write_directory_copyrights(contribution_threshold, change_threshold,
                                 backend, jobs,
                                 include, exclude,
@@ -78,54 +174,107 @@ def _write_directory_copyrights(contribution_threshold, change_threshold,
                                 process_missing,
                                 copyright_pattern,
                                 header_marks,
-                                directory):
-
-    def _write_to_file_cb(future):
-        nonlocal futures
-        nonlocal copyright_pattern
-        nonlocal header_marks
-
-        file_path = futures[future]
-        results = future.result()
-        copyrights = [span.format_span(item, copyright_pattern) + b"\n"
-                      for item in results]
-
-        with open(file_path, 'rb') as stream:
-            lines = stream.readlines()
-
-        if not lines:
+                                directory,
+                                state=None,
+                                engine_type='process',
+                                policy='combined',
+                                write_jobs=1,
+                                profile=False,
+                                partition=None,
+                                plan_stream=None):
+    from copyrite import engine
+    from copyrite import manifest as manifest_module
+    from copyrite import pipeline
+
+    def _format(file_path, results):
+        with metrics.current().timer('format'):
+            pattern = copyright_pattern or header.default_copyright_pattern(
+                header.comment_style(file_path))
+            copyrights = [span.format_span(item, pattern) + b"\n" for item in results]
+        write_stage.put(file_path, results, copyrights)
+
+    def _write(file_path, results, copyrights):
+        if plan_stream is not None:
+            line = manifest_module.dump_entry(manifest_module.Entry(
+                _relative(file_path, directory), results, copyrights))
+            with writes_lock:
+                plan_stream.write(line + "\n")
+                writes['planned'] += 1
             return
+        with metrics.current().timer('write'):
+            changed = write_copyrights(file_path, copyrights,
+                                       process_missing=process_missing,
+                                       header_marks=header_marks)
+        with writes_lock:
+            writes['written' if changed else 'unchanged'] += 1
+
+    def _computed_cb(file_path, results):
+        if state is not None:
+            state.update(file_path, directory, results)
+        format_stage.put(file_path, results)
+
+    def _files():
+        include_matcher = discovery.compile_patterns(_patterns(include))
+        exclude_matcher = discovery.compile_patterns(_patterns(exclude))
+        for filepath in discovery.iter_files(directory, backend,
+                                             include_matcher, exclude_matcher):
+            if partition is not None and not partition.owns(_relative(filepath, directory)):
+                continue
+            discovered['files'] += 1
+            if state is not None and not state.is_stale(filepath, directory):
+                # Nothing changed since the last run, reuse its results.
+                format_stage.put(filepath, state.spans(filepath, directory))
+                metrics.current().count('files_reused')
+                continue
+
+            dirpath, filename = os.path.split(filepath)
+            yield dirpath, filename, filepath
+
+    # Done before starting the workers, so that they can inherit
+    # whatever the backend had to precompute.
+    backend.prepare(directory)
+
+    # Only counted, so that the memory doesn't grow with the directory.
+    discovered = collections.Counter() # type: typing.Counter[str]
+    writes = collections.Counter() # type: typing.Counter[str]
+    writes_lock = threading.Lock()
+    executor = engine.ENGINES[engine_type](
+        jobs, (backend, change_threshold, contribution_threshold, aliases, policy),
+        profile=profile)
+    print("Start processing files..")
+    # discover -> compute the history -> format -> write, the last two
+    # in their own threads, so that the writes overlap with the history.
+    with pipeline.Stage(_write, write_jobs, name='write') as write_stage:
+        with pipeline.Stage(_format, name='format') as format_stage:
+            executor.run(_files(), _computed_cb)
+    print("Done!")
+    print("Fetched the line counts of %d contributions, %d were not needed."
+          % (executor.stats.fetched, executor.stats.skipped))
+    if plan_stream is not None:
+        print("Planned %d files." % writes['planned'])
+    else:
+        print("Wrote %d files, %d were already up to date."
+              % (writes['written'], writes['unchanged']))
 
-        lines = insert_copyrights(copyrights, lines,
-                                  process_missing=process_missing,
-                                  header_marks=header_marks)
-
-        with open(file_path, 'wb') as stream:
-            stream.write(b"".join(lines))
-
-    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
-        futures = {}
-        for dirpath, _, filenames in os.walk(directory):
-            for filename in filenames:
-                filepath = os.path.join(dirpath, filename)
+    run_metrics = metrics.current()
+    run_metrics.update(executor.metrics)
+    run_metrics.count('files', discovered['files'])
+    run_metrics.count('files_planned', writes['planned'])
+    run_metrics.count('files_written', writes['written'])
+    run_metrics.count('files_unchanged', writes['unchanged'])
 
-                if include and not fnmatch.fnmatch(filepath, include):
-                    continue
-                if exclude and fnmatch.fnmatch(filepath, exclude):
-                    continue
+    if state is not None:
+        state.retain_checked()
 
-                future = executor.submit(
-                    file_copyrights,
-                    dirpath, filename, backend,
-                    change_threshold,
-                    contribution_threshold,
-                    aliases)
-                future.add_done_callback(_write_to_file_cb)
-                futures[future] = filepath
 
-        print("Start processing files..")
-        concurrent.futures.wait(futures)
-        print("Done!")
+def _parse_shard(ctx, param, value): # pylint: disable=unused-argument
+    if value is None:
+        return None
+    from copyrite import sharding
+    try:
+        return sharding.parse(value)
+    except ValueError as exc:
+        raise click.BadParameter(str(exc))
 
 
 def _build_aliases_from_file(aliases):
@@ -134,69 +283,340 @@ def _build_aliases_from_file(aliases):
     return alias.build_from_json(content)
 
 
-@click.command()
-@click.option('--contribution-threshold', default=1,
-              help='Number of contributions an user should have in '
-                   'order to be considered')
-@click.option('--change-threshold', default=10,
-              help='Number of lines an user should have edited '
-                   'in a file in order for the contribution to be '
-                   'considered')
-@click.option('--backend-type', required=True,
-              type=click.Choice(KNOWN_BACKENDS.keys()))
-@click.option('--jobs', type=int, default=1,
-              help='Parallel jobs for processing the files')
-@click.option('--include', type=str, default='*.py',
-              help='Include only the files which are matched '
-                   'by this glob pattern.')
-@click.option('--exclude', type=str,
-              help='Exclude the files which are matched '
-                   'by this glob pattern. The exclusion '
-                   'is done on the included files.')
-@click.option('--aliases', type=click.File('r'),
-              help='File containing name aliases.')
-@click.option('--process-missing', type=bool, default=False,
-              help='Add a copyright notice to files which do not '
-                   'have them.')
-@click.option('--copyright-pattern', type=str,
-              default="# Copyright (c) %s %s",
-              help='The copyright pattern which will be placed on top '
-                   'of each file. It should accept two positional '
-                   'interpolation fields, using the old style mod '
-                   'formatting. The first field represents the contribution '
-                   'spans, while the second one represents the author of '
-                   'the contributions')
-@click.option('--header-mark', multiple=True, type=str)
-@click.argument('directory')
-def main(contribution_threshold,
-         change_threshold,
-         backend_type,
-         jobs,
-         include,
-         exclude,
-         aliases,
-         process_missing,
-         copyright_pattern,
-         header_mark,
-         directory):
+class _DefaultCommandGroup(click.Group):
+    """A group which runs its default command when no command is given.
+
+    This keeps ``copyrite [OPTIONS] DIRECTORY`` working, next to
+    the commands which were added later.
+    """
+
+    default_command = 'run'
+
+    def parse_args(self, ctx, args):
+        if not args or args[0] not in self.commands and args[0] not in ('--help', '-h'):
+            args = [self.default_command] + list(args)
+        return super().parse_args(ctx, args)
+
+
+@click.group(cls=_DefaultCommandGroup)
+def main():
     """Console script for copyrite"""
+
+
+def _processing_options(function):
+    """Add the options which control how the copyrights are computed."""
+    options = [
+        click.option('--contribution-threshold', default=1,
+                     help='Number of contributions an user should have in '
+                          'order to be considered'),
+        click.option('--change-threshold', default=10,
+                     help='Number of lines an user should have edited '
+                          'in a file in order for the contribution to be '
+                          'considered'),
+        click.option('--significance', type=click.Choice(significance_policies.POLICIES.keys()),
+                     default='combined',
+                     help='How the contributions of an author are considered '
+                          'significant: by their number (--contribution-threshold), '
+                          'by their added lines (--change-threshold) or by either one.'),
+        click.option('--backend-type', required=True,
+                     type=click.Choice(KNOWN_BACKENDS.keys())),
+        click.option('--snapshot', 'snapshot_file', type=click.Path(exists=True, dir_okay=False),
+                     help='Snapshot file, written by the snapshot command, '
+                          'from which the snapshot backend replays the history.'),
+        click.option('--cache/--no-cache', default=False,
+                     help='Keep the information retrieved from the repository '
+                          'in a persistent cache, stored in the git directory, '
+                          'so that later runs can reuse it.'),
+        click.option('--incremental-state', type=click.Path(dir_okay=False),
+                     help='File in which the state of the run is recorded. '
+                          'If it exists, only the files which changed since '
+                          'the revision it records are processed again.'),
+        click.option('--jobs', type=int, default=1,
+                     help='Parallel jobs for processing the files'),
+        click.option('--engine', 'engine_type', default='process',
+                     type=click.Choice(_ENGINE_TYPES),
+                     help='How the files are processed concurrently: in a pool '
+                          'of worker processes, or from a single asyncio event loop, '
+                          'in which case --jobs can be much higher.'),
+        click.option('--profile', type=click.Path(dir_okay=False),
+                     help='File in which a JSON report of the run is written, with '
+                          'the time spent in each phase, the latencies of the git '
+                          'commands, the slowest files and the peak memory.'),
+        click.option('--shard', callback=_parse_shard, metavar='INDEX/COUNT',
+                     help='Process only the files of this shard, such as 1/4, chosen by '
+                          'a stable hash of their paths, so that several machines '
+                          'can process disjoint parts of the same checkout.'),
+        click.option('--shard-manifest', type=click.Path(dir_okay=False),
+                     help='File in which the files processed by the shard are recorded, '
+                          'for checking them afterwards with the merge-shards command.'),
+        click.option('--include', type=str, multiple=True, default=['*.py'],
+                     help='Include only the files which are matched '
+                          'by this glob pattern. It can be given multiple times.'),
+        click.option('--exclude', type=str, multiple=True,
+                     help='Exclude the files which are matched '
+                          'by this glob pattern. The exclusion '
+                          'is done on the included files. It can be '
+                          'given multiple times.'),
+        click.option('--aliases', type=click.File('r'),
+                     help='File containing name aliases.'),
+        click.option('--mailmap', type=click.File('rb'),
+                     help='A .mailmap file, mapping the identities of the '
+                          'contributors as git does. It is applied before the aliases.'),
+        click.option('--ignore-mail-case/--no-ignore-mail-case', default=False,
+                     help='Match the mails of the aliases case-insensitively.'),
+        click.option('--copyright-pattern', type=str,
+                     help='The copyright pattern which will be placed on top '
+                          'of each file. It should accept two positional '
+                          'interpolation fields, using the old style mod '
+                          'formatting. The first field represents the contribution '
+                          'spans, while the second one represents the author of '
+                          'the contributions. By default, it is '
+                          '"# Copyright (c) %s %s", with the comments '
+                          'of the language of each file.'),
+    ]
+    for option in reversed(options):
+        function = option(function)
+    return function
+
+
+def _writing_options(function):
+    """Add the options which control how the files are written."""
+    options = [
+        click.option('--write-jobs', type=int, default=2,
+                     help='Threads which write the files, while the history '
+                          'of the next files is computed.'),
+        click.option('--process-missing', type=bool, default=False,
+                     help='Add a copyright notice to files which do not '
+                          'have them.'),
+        click.option('--header-mark', multiple=True, type=str,
+                     help='The beginning of the lines which hold copyright notices. '
+                          'By default, the usual copyright notices, commented in '
+                          'the language of each file.'),
+    ]
+    for option in reversed(options):
+        function = option(function)
+    return function
+
+
+def _process_directory(directory,
+                       contribution_threshold,
+                       change_threshold,
+                       significance,
+                       backend_type,
+                       snapshot_file,
+                       cache,
+                       incremental_state,
+                       jobs,
+                       engine_type,
+                       profile,
+                       shard,
+                       shard_manifest,
+                       include,
+                       exclude,
+                       aliases,
+                       mailmap,
+                       ignore_mail_case,
+                       copyright_pattern,
+                       write_jobs=1,
+                       process_missing=False,
+                       header_marks=None,
+                       plan_stream=None):
+    """Process the files from *directory*, with the options of the command line.
+
+    Their notices are written into the files, unless a *plan_stream* is
+    given, in which case they are written as a manifest into it.
+    """
+    start = time.perf_counter()
     if aliases:
         built_aliases = _build_aliases_from_file(aliases)
     else:
         built_aliases = []
-    header_mark = [mark.encode() for mark in header_mark]
-    header_marks = header_mark or _COPYRIGHT_HEADER_MARKS
+    if mailmap:
+        with mailmap:
+            built_mailmap = mailmap_module.Mailmap.from_file(mailmap)
+    else:
+        built_mailmap = None
+    partition = None
+    if shard or shard_manifest:
+        from copyrite import sharding
+        partition = sharding.Partition(shard or sharding.Shard(1, 1))
+
+    if backend_type == 'snapshot':
+        if not snapshot_file:
+            raise click.UsageError('The snapshot backend needs a --snapshot file')
+        if cache:
+            raise click.UsageError('The snapshot backend does not need a --cache')
+        backend = KNOWN_BACKENDS[backend_type](snapshot_file)
+    else:
+        backend = KNOWN_BACKENDS[backend_type](use_cache=cache)
+
+    run_metrics = metrics.Metrics()
+    if profile:
+        metrics.enable(run_metrics)
+    try:
+        state = revision = None
+        if incremental_state:
+            from copyrite import incremental
+            revision = backend.revision(directory)
+            if revision is None:
+                raise click.UsageError('The %s backend does not support incremental runs'
+                                       % backend_type)
+            options_fingerprint = incremental.fingerprint(
+                backend_type, contribution_threshold, change_threshold,
+                significance, built_aliases, built_mailmap and built_mailmap.entries,
+                ignore_mail_case, os.path.abspath(directory))
+            state = incremental.IncrementalState.load(
+                incremental_state, options_fingerprint, backend, directory)
+
+        _write_directory_copyrights(contribution_threshold,
+                                    change_threshold,
+                                    backend, jobs,
+                                    include, exclude,
+                                    alias.AliasIndex(built_aliases, ignore_mail_case,
+                                                     built_mailmap),
+                                    process_missing,
+                                    copyright_pattern,
+                                    header_marks,
+                                    directory,
+                                    state,
+                                    engine_type,
+                                    significance,
+                                    write_jobs,
+                                    bool(profile),
+                                    partition,
+                                    plan_stream)
+        if state is not None:
+            state.save(revision)
+        if shard_manifest:
+            partition.save(shard_manifest)
+    finally:
+        backend.close()
+        metrics.enable(None)
+
+    if profile:
+        report = run_metrics.report()
+        report['wall_time'] = time.perf_counter() - start
+        with open(profile, 'w') as stream:
+            json.dump(report, stream, indent=2)
+
+
+@main.command()
+@_processing_options
+@_writing_options
+@click.argument('directory')
+def run(directory, write_jobs, process_missing, header_mark, **options):
+    """Update the copyright notices of the files from DIRECTORY."""
+    _process_directory(directory, write_jobs=write_jobs, process_missing=process_missing,
+                       header_marks=[mark.encode() for mark in header_mark] or None,
+                       **options)
 
-    backend = KNOWN_BACKENDS[backend_type]()
-    _write_directory_copyrights(contribution_threshold,
-                                change_threshold,
-                                backend, jobs,
-                                include, exclude,
-                                built_aliases,
-                                process_missing,
-                                copyright_pattern,
-                                header_marks,
-                                directory)
+
+@main.command()
+@_processing_options
+@click.option('--output', required=True, type=click.Path(dir_okay=False),
+              help='File in which the manifest is written, as JSON lines.')
+@click.argument('directory')
+def plan(directory, output, **options):
+    """Compute the copyrights of the files from DIRECTORY, without changing them.
+
+    The spans and the notices of each file are written into a manifest,
+    from which the apply command updates the files afterwards.
+    """
+    with open(output, 'w') as stream:
+        _process_directory(directory, plan_stream=stream, **options)
+
+
+@main.command()
+@_writing_options
+@click.argument('manifest', type=click.File('r'))
+@click.argument('directory')
+def apply(write_jobs, process_missing, header_mark, manifest, directory):
+    """Update the files from DIRECTORY with the notices from MANIFEST.
+
+    The manifest is the one written by the plan command, whose paths are
+    relative to DIRECTORY. The history of the files isn't needed anymore,
+    so DIRECTORY can be any checkout with the same files.
+    """
+    from copyrite import manifest as manifest_module
+    from copyrite import pipeline
+
+    header_marks = [mark.encode() for mark in header_mark] or None
+    writes = collections.Counter() # type: typing.Counter[str]
+    writes_lock = threading.Lock()
+
+    def _write(entry):
+        file_path = os.path.join(directory, entry.path.replace('/', os.sep))
+        if not os.path.isfile(file_path):
+            outcome = 'missing'
+        elif write_copyrights(file_path, entry.notices,
+                              process_missing=process_missing,
+                              header_marks=header_marks):
+            outcome = 'written'
+        else:
+            outcome = 'unchanged'
+        with writes_lock:
+            writes[outcome] += 1
+
+    with manifest:
+        entries = manifest_module.load_entries(manifest)
+        try:
+            with pipeline.Stage(_write, write_jobs, name='write') as write_stage:
+                for entry in entries:
+                    write_stage.put(entry)
+        except ValueError as exc:
+            raise click.ClickException(str(exc))
+    print("Wrote %d files, %d were already up to date."
+          % (writes['written'], writes['unchanged']))
+    if writes['missing']:
+        print("%d files from the manifest were not found." % writes['missing'])
+
+
+@main.command()
+@click.option('--output', required=True, type=click.Path(dir_okay=False),
+              help='File in which the snapshot is written.')
+@click.argument('directory')
+def snapshot(output, directory):
+    """Export the history of the files from DIRECTORY into a snapshot.
+
+    The snapshot can be used afterwards with --backend-type snapshot,
+    for the same directory, without needing the repository.
+    """
+    from copyrite.vcs import snapshot as vcs_snapshot
+
+    with open(output, 'wb') as stream:
+        files = vcs_snapshot.take_snapshot(directory, stream)
+    print("Wrote the history of %d files to %s" % (files, output))
+
+
+@main.command('merge-shards')
+@click.option('--output', type=click.Path(dir_okay=False),
+              help='File in which the merged manifest is written.')
+@click.argument('manifests', nargs=-1, required=True,
+                type=click.Path(exists=True, dir_okay=False))
+def merge_shards(output, manifests):
+    """Check that the shard MANIFESTS covered every file exactly once.
+
+    The manifests are the ones written with --shard-manifest, by the
+    runs of every shard over the same checkout.
+    """
+    from copyrite import sharding
+
+    try:
+        loaded = [sharding.load_manifest(manifest) for manifest in manifests]
+    except ValueError as exc:
+        raise click.UsageError(str(exc))
+    problems = sharding.verify(loaded)
+    for problem in problems:
+        click.echo(problem, err=True)
+    if problems:
+        raise click.ClickException('The shards did not cover every file exactly once')
+
+    merged = sharding.merge(loaded)
+    if output:
+        with open(output, 'w') as stream:
+            json.dump(merged, stream, indent=1)
+    print("The %d shards covered each of the %d files exactly once"
+          % (len(loaded), len(merged['files'])))
 
 
 if __name__ == "__main__":
@@ -1,10 +1,13 @@
 """copyrite - a tool for handling missing copyright attributions in a project's files."""
 
 import collections
-import itertools
-from typing import Dict, List, Iterable, Tuple, Set
+import os
+import time
+from typing import Dict, List, Iterable, Optional, Set, Tuple, Union
 
 from copyrite import alias
+from copyrite import metrics
+from copyrite import significance
 from copyrite import span
 from copyrite import vcs
 
@@ -15,60 +18,47 @@ _BLACKLIST_MAILS = [b"none@none"]
 # pylint: disable=invalid-name
 SpanList = List[span.ContributionSpan]
 SpanIterable = Iterable[span.ContributionSpan]
-AuthorToDate = Dict[Tuple[str, str], Set[int]]
+AuthorToDate = Dict[Tuple[bytes, bytes], Set[int]]
 AuthorContributions = Dict[str, List[vcs.Contribution]]
 # pylint: enable=invalid-name
 
 
-def _spans(dates):
-    """Get the consecutive spans from the given dates."""
-    spans = []
-    current_span = []
-    prev = 0
-    for date in dates:
-        if date == prev + 1:
-            current_span.append(date)
-        else:
-            spans.append(list(current_span))
-            current_span.clear()
-            current_span.append(date)
-        prev = date
-    spans.append(current_span)
-    return list(filter(None, spans))
-
-
-def is_significant_change(change: vcs.ChangeDiff,
+def _added_lines(change: Union[vcs.ChangeDiff, vcs.DiffStat]) -> int:
+    if isinstance(change, vcs.DiffStat):
+        return change.added
+    return len(change.positive)
+
+
+def is_significant_change(change: Union[vcs.ChangeDiff, vcs.DiffStat],
                           positive_threshold: int) -> bool:
     """Check if the given change can be considered significant
 
     A change is considered significant if the number of added lines
     is above a given level, which means that a small typo will
     probably not make a change be considered significant.
+    The change can be either a ChangeDiff or a DiffStat.
     """
-    return len(change.positive) >= positive_threshold
-
-
-def _contribution_spans(author_contributions: AuthorToDate) -> SpanIterable:
-    for (author, mail), dates in author_contributions.items():
-        ordered = sorted(set(dates))
-        yield span.ContributionSpan(author, mail, _spans(ordered))
+    return _added_lines(change) >= positive_threshold
 
 
 def contribution_spans(contributions: List[vcs.Contribution]) -> SpanList:
     """Get the span contributions from the given contributions
 
     The span contribution is an object with the author, author's mail and
-    the dates when an author contributed to the project.
+    the dates when an author contributed to the project. The dates are
+    aggregated in a single pass, as a :class:`copyrite.span.YearSet`.
     """
 
-    grouper = itertools.groupby(contributions, lambda con: (con.author, con.mail))
-    spans = collections.defaultdict(set) # type: AuthorToDate
-    for author_mail, group in grouper:
-        spans[author_mail].update(con.date for con in group)
-    return list(_contribution_spans(spans))
+    years = {} # type: AuthorToDate
+    for contribution in contributions:
+        key = (contribution.author, contribution.mail)
+        years.setdefault(key, set()).add(contribution.date)
+    # The years which can't be represented are rejected by YearSet.
+    return [span.ContributionSpan(author, mail, span.YearSet.from_years(dates))
+            for (author, mail), dates in years.items()]
 
 
-def significant_changes(changes: List[vcs.ChangeDiff],
+def significant_changes(changes: List[Union[vcs.ChangeDiff, vcs.DiffStat]],
                         change_positive_threshold: int,
                         contributions_threshold: int) -> bool:
     """Check if the given changes are significant (usually for an author)."""
@@ -84,49 +74,127 @@ def _contributions_grouped_by_author(
         contributions: List[vcs.Contribution]) -> AuthorContributions:
 
     authors = collections.defaultdict(list) # type: AuthorContributions
-    grouper = itertools.groupby(contributions,
-                                lambda con: con.author)
-    for author, group in grouper:
-        authors[author].extend(list(group))
+    for contribution in contributions:
+        authors[contribution.author].append(contribution)
     return authors
 
 
 def _significant_contributions(authors: AuthorContributions,
                                backend: vcs.VCSBackend,
                                dirpath: str,
-                               change_positive_threshold: int,
-                               contributions_threshold: int) -> Iterable[List[vcs.Contribution]]:
+                               policy: significance.SignificancePolicy,
+                               stats: significance.EvaluationStats
+                              ) -> Iterable[List[vcs.Contribution]]:
 
-    for author_contributions in authors.values():
-        changes = [backend.contribution_changes(contribution, dirpath)
-                   for contribution in author_contributions]
+    def _fetch_stats(contribution):
+        stats.fetched += 1
+        with metrics.current().timer('line_counts'):
+            return backend.contribution_stats(contribution, dirpath)
 
-        if significant_changes(changes, change_positive_threshold, contributions_threshold):
+    for author_contributions in authors.values():
+        fetched = stats.fetched
+        if policy.is_significant(author_contributions, _fetch_stats):
             yield author_contributions
+        stats.skipped += len(author_contributions) - (stats.fetched - fetched)
 
 
-def file_copyrights(directory: str,
-                    filepath: str,
-                    backend: vcs.VCSBackend,
-                    change_positive_threshold: int,
-                    contributions_threshold: int,
-                    aliases: List[alias.Alias]) -> List[span.ContributionSpan]:
+async def _asignificant_contributions(authors: AuthorContributions,
+                                      backend: vcs.VCSBackend,
+                                      dirpath: str,
+                                      policy: significance.SignificancePolicy,
+                                      stats: significance.EvaluationStats
+                                     ) -> List[List[vcs.Contribution]]:
 
-    """Generate a list of Copyright notices for the given file."""
+    async def _fetch_stats(contribution):
+        stats.fetched += 1
+        with metrics.current().timer('line_counts'):
+            return await backend.acontribution_stats(contribution, dirpath)
+
+    significant = []
+    for author_contributions in authors.values():
+        fetched = stats.fetched
+        if await policy.ais_significant(author_contributions, _fetch_stats):
+            significant.append(author_contributions)
+        stats.skipped += len(author_contributions) - (stats.fetched - fetched)
+    return significant
 
-    contributions = backend.file_contributions(filepath, directory)
-    transformed_contributions = alias.apply_aliases(contributions, aliases)
-    authors = _contributions_grouped_by_author(transformed_contributions)
-    author_contributions = _significant_contributions(
-        authors, backend, directory,
-        change_positive_threshold,
-        contributions_threshold)
+
+def _copyright_spans(author_contributions: Iterable[List[vcs.Contribution]]) -> SpanList:
 
     def _order_cb(item):
-        return sorted(item.dates)[0][0]
+        return item.dates.first
 
     unflattened = [span for spans in map(contribution_spans, author_contributions)
                    for span in spans]
     filtered_spans = [span for span in unflattened
                       if span.mail not in _BLACKLIST_MAILS]
     return sorted(filtered_spans, key=_order_cb)
+
+
+def file_copyrights(directory: str,
+                    filepath: str,
+                    backend: vcs.VCSBackend,
+                    change_positive_threshold: int,
+                    contributions_threshold: int,
+                    aliases: Union[List[alias.Alias], alias.AliasIndex],
+                    policy: str = 'combined',
+                    stats: Optional[significance.EvaluationStats] = None
+                   ) -> List[span.ContributionSpan]:
+
+    """Generate a list of Copyright notices for the given file.
+
+    *policy* is the name of the policy which decides if the
+    contributions of an author are significant, from
+    :data:`copyrite.significance.POLICIES`. If *stats* is given,
+    it is updated with the line counts which were fetched or skipped.
+    """
+
+    file_metrics = metrics.current()
+    start = time.perf_counter()
+    with file_metrics.timer('history'):
+        contributions = backend.file_contributions(filepath, directory)
+    transformed_contributions = alias.apply_aliases(contributions, aliases)
+    authors = _contributions_grouped_by_author(transformed_contributions)
+    with file_metrics.timer('significance'):
+        author_contributions = list(_significant_contributions(
+            authors, backend, directory,
+            significance.POLICIES[policy](change_positive_threshold, contributions_threshold),
+            stats or significance.EvaluationStats()))
+    with file_metrics.timer('spans'):
+        spans = _copyright_spans(author_contributions)
+    file_metrics.file(os.path.join(directory, filepath), time.perf_counter() - start)
+    return spans
+
+
+async def afile_copyrights(directory: str,
+                           filepath: str,
+                           backend: vcs.VCSBackend,
+                           change_positive_threshold: int,
+                           contributions_threshold: int,
+                           aliases: Union[List[alias.Alias], alias.AliasIndex],
+                           policy: str = 'combined',
+                           stats: Optional[significance.EvaluationStats] = None
+                          ) -> List[span.ContributionSpan]:
+
+    """Asynchronous version of :func:`file_copyrights`.
+
+    The repository is queried through the asynchronous methods
+    of the backend, so that multiple files can be processed
+    concurrently from a single event loop.
+    """
+
+    file_metrics = metrics.current()
+    start = time.perf_counter()
+    with file_metrics.timer('history'):
+        contributions = await backend.afile_contributions(filepath, directory)
+    transformed_contributions = alias.apply_aliases(contributions, aliases)
+    authors = _contributions_grouped_by_author(transformed_contributions)
+    with file_metrics.timer('significance'):
+        author_contributions = await _asignificant_contributions(
+            authors, backend, directory,
+            significance.POLICIES[policy](change_positive_threshold, contributions_threshold),
+            stats or significance.EvaluationStats())
+    with file_metrics.timer('spans'):
+        spans = _copyright_spans(author_contributions)
+    file_metrics.file(os.path.join(directory, filepath), time.perf_counter() - start)
+    return spans
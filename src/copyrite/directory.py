@@ -0,0 +1,66 @@
+"""Computes the copyrights of every file from a directory, for other tools."""
+
+import os
+import typing
+
+from copyrite import alias
+from copyrite import discovery
+from copyrite import significance
+from copyrite import span
+from copyrite import vcs
+
+
+def iter_directory_copyrights(directory: str,
+                              backend: vcs.VCSBackend,
+                              change_positive_threshold: int = 10,
+                              contributions_threshold: int = 1,
+                              aliases: typing.Union[typing.List[alias.Alias],
+                                                    alias.AliasIndex, None] = None,
+                              policy: str = 'combined',
+                              jobs: int = 1,
+                              engine_type: str = 'process',
+                              include: typing.Iterable[str] = ('*.py',),
+                              exclude: typing.Iterable[str] = (),
+                              stats: typing.Optional[significance.EvaluationStats] = None
+                             ) -> typing.Iterator[typing.Tuple[str,
+                                                               typing.List[span.ContributionSpan]]]:
+    """Compute the copyrights of the files from *directory*.
+
+    The files are the ones which :func:`copyrite.discovery.iter_files`
+    finds, matching the *include* and *exclude* glob patterns. A pair of
+    the path of each file and its spans is yielded as soon as it is
+    computed, not in the order of the files, by an engine from
+    :data:`copyrite.engine.ENGINES` processing *jobs* files at the
+    same time. The rest of the arguments have the same meaning
+    as for :func:`copyrite.copyrite.file_copyrights`.
+
+    The backend is prepared again by every call, so that it sees the
+    commits made since the last one, and it is closed once the
+    generator is exhausted or closed.
+    """
+    # Not imported with the package, since the command line imports it too.
+    from copyrite import engine
+
+    if not isinstance(aliases, alias.AliasIndex):
+        # Indexed once, instead of by every file.
+        aliases = alias.AliasIndex(aliases or [])
+
+    include_matcher = discovery.compile_patterns(include)
+    exclude_matcher = discovery.compile_patterns(exclude)
+    executor = engine.ENGINES[engine_type](
+        jobs, (backend, change_positive_threshold, contributions_threshold, aliases, policy))
+
+    def _files():
+        # Prepared from the thread of the engine, which is the one
+        # using the backend, before the first file is submitted.
+        backend.prepare(directory)
+        for filepath in discovery.iter_files(directory, backend,
+                                             include_matcher, exclude_matcher):
+            yield os.path.dirname(filepath), os.path.basename(filepath), filepath
+
+    try:
+        yield from executor.iter_results(_files())
+    finally:
+        backend.close()
+        if stats is not None:
+            stats.update(executor.stats)
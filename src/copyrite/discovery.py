@@ -0,0 +1,70 @@
+"""Discovery of the files whose copyrights have to be updated."""
+
+import fnmatch
+import os
+import re
+import typing
+
+from copyrite import vcs
+
+
+# pylint: disable=invalid-name
+# Checks if a path is matched by any of the patterns it was compiled from.
+Matcher = typing.Callable[[str], bool]
+# pylint: enable=invalid-name
+
+# Directories which are never searched when walking a directory.
+_IGNORED_DIRECTORIES = {'.git', '.hg', '.svn'}
+
+
+def compile_patterns(patterns: typing.Iterable[str]) -> typing.Optional[Matcher]:
+    """Compile the given glob patterns into a single matcher.
+
+    The patterns have the same meaning as for :func:`fnmatch.fnmatch`.
+    None is returned if there aren't any patterns.
+    """
+    translated = [fnmatch.translate(os.path.normcase(pattern)) for pattern in patterns]
+    if not translated:
+        return None
+    match = re.compile('|'.join('(?:%s)' % pattern for pattern in translated)).match
+    return lambda path: match(os.path.normcase(path)) is not None
+
+
+def _walk(directory: str) -> typing.Iterator[str]:
+    for dirpath, dirnames, filenames in os.walk(directory):
+        dirnames[:] = [dirname for dirname in dirnames
+                       if dirname not in _IGNORED_DIRECTORIES]
+        for filename in filenames:
+            yield os.path.join(dirpath, filename)
+
+
+def _tracked(directory: str, tracked: typing.List[str]) -> typing.Iterator[str]:
+    for path in tracked:
+        filepath = os.path.join(directory, path.replace('/', os.sep))
+        # Tracked files might have been removed, or be submodules.
+        if os.path.isfile(filepath):
+            yield filepath
+
+
+def iter_files(directory: str, backend: vcs.VCSBackend,
+               include: typing.Optional[Matcher] = None,
+               exclude: typing.Optional[Matcher] = None) -> typing.Iterator[str]:
+    """Get the paths of the files from *directory* which have to be processed.
+
+    These are the files tracked by the repository, as the *backend*
+    reports them, or every file from the directory if the backend
+    can't tell. The paths start with *directory* and they are
+    filtered through the *include* and *exclude* matchers.
+    """
+    tracked = backend.tracked_files(directory)
+    if tracked is None:
+        filepaths = _walk(directory)
+    else:
+        filepaths = _tracked(directory, tracked)
+
+    for filepath in filepaths:
+        if include and not include(filepath):
+            continue
+        if exclude and exclude(filepath):
+            continue
+        yield filepath
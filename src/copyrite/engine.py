@@ -0,0 +1,245 @@
+"""Engines which compute the copyrights of many files concurrently."""
+
+import abc
+import os
+import queue
+import sys
+import threading
+import typing
+
+from copyrite import copyrite
+from copyrite import metrics
+from copyrite import significance
+from copyrite import span
+
+if typing.TYPE_CHECKING: # pragma: no cover
+    import asyncio
+    import concurrent.futures
+
+# asyncio and concurrent.futures are imported by the engines which need
+# them, instead of by every run of the command line.
+
+
+# pylint: disable=invalid-name
+# A file to process, as its directory, its name and its full path.
+FileTask = typing.Tuple[str, str, str]
+# Called with the full path of a file and its spans, once they are computed.
+ResultCallback = typing.Callable[[str, typing.List[span.ContributionSpan]], None]
+# pylint: enable=invalid-name
+
+_DONE = object()
+# How many files can be submitted for each job, before waiting for the results.
+_IN_FLIGHT_PER_JOB = 4
+# How often a blocked result checks if its consumer went away, in seconds.
+_POLL_INTERVAL = 0.1
+
+
+class Engine(metaclass=abc.ABCMeta):
+    """Runs :func:`copyrite.copyrite.file_copyrights` over multiple files.
+
+    *jobs* controls how many files are processed at the same time,
+    while *arguments* are the arguments which are passed to the function
+    after the directory and the name of each file: the backend, the
+    change threshold, the contribution threshold, the aliases and,
+    optionally, the significance policy. The line counts which were
+    fetched or skipped by all the files are gathered in :attr:`stats`.
+    If *profile* is True, the metrics recorded while processing
+    the files are gathered in :attr:`metrics`.
+    """
+
+    def __init__(self, jobs: int, arguments: tuple, profile: bool = False) -> None:
+        self.jobs = jobs
+        self.arguments = arguments
+        self.profile = profile
+        self.stats = significance.EvaluationStats()
+        self.metrics = metrics.Metrics()
+
+    @abc.abstractmethod
+    def run(self, files: typing.Iterable[FileTask], callback: ResultCallback) -> None:
+        """Process the given files, calling *callback* with the results of each one."""
+
+    def iter_results(self, files: typing.Iterable[FileTask], maxsize: int = 0
+                    ) -> typing.Iterator[typing.Tuple[str, typing.List[span.ContributionSpan]]]:
+        """Process the given files, yielding the results of each one once it is computed.
+
+        :meth:`run` is called from a background thread, whose results
+        wait in a queue of at most *maxsize* items, by default twice the
+        number of jobs, so that a slow consumer makes the engine wait.
+        If the consumer stops early, the files which weren't submitted
+        yet are dropped. The first exception raised by the engine
+        is raised again by the generator.
+        """
+        results = queue.Queue(maxsize or self.jobs * 2) # type: queue.Queue
+        stopped = threading.Event()
+        errors = [] # type: typing.List[BaseException]
+
+        def _put(item):
+            while not stopped.is_set():
+                try:
+                    results.put(item, timeout=_POLL_INTERVAL)
+                    return
+                except queue.Full:
+                    continue
+
+        def _files():
+            for task in files:
+                if stopped.is_set():
+                    return
+                yield task
+
+        def _run():
+            try:
+                self.run(_files(), lambda filepath, spans: _put((filepath, spans)))
+            except BaseException as exc: # pylint: disable=broad-except
+                errors.append(exc)
+            finally:
+                _put(_DONE)
+
+        thread = threading.Thread(target=_run, name='engine', daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = results.get()
+                if item is _DONE:
+                    break
+                yield item
+        finally:
+            stopped.set()
+            thread.join()
+        if errors:
+            raise errors[0]
+
+
+def _file_copyrights_task(dirpath: str, filename: str, *arguments, profile: bool = False):
+    stats = significance.EvaluationStats()
+    if not profile:
+        return copyrite.file_copyrights(dirpath, filename, *arguments, stats=stats), stats, None
+    with metrics.activate(metrics.Metrics()) as task_metrics:
+        results = copyrite.file_copyrights(dirpath, filename, *arguments, stats=stats)
+    return results, stats, task_metrics
+
+
+class ProcessEngine(Engine):
+    """Engine which processes the files in a pool of worker processes.
+
+    At most :attr:`in_flight` files are submitted to the pool at the
+    same time. The next files are taken from *files* only when the
+    previous ones are done, so the memory doesn't grow with the number
+    of files and the results come while the files are still discovered.
+    """
+
+    def __init__(self, jobs: int, arguments: tuple, profile: bool = False) -> None:
+        super().__init__(jobs, arguments, profile)
+        self.in_flight = jobs * _IN_FLIGHT_PER_JOB
+
+    def _collect(self, pending: typing.Dict['concurrent.futures.Future', str],
+                 callback: ResultCallback, return_when: str) -> None:
+        import concurrent.futures
+        done, _ = concurrent.futures.wait(pending, return_when=return_when)
+        for future in done:
+            filepath = pending.pop(future)
+            results, stats, task_metrics = future.result()
+            self.stats.update(stats)
+            if task_metrics is not None:
+                self.metrics.update(task_metrics)
+            callback(filepath, results)
+
+    def run(self, files: typing.Iterable[FileTask], callback: ResultCallback) -> None:
+        import concurrent.futures
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.jobs) as executor:
+            pending = {} # type: typing.Dict[concurrent.futures.Future, str]
+            for dirpath, filename, filepath in files:
+                if len(pending) >= self.in_flight:
+                    self._collect(pending, callback, concurrent.futures.FIRST_COMPLETED)
+                future = executor.submit(_file_copyrights_task,
+                                         dirpath, filename, *self.arguments,
+                                         profile=self.profile)
+                pending[future] = filepath
+            self._collect(pending, callback, concurrent.futures.ALL_COMPLETED)
+
+
+class AsyncioEngine(Engine):
+    """Engine which processes the files from a single event loop.
+
+    The backend is queried through its asynchronous methods, which
+    for git means that *jobs* files can wait on their git commands
+    at the same time, without any worker process. Nothing has to be
+    pickled, so hundreds of files can be in flight with little overhead.
+    Each of the *jobs* workers takes the next file once it is done
+    with the previous one, so only *jobs* files are in flight.
+    """
+
+    async def _work(self, files: typing.Iterator[FileTask], callback: ResultCallback) -> None:
+        # The workers share the same iterator, so each file is taken once.
+        for dirpath, filename, filepath in files:
+            stats = significance.EvaluationStats()
+            results = await copyrite.afile_copyrights(dirpath, filename, *self.arguments,
+                                                      stats=stats)
+            self.stats.update(stats)
+            callback(filepath, results)
+
+    async def _run(self, files: typing.Iterable[FileTask], callback: ResultCallback) -> None:
+        import asyncio # pylint: disable=redefined-outer-name
+        iterator = iter(files)
+        await asyncio.gather(*(self._work(iterator, callback) for _ in range(self.jobs)))
+
+    # A loop made by iter_results, for the thread which runs the engine.
+    _loop = None # type: typing.Optional[asyncio.AbstractEventLoop]
+
+    @staticmethod
+    def _new_loop() -> 'asyncio.AbstractEventLoop':
+        import asyncio # pylint: disable=redefined-outer-name
+        loop = asyncio.new_event_loop()
+        if os.name == 'posix' and sys.version_info < (3, 8):
+            # The child watcher, which reaps the git processes, can be
+            # attached only from the main thread before Python 3.8,
+            # since it needs a handler for SIGCHLD.
+            if threading.current_thread() is not threading.main_thread():
+                loop.close()
+                raise RuntimeError('the asyncio engine must be started from the main '
+                                   'thread before Python 3.8')
+            asyncio.get_child_watcher().attach_loop(loop)
+        return loop
+
+    def _run_loop(self, files: typing.Iterable[FileTask], callback: ResultCallback) -> None:
+        import asyncio # pylint: disable=redefined-outer-name
+        # asyncio.run() would need Python 3.7.
+        loop, self._loop = self._loop or self._new_loop(), None
+        try:
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self._run(files, callback))
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+    def iter_results(self, files: typing.Iterable[FileTask], maxsize: int = 0
+                    ) -> typing.Iterator[typing.Tuple[str, typing.List[span.ContributionSpan]]]:
+        """Process the given files, yielding the results of each one once it is computed.
+
+        The event loop runs in a background thread, but it is made from
+        the thread which consumes the results, which must be the main
+        one before Python 3.8, for the git processes to be reaped.
+        """
+        self._loop = self._new_loop()
+        try:
+            yield from super().iter_results(files, maxsize)
+        finally:
+            if self._loop is not None:
+                # The engine never started.
+                self._loop.close()
+                self._loop = None
+
+    def run(self, files: typing.Iterable[FileTask], callback: ResultCallback) -> None:
+        if not self.profile:
+            self._run_loop(files, callback)
+            return
+        # Everything runs in this thread, so the files can share the same metrics.
+        with metrics.activate(self.metrics):
+            self._run_loop(files, callback)
+
+
+ENGINES = {
+    'process': ProcessEngine,
+    'asyncio': AsyncioEngine,
+}
@@ -0,0 +1,175 @@
+"""Detection of the copyright notices from the header of a file.
+
+The notices are searched only in the header of a file, that is the
+comments and the blank lines from its beginning, so the detection
+doesn't depend on the size of the file. How a comment looks like
+depends on the language of the file, which is guessed from its extension.
+"""
+
+import collections
+import functools
+import os
+import re
+import typing
+
+
+CommentStyle = collections.namedtuple('CommentStyle', 'start end')
+
+HASH = CommentStyle(b'#', b'')
+SLASHES = CommentStyle(b'//', b'')
+BLOCK = CommentStyle(b'/*', b'*/')
+MARKUP = CommentStyle(b'<!--', b'-->')
+DASHES = CommentStyle(b'--', b'')
+
+_STYLES = {
+    HASH: ['.py', '.pyi', '.pyx', '.sh', '.bash', '.rb', '.pl', '.r', '.cfg', '.ini',
+           '.toml', '.yaml', '.yml', '.cmake', '.mk'],
+    SLASHES: ['.js', '.jsx', '.ts', '.tsx', '.go', '.java', '.kt', '.scala', '.swift',
+              '.rs', '.cs', '.cpp', '.cc', '.cxx', '.hpp', '.dart', '.php'],
+    BLOCK: ['.c', '.h', '.css', '.scss', '.less'],
+    MARKUP: ['.html', '.htm', '.xml', '.xhtml', '.svg', '.md', '.vue'],
+    DASHES: ['.sql', '.lua', '.hs', '.elm', '.ada', '.adb', '.ads'],
+}
+# The block comments of the languages whose comments are usually lines.
+_BLOCKS = {SLASHES: BLOCK}
+_STYLES_BY_EXTENSION = {extension: style
+                        for style, extensions in _STYLES.items()
+                        for extension in extensions}
+
+_NOTICES = [b"Copyright (c)", b"copyright ", b"Copyright "]
+
+# Lines which can precede the comments of a header.
+_PROLOGUES = re.compile(br'\s*(?:#!|<\?xml|<!DOCTYPE)', re.IGNORECASE)
+
+
+def comment_style(filename: str) -> CommentStyle:
+    """Get the comment style of the given file, the one of Python by default."""
+    extension = os.path.splitext(filename)[1].lower()
+    return _STYLES_BY_EXTENSION.get(extension, HASH)
+
+
+def default_header_marks(style: CommentStyle) -> typing.List[bytes]:
+    """Get the beginnings of the lines which hold copyright notices."""
+    return [style.start + b' ' + notice for notice in _NOTICES]
+
+
+def _block_style(style: CommentStyle) -> typing.Optional[CommentStyle]:
+    return style if style.end else _BLOCKS.get(style)
+
+
+def continued_notice(notice: bytes, prefix: bytes, style: CommentStyle) -> bytes:
+    """Rewrite a notice in the given *style* as a line inside a block comment.
+
+    The delimiters of the comment are dropped and the line starts
+    with *prefix* instead, as the other lines of the block, usually
+    with ``b' * '``.
+    """
+    body = notice.strip()
+    for delimiters in filter(None, (style, _block_style(style))):
+        if body.startswith(delimiters.start):
+            body = body[len(delimiters.start):]
+        if delimiters.end and body.endswith(delimiters.end):
+            body = body[:-len(delimiters.end)]
+    return prefix + body.strip() + b'\n'
+
+
+def default_copyright_pattern(style: CommentStyle) -> str:
+    """Get the pattern of the copyright notices written in the given style."""
+    pattern = style.start.decode() + ' Copyright (c) %s %s'
+    if style.end:
+        pattern += ' ' + style.end.decode()
+    return pattern
+
+
+class HeaderDetector:
+    """Finds the copyright notices from the header of a file.
+
+    A notice is a line which starts with one of the *header_marks*,
+    which are compiled into a single regular expression. The lines
+    are scanned only until the end of the header, the first line which
+    is neither blank nor a comment in the given comment *style*.
+    Inside a block comment, a notice can also continue the comment,
+    as in `` * Copyright (c) 2015 John``, without its own delimiters.
+    """
+
+    def __init__(self, header_marks: typing.Iterable[bytes],
+                 style: CommentStyle = HASH) -> None:
+        self.style = style
+        self._block = _block_style(style)
+        header_marks = list(header_marks)
+        self._marks = re.compile(b'|'.join(re.escape(mark) for mark in header_marks))
+        self._starts = tuple(filter(None, (style.start, self._block and self._block.start)))
+        bodies = set()
+        for mark in header_marks:
+            for start in self._starts:
+                if mark.startswith(start):
+                    mark = mark[len(start):]
+            bodies.add(re.escape(mark.strip()))
+        bodies.discard(b'')
+        self._continued = None # type: typing.Optional[typing.Pattern[bytes]]
+        if bodies:
+            self._continued = re.compile(
+                br'(\s*(?:\*\s*)?)(?:' + b'|'.join(sorted(bodies)) + b')')
+
+    def find(self, lines: typing.Sequence[bytes]) -> typing.List[int]:
+        """Get the indexes of the notices from the header of the given lines."""
+        return [index for index, prefix in self._scan(lines) if prefix is not None]
+
+    def continuation(self, lines: typing.Sequence[bytes]) -> typing.Optional[bytes]:
+        """Get the prefix of the first notice of the header, if it continues a block comment.
+
+        Notices which have their own delimiters have no prefix.
+        """
+        for _, prefix in self._scan(lines):
+            if prefix is not None:
+                return prefix or None
+        return None
+
+    def header_length(self, lines: typing.Sequence[bytes]) -> int:
+        """Get how many of the given lines, from the first one, are part of the header."""
+        length = 0
+        for length, _ in enumerate(self._scan(lines), 1):
+            pass
+        return length
+
+    def _opens_block(self, stripped: bytes) -> bool:
+        block = self._block
+        return (block is not None and stripped.startswith(block.start)
+                and block.end not in stripped[len(block.start):])
+
+    def _scan(self, lines: typing.Sequence[bytes]
+             ) -> typing.Iterator[typing.Tuple[int, typing.Optional[bytes]]]:
+        # The index of every line of the header, with the prefix of the
+        # line if it is a notice: empty, unless it continues a block.
+        in_block = False
+        for index, line in enumerate(lines):
+            stripped = line.strip()
+            if in_block:
+                in_block = self._block.end not in stripped
+                continued = self._continued and self._continued.match(line)
+                if self._marks.match(line):
+                    yield index, b''
+                else:
+                    yield index, continued.group(1) if continued else None
+                continue
+
+            if self._marks.match(line):
+                in_block = self._opens_block(stripped)
+                yield index, b''
+                continue
+            if not stripped:
+                pass
+            elif stripped.startswith(self._starts):
+                in_block = self._opens_block(stripped)
+            elif index == 0 and _PROLOGUES.match(line):
+                pass
+            else:
+                return
+            yield index, None
+
+
+@functools.lru_cache(maxsize=None)
+def detector(header_marks: typing.Tuple[bytes, ...],
+             style: CommentStyle = HASH) -> HeaderDetector:
+    """Get a detector for the given marks, built once per process."""
+    return HeaderDetector(header_marks, style)
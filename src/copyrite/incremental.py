@@ -0,0 +1,108 @@
+"""Support for incremental runs, which process only the files changed since the last run."""
+
+import json
+import os
+import typing
+
+from copyrite import span
+from copyrite import vcs
+
+
+# pylint: disable=invalid-name
+SpanList = typing.List[span.ContributionSpan]
+# pylint: enable=invalid-name
+
+
+def fingerprint(*options) -> str:
+    """Get a fingerprint of the options which influence the results of a run.
+
+    The results of a run can be reused only by a run with the same
+    fingerprint, since different thresholds or aliases lead
+    to different spans for the same history.
+    """
+    import hashlib
+    return hashlib.sha1(repr(options).encode()).hexdigest()
+
+
+class IncrementalState:
+    """The state of the last run over a directory.
+
+    It records the revision which was processed and the spans of every
+    file, relative to the processed directory. A file is considered
+    stale if it changed since that revision or if it is not known
+    at all, in which case it has to be processed again. Every file of
+    the directory is checked with :meth:`is_stale`, so that the files
+    which are gone can be forgotten by :meth:`retain_checked`.
+    """
+
+    def __init__(self, path: str, options_fingerprint: str) -> None:
+        self.path = path
+        self.fingerprint = options_fingerprint
+        self._files = {} # type: typing.Dict[str, list]
+        # None means that every file is stale.
+        self._changed = None # type: typing.Optional[typing.Set[str]]
+        self._checked = set() # type: typing.Set[str]
+
+    @classmethod
+    def load(cls, path: str, options_fingerprint: str,
+             backend: vcs.VCSBackend, directory: str) -> 'IncrementalState':
+        """Load the state of the last run from the given path.
+
+        The state of the last run is discarded if it was obtained
+        with different options or if the files which changed
+        since then can't be determined.
+        """
+        state = cls(path, options_fingerprint)
+        try:
+            with open(path) as stream:
+                content = json.load(stream)
+        except (OSError, ValueError):
+            return state
+
+        if content.get('fingerprint') != options_fingerprint:
+            return state
+
+        changed = backend.changed_files(content['revision'], directory)
+        if changed is not None:
+            state._files = content['files']
+            state._changed = changed
+        return state
+
+    @staticmethod
+    def _key(filepath: str, directory: str) -> str:
+        return os.path.relpath(filepath, directory).replace(os.sep, '/')
+
+    def is_stale(self, filepath: str, directory: str) -> bool:
+        """Check if the given file has to be processed again."""
+        key = self._key(filepath, directory)
+        self._checked.add(key)
+        if self._changed is None:
+            return True
+        return key in self._changed or key not in self._files
+
+    def spans(self, filepath: str, directory: str) -> SpanList:
+        """Get the spans of a file which is not stale."""
+        return [span.from_serializable(item)
+                for item in self._files[self._key(filepath, directory)]]
+
+    def update(self, filepath: str, directory: str, spans: SpanList) -> None:
+        """Record the spans of the given file."""
+        self._files[self._key(filepath, directory)] = [
+            span.to_serializable(item) for item in spans]
+
+    def retain_checked(self) -> None:
+        """Forget about the files which weren't checked by :meth:`is_stale`."""
+        self._files = {key: value for key, value in self._files.items()
+                       if key in self._checked}
+
+    def save(self, revision: str) -> None:
+        """Save the state, recording that *revision* was processed."""
+        content = {
+            'revision': revision,
+            'fingerprint': self.fingerprint,
+            'files': self._files,
+        }
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as stream:
+            json.dump(content, stream)
+        os.replace(temporary, self.path)
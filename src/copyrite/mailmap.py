@@ -0,0 +1,81 @@
+"""Support for the identity mappings of git's ``.mailmap`` files.
+
+Each line of a ``.mailmap`` has one of these forms::
+
+    Proper Name <commit@mail>
+    <proper@mail> <commit@mail>
+    Proper Name <proper@mail> <commit@mail>
+    Proper Name <proper@mail> Commit Name <commit@mail>
+
+As with git, the mails and the names are compared case-insensitively,
+and a line which gives both the commit name and the commit mail takes
+precedence over the lines which give only the commit mail.
+"""
+
+import collections
+import re
+import typing
+
+
+MailmapEntry = collections.namedtuple(
+    'MailmapEntry', 'proper_name proper_mail commit_name commit_mail')
+
+_LINE = re.compile(br'^\s*([^<#]*?)\s*<([^>]*)>(?:\s*([^<#]*?)\s*<([^>]*)>)?')
+
+
+def parse_mailmap(lines: typing.Iterable[bytes]) -> typing.List[MailmapEntry]:
+    """Parse the lines of a ``.mailmap``, skipping comments and invalid lines."""
+    entries = []
+    for line in lines:
+        match = _LINE.match(line)
+        if not match:
+            continue
+        name, mail, other_name, other_mail = match.groups()
+        if other_mail is None:
+            if not name:
+                # A single mail, without a name, maps nothing.
+                continue
+            entries.append(MailmapEntry(name, None, None, mail))
+        else:
+            entries.append(MailmapEntry(name or None, mail or None, other_name or None,
+                                        other_mail))
+    return entries
+
+
+class Mailmap:
+    """Compiled lookup of the entries of a ``.mailmap``."""
+
+    def __init__(self, entries: typing.Iterable[MailmapEntry]) -> None:
+        self.entries = list(entries)
+        # Maps a commit mail to the proper name and mail given for it,
+        # both by the lines without a commit name and by the others.
+        self._mails = {} # type: typing.Dict[bytes, list]
+        for entry in self.entries:
+            by_mail = self._mails.setdefault(entry.commit_mail.lower(), [None, None, {}])
+            if entry.commit_name is None:
+                target = by_mail
+            else:
+                target = by_mail[2].setdefault(entry.commit_name.lower(), [None, None])
+            # As with git, a later line completes or overrides an earlier one.
+            if entry.proper_name is not None:
+                target[0] = entry.proper_name
+            if entry.proper_mail is not None:
+                target[1] = entry.proper_mail
+
+    @classmethod
+    def from_file(cls, stream: typing.BinaryIO) -> 'Mailmap':
+        """Build a mailmap from an opened ``.mailmap`` file."""
+        return cls(parse_mailmap(stream))
+
+    def resolve(self, name: bytes, mail: bytes) -> typing.Tuple[bytes, bytes]:
+        """Get the proper name and mail of the given identity."""
+        try:
+            proper_name, proper_mail, by_name = self._mails[mail.lower()]
+        except KeyError:
+            return name, mail
+        if name.lower() in by_name:
+            proper_name, proper_mail = by_name[name.lower()]
+        return proper_name or name, proper_mail or mail
+
+    def __bool__(self):
+        return bool(self._mails)
@@ -0,0 +1,43 @@
+"""Manifests of the copyrights which were computed for the files of a directory.
+
+A manifest has a JSON object on each line, with the path of a file,
+relative to the directory and with ``/`` separators, its spans and its
+rendered notices. It is written by ``copyrite plan``, which does the
+expensive analysis of the history, and read by ``copyrite apply``,
+which only has to rewrite the headers of the files.
+"""
+
+import collections
+import json
+import typing
+
+from copyrite import span
+
+
+Entry = collections.namedtuple('Entry', 'path spans notices')
+
+
+def dump_entry(entry: Entry) -> str:
+    """Get the line of the manifest for the given entry, without its newline."""
+    return json.dumps({
+        'path': entry.path,
+        'spans': [span.to_serializable(item) for item in entry.spans],
+        'notices': [notice.decode('utf-8', 'surrogateescape') for notice in entry.notices],
+    })
+
+
+def load_entries(stream: typing.TextIO) -> typing.Iterator[Entry]:
+    """Get the entries of the manifest from the given stream, one by one."""
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+            entry = Entry(data['path'],
+                          [span.from_serializable(item) for item in data['spans']],
+                          [notice.encode('utf-8', 'surrogateescape')
+                           for notice in data['notices']])
+        except (KeyError, TypeError, ValueError) as exc:
+            raise ValueError('invalid entry on line %d of the manifest: %s'
+                             % (number, exc)) from exc
+        yield entry
@@ -0,0 +1,217 @@
+"""Timings and counters of a run, for finding out where its time goes.
+
+The instrumented code records into :func:`current`, which does nothing
+unless some metrics were activated, either for the whole process
+through :func:`enable`, or for a single thread through :func:`activate`.
+The metrics of the tasks are merged afterwards, as are the
+:class:`copyrite.significance.EvaluationStats`.
+"""
+
+import bisect
+import collections
+import contextlib
+import heapq
+import threading
+import time
+import typing
+
+try:
+    import resource
+except ImportError: # pragma: no cover
+    # Not available on Windows.
+    resource = None # type: ignore
+
+
+# The upper bounds of the buckets of the latency histograms, in seconds.
+_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0)
+_SLOWEST_FILES = 20
+
+
+class _Latencies:
+    """Number, total and histogram of the durations of something."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(_BUCKETS) + 1)
+
+    def add(self, elapsed: float) -> None:
+        """Record a duration of *elapsed* seconds."""
+        self.count += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        self.buckets[bisect.bisect_left(_BUCKETS, elapsed)] += 1
+
+    def update(self, other: '_Latencies') -> None:
+        """Add the durations recorded by *other* to this object."""
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        self.buckets = [mine + theirs for mine, theirs in zip(self.buckets, other.buckets)]
+
+    def report(self, histogram: bool = False) -> dict:
+        """Get the durations as a structure which can be serialised to JSON.
+
+        If *histogram* is True, the number of durations
+        from each bucket is reported as well.
+        """
+        report = {'count': self.count, 'total': self.total, 'max': self.max}
+        if histogram:
+            bounds = ['<=%gms' % (bound * 1000) for bound in _BUCKETS] + ['>%gms' % 5000]
+            report['histogram'] = dict(zip(bounds, self.buckets))
+        return report
+
+
+class Metrics:
+    """Timings and counters of a run.
+
+    It records the wall time spent in each phase, the number and the
+    latencies of the subprocesses, arbitrary counters and the slowest
+    files. Each task can record into its own object, which
+    :meth:`update` merges afterwards, but the threads of a process
+    can also share the same object.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.phases = collections.defaultdict(_Latencies) # type: typing.Dict[str, _Latencies]
+        self.subprocesses = collections.defaultdict(_Latencies) # type: typing.Dict[str, _Latencies]
+        self.counters = collections.Counter() # type: typing.Counter[str]
+        self.files = [] # type: typing.List[typing.Tuple[float, str]]
+
+    @contextlib.contextmanager
+    def timer(self, phase: str) -> typing.Iterator[None]:
+        """Record the time spent in the body of the with statement."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.phases[phase].add(elapsed)
+
+    def subprocess(self, command: str, elapsed: float) -> None:
+        """Record that the given command ran for *elapsed* seconds."""
+        with self._lock:
+            self.subprocesses[command].add(elapsed)
+
+    def count(self, counter: str, value: int = 1) -> None:
+        """Add *value* to the given counter."""
+        with self._lock:
+            self.counters[counter] += value
+
+    def file(self, path: str, elapsed: float) -> None:
+        """Record how long the given file took, keeping only the slowest ones."""
+        with self._lock:
+            self._add_file(path, elapsed)
+
+    def _add_file(self, path: str, elapsed: float) -> None:
+        if len(self.files) < _SLOWEST_FILES:
+            heapq.heappush(self.files, (elapsed, path))
+        else:
+            heapq.heappushpop(self.files, (elapsed, path))
+
+    def update(self, other: 'Metrics') -> None:
+        """Add the metrics of *other* to this object."""
+        with self._lock:
+            for phase, latencies in other.phases.items():
+                self.phases[phase].update(latencies)
+            for command, latencies in other.subprocesses.items():
+                self.subprocesses[command].update(latencies)
+            self.counters.update(other.counters)
+            for elapsed, path in other.files:
+                self._add_file(path, elapsed)
+
+    def __getstate__(self):
+        # The metrics of the worker processes are sent back to the main one.
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def report(self) -> dict:
+        """Get the metrics as a structure which can be serialised to JSON."""
+        report = {
+            'phases': {phase: latencies.report()
+                       for phase, latencies in sorted(self.phases.items())},
+            'subprocesses': {command: latencies.report(histogram=True)
+                             for command, latencies in sorted(self.subprocesses.items())},
+            'counters': dict(sorted(self.counters.items())),
+            'slowest_files': [{'path': path, 'seconds': elapsed}
+                              for elapsed, path in sorted(self.files, reverse=True)],
+        }
+        if resource is not None:
+            # Kilobytes on Linux, but bytes on macOS.
+            report['peak_rss'] = {
+                'self': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                'children': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+            }
+        return report
+
+
+class _NullTimer:
+    """Context manager which does nothing, as contextlib.nullcontext from Python 3.7."""
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc_info) -> None:
+        return None
+
+
+class _NullMetrics(Metrics):
+    """Metrics which record nothing, used when no metrics are active."""
+
+    _NULL_TIMER = _NullTimer()
+
+    def timer(self, phase: str) -> _NullTimer: # type: ignore
+        return self._NULL_TIMER
+
+    def subprocess(self, command: str, elapsed: float) -> None:
+        pass
+
+    def count(self, counter: str, value: int = 1) -> None:
+        pass
+
+    def file(self, path: str, elapsed: float) -> None:
+        pass
+
+    def update(self, other: Metrics) -> None:
+        pass
+
+
+_NULL_METRICS = _NullMetrics()
+_PROCESS_METRICS = _NULL_METRICS # type: Metrics
+# The metrics activated for the current thread, if any.
+_LOCAL = threading.local()
+
+
+def current() -> Metrics:
+    """Get the metrics in which the running code should record."""
+    metrics = getattr(_LOCAL, 'metrics', None)
+    return _PROCESS_METRICS if metrics is None else metrics
+
+
+def enable(metrics: typing.Optional[Metrics]) -> None:
+    """Record into *metrics* for the whole process, or stop recording if it is None."""
+    global _PROCESS_METRICS # pylint: disable=global-statement
+    _PROCESS_METRICS = metrics or _NULL_METRICS
+
+
+@contextlib.contextmanager
+def activate(metrics: Metrics) -> typing.Iterator[Metrics]:
+    """Record into *metrics* in the body of the with statement.
+
+    Only the current thread is affected, together with
+    every asyncio task which runs in it.
+    """
+    previous = getattr(_LOCAL, 'metrics', None)
+    _LOCAL.metrics = metrics
+    try:
+        yield metrics
+    finally:
+        _LOCAL.metrics = previous
@@ -0,0 +1,68 @@
+"""Stages of the pipeline which updates the copyrights of the files.
+
+The files are discovered, their history is computed by an
+:class:`copyrite.engine.Engine`, then their notices are formatted
+and written by stages running in their own threads. The stages are
+connected by bounded queues, so that a slow stage makes the previous
+one wait, instead of holding every pending file in memory.
+"""
+
+import queue
+import threading
+import typing
+
+
+_DONE = object()
+
+
+class Stage:
+    """A pool of threads calling *function* with the items put into the stage.
+
+    At most *maxsize* items wait in the queue of the stage, after which
+    :meth:`put` blocks until a thread is free. The first exception raised
+    by *function* is raised again by :meth:`close`, which waits for every
+    item to be processed.
+    """
+
+    def __init__(self, function: typing.Callable[..., None],
+                 workers: int = 1, maxsize: int = 0, name: str = 'stage') -> None:
+        self.function = function
+        self._queue = queue.Queue(maxsize or workers * 2) # type: queue.Queue
+        self._error = None # type: typing.Optional[BaseException]
+        self._threads = [threading.Thread(target=self._work, name='%s-%d' % (name, index),
+                                          daemon=True)
+                         for index in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def _work(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _DONE:
+                return
+            if self._error is not None:
+                # Drain the queue, so that the producers never block.
+                continue
+            try:
+                self.function(*item)
+            except BaseException as exc: # pylint: disable=broad-except
+                self._error = exc
+
+    def put(self, *item) -> None:
+        """Queue the given arguments for *function*."""
+        self._queue.put(item)
+
+    def close(self) -> None:
+        """Wait for the queued items to be processed."""
+        for _ in self._threads:
+            self._queue.put(_DONE)
+        for thread in self._threads:
+            thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,163 @@
+"""Deterministic partitioning of the files of a directory into shards.
+
+Each file belongs to the shard given by a stable hash of its path,
+relative to the directory, so that several machines processing the
+same checkout with different shards never process the same file.
+Every run records a manifest of the files of its shard, and
+:func:`verify` checks that the manifests of all the shards
+cover every discovered file exactly once.
+"""
+
+import collections
+import json
+import typing
+
+
+# The index of a shard starts from 1, as in ``--shard 1/4``.
+Shard = collections.namedtuple('Shard', 'index count')
+_MANIFEST_VERSION = 2
+
+
+def parse(text: str) -> Shard:
+    """Parse a shard given as ``INDEX/COUNT``, such as ``2/8``."""
+    try:
+        index, count = (int(part) for part in text.split('/'))
+    except ValueError as exc:
+        raise ValueError('expected INDEX/COUNT, such as 1/4, not %r' % text) from exc
+    if not 1 <= index <= count:
+        raise ValueError('the index of the shard must be between 1 and %d, not %d'
+                         % (count, index))
+    return Shard(index, count)
+
+
+def shard_index(path: str, count: int) -> int:
+    """Get the index of the shard to which the given relative path belongs.
+
+    The hash is computed from the path with ``/`` separators, so it
+    is the same for every machine, whatever its platform.
+    """
+    import hashlib
+    # Not for security, only a hash which is stable and well spread.
+    digest = hashlib.md5(path.encode('utf-8', 'surrogateescape')).digest()[:8]
+    return int.from_bytes(digest, 'little') % count + 1
+
+
+class Partition:
+    """Selects the files of a shard, counting every file it was asked about.
+
+    Only the files of the shard are kept. The other files are only
+    counted and added to a digest, so that the memory doesn't grow
+    with the whole directory.
+    """
+
+    def __init__(self, shard: Shard) -> None:
+        self.shard = shard
+        self.files = [] # type: typing.List[str]
+        self._discovered = 0
+        self._digest = 0
+
+    def owns(self, path: str) -> bool:
+        """Check if the given relative path belongs to the shard."""
+        self._discovered += 1
+        self._digest = (self._digest + _path_digest(path)) % _DIGEST_MODULUS
+        if shard_index(path, self.shard.count) != self.shard.index:
+            return False
+        self.files.append(path)
+        return True
+
+    def manifest(self) -> dict:
+        """Get the manifest of the shard, which can be serialised to JSON."""
+        return {
+            'version': _MANIFEST_VERSION,
+            'shard': list(self.shard),
+            'discovered': self._discovered,
+            'digest': '%064x' % self._digest,
+            'files': sorted(self.files),
+        }
+
+    def save(self, path: str) -> None:
+        """Write the manifest of the shard, as JSON, into the given file."""
+        with open(path, 'w') as stream:
+            json.dump(self.manifest(), stream, indent=1)
+
+
+_DIGEST_MODULUS = 2 ** 256
+
+
+def _path_digest(path: str) -> int:
+    import hashlib
+    digest = hashlib.sha256(path.encode('utf-8', 'surrogateescape')).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def _digest(paths: typing.Iterable[str]) -> str:
+    # The sum of the hashes of the paths, so that it can be updated as
+    # the files are discovered, in whatever order.
+    total = sum(_path_digest(path) for path in paths) % _DIGEST_MODULUS
+    return '%064x' % total
+
+
+def load_manifest(path: str) -> dict:
+    """Read the manifest of a shard, as written by :meth:`Partition.save`."""
+    with open(path) as stream:
+        manifest = json.load(stream)
+    if manifest.get('version') != _MANIFEST_VERSION:
+        raise ValueError('%s is not a shard manifest of version %d'
+                         % (path, _MANIFEST_VERSION))
+    return manifest
+
+
+def verify(manifests: typing.List[dict]) -> typing.List[str]:
+    """Check that the given manifests cover every file exactly once.
+
+    The manifests must come from every shard of the same partitioning,
+    over the same discovered files. The problems which were found
+    are returned, as messages.
+    """
+    if not manifests:
+        return ['no manifests were given']
+    problems = []
+    counts = {manifest['shard'][1] for manifest in manifests}
+    discovered = {(manifest['discovered'], manifest['digest']) for manifest in manifests}
+    if len(counts) > 1:
+        problems.append('the manifests are from different numbers of shards: %s'
+                        % ', '.join(map(str, sorted(counts))))
+    if len(discovered) > 1:
+        problems.append('the shards discovered different files')
+
+    indexes = collections.Counter(manifest['shard'][0] for manifest in manifests)
+    for index in range(1, max(counts) + 1):
+        if not indexes[index]:
+            problems.append('shard %d/%d is missing' % (index, max(counts)))
+        elif indexes[index] > 1:
+            problems.append('shard %d/%d was given %d times'
+                            % (index, max(counts), indexes[index]))
+
+    owners = collections.defaultdict(list) # type: typing.Dict[str, typing.List[int]]
+    for manifest in manifests:
+        for path in manifest['files']:
+            owners[path].append(manifest['shard'][0])
+    for path, shards in sorted(owners.items()):
+        if len(shards) > 1:
+            problems.append('%s was processed by the shards %s'
+                            % (path, ', '.join(map(str, shards))))
+
+    # The counts can match even when some files were missed, if as many
+    # files which weren't discovered were processed instead.
+    expected, digest = max(discovered)
+    if len(owners) != expected or _digest(owners) != digest:
+        problems.append('the %d processed files are not the %d discovered files'
+                        % (len(owners), expected))
+    return problems
+
+
+def merge(manifests: typing.List[dict]) -> dict:
+    """Merge the manifests of all the shards into the manifest of a single run."""
+    files = sorted({path for manifest in manifests for path in manifest['files']})
+    return {
+        'version': _MANIFEST_VERSION,
+        'shard': [1, 1],
+        'discovered': manifests[0]['discovered'],
+        'digest': manifests[0]['digest'],
+        'files': files,
+    }
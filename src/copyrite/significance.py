@@ -0,0 +1,112 @@
+"""Policies deciding if the contributions of an author are significant.
+
+The policies are evaluated lazily: the line counts of a contribution
+are retrieved from the backend only when a policy needs them, and the
+evaluation stops as soon as the outcome is known.
+"""
+
+import abc
+import typing
+
+from copyrite import vcs
+
+
+# pylint: disable=invalid-name
+Contributions = typing.List[vcs.Contribution]
+FetchStats = typing.Callable[[vcs.Contribution], vcs.DiffStat]
+AsyncFetchStats = typing.Callable[[vcs.Contribution], typing.Awaitable[vcs.DiffStat]]
+# pylint: enable=invalid-name
+
+
+class EvaluationStats:
+    """Counts how many line counts were fetched, and how many were not needed."""
+
+    def __init__(self, fetched: int = 0, skipped: int = 0) -> None:
+        self.fetched = fetched
+        self.skipped = skipped
+
+    def update(self, other: 'EvaluationStats') -> None:
+        """Add the counts of *other* to this object."""
+        self.fetched += other.fetched
+        self.skipped += other.skipped
+
+    def __repr__(self):
+        return 'EvaluationStats(fetched=%d, skipped=%d)' % (self.fetched, self.skipped)
+
+
+class SignificancePolicy(metaclass=abc.ABCMeta):
+    """Decides if the contributions of an author are significant."""
+
+    def __init__(self, change_positive_threshold: int, contributions_threshold: int) -> None:
+        self.change_positive_threshold = change_positive_threshold
+        self.contributions_threshold = contributions_threshold
+
+    @abc.abstractmethod
+    def is_significant(self, contributions: Contributions, fetch_stats: FetchStats) -> bool:
+        """Check if the contributions are significant.
+
+        *fetch_stats* retrieves the line counts of a contribution
+        and it should be called only when they are needed.
+        """
+
+    @abc.abstractmethod
+    async def ais_significant(self, contributions: Contributions,
+                              fetch_stats: AsyncFetchStats) -> bool:
+        """Asynchronous version of :meth:`is_significant`."""
+
+
+class CountPolicy(SignificancePolicy):
+    """The contributions are significant if there are enough of them."""
+
+    def is_significant(self, contributions: Contributions, fetch_stats: FetchStats) -> bool:
+        return len(contributions) >= self.contributions_threshold
+
+    async def ais_significant(self, contributions: Contributions,
+                              fetch_stats: AsyncFetchStats) -> bool:
+        return len(contributions) >= self.contributions_threshold
+
+
+class LinePolicy(SignificancePolicy):
+    """The contributions are significant if one of them added enough lines."""
+
+    def is_significant(self, contributions: Contributions, fetch_stats: FetchStats) -> bool:
+        return any(fetch_stats(contribution).added >= self.change_positive_threshold
+                   for contribution in contributions)
+
+    async def ais_significant(self, contributions: Contributions,
+                              fetch_stats: AsyncFetchStats) -> bool:
+        for contribution in contributions:
+            stats = await fetch_stats(contribution)
+            if stats.added >= self.change_positive_threshold:
+                return True
+        return False
+
+
+class CombinedPolicy(SignificancePolicy):
+    """The contributions are significant if either the count or the lines are enough.
+
+    The count is checked first, since it doesn't need any line counts.
+    """
+
+    def __init__(self, change_positive_threshold: int, contributions_threshold: int) -> None:
+        super().__init__(change_positive_threshold, contributions_threshold)
+        self._policies = [CountPolicy(change_positive_threshold, contributions_threshold),
+                          LinePolicy(change_positive_threshold, contributions_threshold)]
+
+    def is_significant(self, contributions: Contributions, fetch_stats: FetchStats) -> bool:
+        return any(policy.is_significant(contributions, fetch_stats)
+                   for policy in self._policies)
+
+    async def ais_significant(self, contributions: Contributions,
+                              fetch_stats: AsyncFetchStats) -> bool:
+        for policy in self._policies:
+            if await policy.ais_significant(contributions, fetch_stats):
+                return True
+        return False
+
+
+POLICIES = {
+    'count': CountPolicy,
+    'lines': LinePolicy,
+    'combined': CombinedPolicy,
+}
@@ -1,37 +1,131 @@
 """Defines a class for handling contributions and their spans."""
 
 import collections
-from typing import List, Optional
+import functools
+from typing import Iterable, Iterator, List, Optional, Union
 
 
 ContributionSpan = collections.namedtuple('ContributionSpan', 'author mail dates')
 _COPYRIGHT_HEADER = b"# Copyright (c) %s %s"
 
+# The year of the lowest bit of a YearSet.
+EPOCH = 1970
+# How many formatted notices are kept, since most files share their authors.
+_FORMAT_CACHE_SIZE = 4096
 
-def _format_spans(spans: List[List[int]]) -> str:
-    ordered = sorted(spans)
+
+class YearSet(int):
+    """A set of years, stored as the bits of an integer.
+
+    The bit *n* is set if the year ``1970 + n`` is in the set, so
+    merging two sets is a single ``|``. A set compares equal to
+    the lists of consecutive years which were used before it,
+    such as ``[[2001, 2002], [2005]]``.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_years(cls, years: Iterable[int]) -> 'YearSet':
+        """Build a set from the given years."""
+        bits = 0
+        for year in years:
+            if year < EPOCH:
+                raise ValueError('years before %d are not supported: %d' % (EPOCH, year))
+            bits |= 1 << (year - EPOCH)
+        return cls(bits)
+
+    @classmethod
+    def from_spans(cls, spans: Iterable[Iterable[int]]) -> 'YearSet':
+        """Build a set from lists of years, such as the ones from :meth:`spans`."""
+        return cls.from_years(year for span in spans for year in span)
+
+    @classmethod
+    def coerce(cls, dates: Union['YearSet', List[List[int]]]) -> 'YearSet':
+        """Get the given dates as a set, if they aren't one already."""
+        return dates if isinstance(dates, cls) else cls.from_spans(dates)
+
+    def runs(self) -> Iterator[tuple]:
+        """Get the first and the last year of each run of consecutive years."""
+        bits = int(self)
+        while bits:
+            start = (bits & -bits).bit_length() - 1
+            shifted = bits >> start
+            # Adding one carries through the run, the xor gets its length.
+            length = (shifted ^ (shifted + 1)).bit_length() - 1
+            yield EPOCH + start, EPOCH + start + length - 1
+            bits &= ~(((1 << length) - 1) << start)
+
+    def spans(self) -> List[List[int]]:
+        """Get the consecutive years, as lists of years."""
+        return [list(range(first, last + 1)) for first, last in self.runs()]
+
+    @property
+    def first(self) -> int:
+        """The earliest year from the set."""
+        return EPOCH + (self & -self).bit_length() - 1
+
+    def __eq__(self, other):
+        if isinstance(other, list):
+            try:
+                other = YearSet.from_spans(other)
+            except (TypeError, ValueError):
+                return False
+        return int.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = int.__hash__
+
+    def __repr__(self):
+        return 'YearSet(%r)' % self.spans()
+
+
+def _format_spans(spans: Union[YearSet, List[List[int]]]) -> str:
     formatted = []
-    for span in ordered:
-        if len(span) == 1:
-            formatted.append(str(span[0]))
+    for first, last in YearSet.coerce(spans).runs():
+        if first == last:
+            formatted.append(str(first))
         else:
-            head, tail = span[0], span[-1]
-            formatted.append("{}-{}".format(head, tail))
+            formatted.append("{}-{}".format(first, last))
     return ", ".join(formatted)
 
 
+def to_serializable(span: ContributionSpan) -> list:
+    """Get a representation of the span which can be serialized as JSON."""
+    return [span.author.decode('utf-8', 'surrogateescape'),
+            span.mail.decode('utf-8', 'surrogateescape'),
+            YearSet.coerce(span.dates).spans()]
+
+
+def from_serializable(data: list) -> ContributionSpan:
+    """Build a span from the output of :func:`to_serializable`."""
+    author, mail, dates = data
+    return ContributionSpan(author.encode('utf-8', 'surrogateescape'),
+                            mail.encode('utf-8', 'surrogateescape'),
+                            YearSet.from_spans(dates))
+
+
+@functools.lru_cache(maxsize=_FORMAT_CACHE_SIZE)
+def _format(header: bytes, author: bytes, mail: bytes, dates: YearSet) -> bytes:
+    if mail:
+        author = b"%s <%s>" % (author, mail)
+    formatted_spans = _format_spans(dates).encode()
+    return header % (formatted_spans, author) # type: ignore; fp
+
+
 def format_span(span: ContributionSpan,
                 # pylint: disable=bad-whitespace; fp..
                 copyright_header: Optional[str] = None) -> bytes:
-    """Format this contributions into a format suitable for files."""
+    """Format this contributions into a format suitable for files.
+
+    The notices are cached, since the same authors and years
+    are usually found in many files.
+    """
     if copyright_header is not None:
         header = copyright_header.encode()
     else:
         header = _COPYRIGHT_HEADER
 
-    if span.mail:
-        author = b"%s <%s>" % (span.author, span.mail)
-    else:
-        author = span.author
-    formatted_spans = _format_spans(span.dates).encode()
-    return header % (formatted_spans, author) # type: ignore; fp
+    return _format(header, span.author, span.mail, YearSet.coerce(span.dates))
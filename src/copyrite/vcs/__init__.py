@@ -1,8 +1,26 @@
 """Package which contains implementations of the needed functionality for various vcses."""
 
-from .base import Contribution, ChangeDiff, VCSBackend
-from .git import GitBackend
+from .base import Contribution, ChangeDiff, DiffStat, VCSBackend
+from .git import GitBackend, IndexedGitBackend, PersistentGitBackend
+
+
+def _object_database_backend(*args, **kwargs):
+    # The object database is imported only by the runs which read it,
+    # ``copyrite.vcs.odb.ObjectDatabaseBackend`` being the backend itself.
+    from .odb import ObjectDatabaseBackend
+    return ObjectDatabaseBackend(*args, **kwargs)
+
+
+def _snapshot_backend(*args, **kwargs):
+    # As above, for ``copyrite.vcs.snapshot.SnapshotBackend``.
+    from .snapshot import SnapshotBackend
+    return SnapshotBackend(*args, **kwargs)
+
 
 KNOWN_BACKENDS = {
-    'git': GitBackend
+    'git': GitBackend,
+    'git-index': IndexedGitBackend,
+    'git-persistent': PersistentGitBackend,
+    'git-odb': _object_database_backend,
+    'snapshot': _snapshot_backend,
 }
@@ -7,6 +7,7 @@ import typing
 
 Contribution = collections.namedtuple('Contribution', 'author mail date hash filename')
 ChangeDiff = collections.namedtuple('ChangeDiff', 'positive negative')
+DiffStat = collections.namedtuple('DiffStat', 'added removed')
 
 
 class VCSBackend(metaclass=abc.ABCMeta):
@@ -28,3 +29,74 @@ class VCSBackend(metaclass=abc.ABCMeta):
     @abc.abstractmethod
     def contribution_changes(self, contribution: Contribution, directory: str) -> ChangeDiff:
         """Get the changes that occurred in *change_hash*."""
+
+    def contribution_stats(self, contribution: Contribution, directory: str) -> DiffStat:
+        """Get the number of lines added and removed by the given contribution.
+
+        Backends should override this when they can count the lines
+        without retrieving them. The default implementation counts
+        the lines from :meth:`contribution_changes`.
+        """
+        changes = self.contribution_changes(contribution, directory)
+        return DiffStat(len(changes.positive), len(changes.negative))
+
+    async def afile_contributions(self, filename: str,
+                                  directory: str) -> typing.List[Contribution]:
+        """Asynchronous version of :meth:`file_contributions`.
+
+        The default implementation calls :meth:`file_contributions`
+        directly, which is fine for backends that don't wait
+        on anything, but blocks the event loop otherwise.
+        """
+        return self.file_contributions(filename, directory)
+
+    async def acontribution_stats(self, contribution: Contribution,
+                                  directory: str) -> DiffStat:
+        """Asynchronous version of :meth:`contribution_stats`.
+
+        The default implementation calls :meth:`contribution_stats` directly.
+        """
+        return self.contribution_stats(contribution, directory)
+
+    def prepare(self, directory: str) -> None:
+        """Prepare the backend for processing the files from *directory*.
+
+        This is called once, before any file is processed, and it
+        can be used by backends to do work which is shared by all
+        the files. The default implementation does nothing.
+        """
+
+    def close(self) -> None:
+        """Release the resources held by the backend.
+
+        This is called once, after every file was processed.
+        The default implementation does nothing.
+        """
+
+    def revision(self, directory: str) -> typing.Optional[str]:
+        """Get the current revision of the repository from *directory*.
+
+        None is returned by backends which can't tell which files
+        changed between two revisions.
+        """
+        return None
+
+    def tracked_files(self, directory: str) -> typing.Optional[typing.List[str]]:
+        """Get the files from *directory* which are tracked by the repository.
+
+        The files are relative to *directory*. None is returned
+        by backends which can't tell, in which case all the files
+        from the directory are considered.
+        """
+        return None
+
+    def changed_files(self, revision: str,
+                      directory: str) -> typing.Optional[typing.Set[str]]:
+        """Get the files which changed since *revision*.
+
+        The files are relative to *directory*, with renamed files
+        being reported under both their old and new names.
+        None is returned if the changes can't be determined,
+        for instance if *revision* no longer exists.
+        """
+        return None
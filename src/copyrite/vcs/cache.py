@@ -0,0 +1,160 @@
+"""Persistent cache for the information retrieved from a repository.
+
+Commits never change once they are made, so whatever was computed
+for a commit can be reused by every later run. The cache is an
+SQLite database, which is usually stored inside the repository's
+git directory (``.git/copyrite/cache.sqlite``).
+"""
+
+import os
+import threading
+import typing
+
+from . import base
+
+if typing.TYPE_CHECKING: # pragma: no cover
+    import sqlite3
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS changes (
+    hash TEXT NOT NULL,
+    path TEXT NOT NULL,
+    author BLOB NOT NULL,
+    mail BLOB NOT NULL,
+    added INTEGER NOT NULL,
+    removed INTEGER NOT NULL,
+    PRIMARY KEY (hash, path)
+);
+CREATE TABLE IF NOT EXISTS commits (
+    hash TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS logs (
+    head TEXT NOT NULL,
+    path TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    author BLOB NOT NULL,
+    mail BLOB NOT NULL,
+    year INTEGER NOT NULL,
+    PRIMARY KEY (head, path, position)
+);
+"""
+
+# Connections are shared by every StatsCache of a thread, since
+# the caches are pickled and sent to the workers with each task.
+# SQLite connections can't be used from another thread, nor from
+# a forked worker, so they are per thread and keyed by the pid.
+_LOCAL = threading.local()
+
+
+def _connect(path: str) -> 'sqlite3.Connection':
+    import sqlite3 # pylint: disable=redefined-outer-name
+    connections = getattr(_LOCAL, 'connections', None)
+    if connections is None:
+        connections = {} # type: typing.Dict[typing.Tuple[int, str], sqlite3.Connection]
+        _LOCAL.connections = connections
+    key = (os.getpid(), path)
+    try:
+        return connections[key]
+    except KeyError:
+        pass
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Multiple workers can write to the cache at the same time.
+    connection = sqlite3.connect(path, timeout=60)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.executescript(_SCHEMA)
+    connections[key] = connection
+    return connection
+
+
+class StatsCache:
+    """Cache of the per-commit, per-path statistics of a repository.
+
+    It stores the number of added and removed lines, together with
+    the author's identity, for every (commit, path) pair. It also
+    stores the contributions of each path, which are valid only
+    for a given HEAD of the repository.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    @property
+    def _connection(self) -> 'sqlite3.Connection':
+        return _connect(self.path)
+
+    def stats(self, change: str, path: str) -> typing.Optional[base.DiffStat]:
+        """Get the cached statistics of *path* in *change*, if any."""
+        row = self._connection.execute(
+            'SELECT added, removed FROM changes WHERE hash = ? AND path = ?',
+            (change, path)).fetchone()
+        return base.DiffStat(*row) if row else None
+
+    def store_stats(self, contribution: base.Contribution, path: str,
+                    stats: base.DiffStat) -> None:
+        """Store the statistics of the given contribution for *path*."""
+        with self._connection as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO changes VALUES (?, ?, ?, ?, ?, ?)',
+                (contribution.hash, path, contribution.author, contribution.mail,
+                 stats.added, stats.removed))
+
+    def commit_stats(self, change: str) -> typing.Optional[typing.Dict[str, base.DiffStat]]:
+        """Get the cached statistics of every path changed by *change*.
+
+        None is returned if they weren't all cached.
+        """
+        connection = self._connection
+        if not connection.execute('SELECT 1 FROM commits WHERE hash = ?', (change,)).fetchone():
+            return None
+        rows = connection.execute(
+            'SELECT path, added, removed FROM changes WHERE hash = ?', (change,))
+        return {path: base.DiffStat(added, removed) for path, added, removed in rows}
+
+    def store_commit_stats(self, contribution: base.Contribution,
+                           stats: typing.Dict[str, base.DiffStat]) -> None:
+        """Store the statistics of every path changed by the given contribution."""
+        with self._connection as connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO changes VALUES (?, ?, ?, ?, ?, ?)',
+                [(contribution.hash, path, contribution.author, contribution.mail,
+                  path_stats.added, path_stats.removed)
+                 for path, path_stats in stats.items()])
+            connection.execute('INSERT OR REPLACE INTO commits VALUES (?)',
+                               (contribution.hash,))
+
+    def contributions(self, head: str, path: str,
+                      filename: str) -> typing.Optional[typing.List[base.Contribution]]:
+        """Get the cached contributions of *path*, as seen from *head*.
+
+        The contributions will use the given *filename*.
+        None is returned when nothing was cached for this path.
+        """
+        rows = self._connection.execute(
+            'SELECT hash, author, mail, year FROM logs '
+            'WHERE head = ? AND path = ? ORDER BY position',
+            (head, path)).fetchall()
+        if not rows:
+            return None
+        # A path without history is stored as a single, empty, row.
+        return [base.Contribution(bytes(author), bytes(mail), year, change, filename)
+                for change, author, mail, year in rows if change]
+
+    def store_contributions(self, head: str, path: str,
+                            contributions: typing.List[base.Contribution]) -> None:
+        """Store the contributions of *path*, as seen from *head*."""
+        rows = [(head, path, position, contribution.hash,
+                 contribution.author, contribution.mail, contribution.date)
+                for position, contribution in enumerate(contributions)]
+        if not rows:
+            rows = [(head, path, 0, '', b'', b'', 0)]
+        with self._connection as connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO logs VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def prune(self, head: str) -> None:
+        """Drop the contributions which weren't cached for *head*."""
+        with self._connection as connection:
+            connection.execute('DELETE FROM logs WHERE head != ?', (head,))
@@ -1,49 +1,241 @@
 """Backend for the git vcs."""
 
-import datetime
+import collections
+import functools
+import os
 import subprocess
+import time
 import typing
 
+from copyrite import metrics
+
 from . import base
+from . import cache
+from . import index
+
+if typing.TYPE_CHECKING: # pragma: no cover
+    import asyncio
+
+# asyncio and multiprocessing are imported only when they are needed,
+# since importing them takes longer than a short run of the command line.
+
+
+# Indexes built by IndexedGitBackend, keyed by the repository's root
+# and its HEAD. They are kept at module level so that they are built
+# only once per process, instead of once per unpickled backend.
+_HISTORY_INDEXES = {} # type: typing.Dict[typing.Tuple[str, str], index.HistoryIndex]
+
+# The line counts of the paths changed by the most recent commits,
+# keyed by the repository's root and the commit. Shared by all
+# the files from a process, since a commit usually touches many files.
+_COMMIT_STATS = collections.OrderedDict() # type: typing.Dict[typing.Tuple[str, str], dict]
+_MAX_COMMIT_STATS = 1024
+# Commits whose line counts are being retrieved, by the asyncio engine.
+_PENDING_COMMIT_STATS = {} # type: typing.Dict[typing.Tuple[str, str], asyncio.Future]
+
+# Long-lived git processes used by PersistentGitBackend, keyed by
+# the pid as well, since they must not be shared with forked workers.
+_PIPES = {} # type: typing.Dict[typing.Tuple[int, str, str], _GitPipe]
+
+
+# How much is read at once from the output of a git command.
+_CHUNK_SIZE = 256 * 1024
+
+
+def _iter_records(stream: typing.BinaryIO,
+                  separator: bytes = b'\n') -> typing.Iterator[bytes]:
+    """Split the content of *stream* into records, while reading it.
+
+    Only a chunk of the stream is held in memory at any time, the
+    records being sliced out of it through a memoryview.
+    """
+    buffer = bytearray()
+    while True:
+        chunk = stream.read1(_CHUNK_SIZE) # type: ignore
+        if not chunk:
+            break
+        buffer += chunk
+        start = 0
+        with memoryview(buffer) as view:
+            end = buffer.find(separator, start)
+            while end != -1:
+                yield view[start:end].tobytes()
+                start = end + 1
+                end = buffer.find(separator, start)
+        del buffer[:start]
+    if buffer:
+        yield bytes(buffer)
+
+
+@functools.lru_cache(maxsize=None)
+def _find_toplevel(directory: str) -> str:
+    """Find the root of the repository which contains *directory*.
+
+    This is the equivalent of ``git rev-parse --show-toplevel``,
+    but it only looks at the file system.
+    """
+    current = os.path.abspath(directory)
+    while True:
+        if os.path.exists(os.path.join(current, '.git')):
+            return current
+        parent = os.path.dirname(current)
+        if parent == current:
+            raise ValueError('%r is not inside a git repository' % directory)
+        current = parent
 
 
-def _year_from_date(date: bytes) -> int:
-    return datetime.datetime.strptime(date.decode(), "%Y-%m-%d").year
+def _repository_path(filename: str, directory: str) -> typing.Tuple[str, str]:
+    """Get the root of the repository and the path of *filename* relative to it."""
+    toplevel = _find_toplevel(directory)
+    path = os.path.relpath(os.path.join(os.path.abspath(directory), filename), toplevel)
+    return toplevel, path.replace(os.sep, '/')
+
+
+def _find_git_directory(toplevel: str) -> str:
+    """Get the git directory of the repository from *toplevel*.
+
+    Worktrees and submodules have a ``.git`` file pointing to it.
+    """
+    dotgit = os.path.join(toplevel, '.git')
+    if os.path.isdir(dotgit):
+        return dotgit
+    with open(dotgit) as stream:
+        content = stream.read().strip()
+    prefix = 'gitdir:'
+    if not content.startswith(prefix):
+        raise ValueError('%r is not a valid .git file' % dotgit)
+    return os.path.join(toplevel, content[len(prefix):].strip())
+
+
+def _head(executable: str, toplevel: str) -> str:
+    popen = subprocess.Popen([executable, 'rev-parse', 'HEAD'], cwd=toplevel,
+                             stdout=subprocess.PIPE,
+                             stderr=subprocess.PIPE)
+    out, _ = popen.communicate()
+    return out.strip().decode()
+
+
+def _numstat_count(count: bytes) -> int:
+    # Binary files don't have line counts.
+    return 0 if count == b'-' else int(count)
+
+
+def _parse_commit_stats(entries: typing.Iterable[bytes]) -> typing.Dict[str, base.DiffStat]:
+    """Parse the ``--numstat -z`` entries of a commit, without renames."""
+    stats = {}
+    for entry in entries:
+        if not entry:
+            continue
+        added, removed, path = entry.split(b'\t', 2)
+        stats[os.fsdecode(path)] = base.DiffStat(_numstat_count(added),
+                                                 _numstat_count(removed))
+    return stats
+
+
+def _memoize_commit_stats(key: typing.Tuple[str, str],
+                          stats: typing.Dict[str, base.DiffStat]) -> None:
+    _COMMIT_STATS[key] = stats
+    if len(_COMMIT_STATS) > _MAX_COMMIT_STATS:
+        _COMMIT_STATS.popitem(last=False) # type: ignore
 
 
 class GitBackend(base.VCSBackend):
-    """Backend for the git vcs."""
+    """Backend for the git vcs.
+
+    If *use_cache* is True, then everything that was retrieved from
+    the repository is stored in a persistent cache from the git
+    directory, which is consulted before running any git command.
+    """
+
+    def __init__(self, use_cache: bool = False) -> None:
+        self.use_cache = use_cache
+        # The HEAD of each repository, as of the last :meth:`prepare`.
+        self._heads = {} # type: typing.Dict[str, str]
 
     @property
     def executable(self):
         return 'git'
 
+    def _head_of(self, toplevel: str) -> str:
+        try:
+            return self._heads[toplevel]
+        except KeyError:
+            pass
+        head = self._heads[toplevel] = _head(self.executable, toplevel)
+        return head
+
+    def _cache(self, toplevel: str) -> cache.StatsCache:
+        path = os.path.join(_find_git_directory(toplevel), 'copyrite', 'cache.sqlite')
+        return cache.StatsCache(path)
+
+    def prepare(self, directory: str) -> None:
+        toplevel = _find_toplevel(directory)
+        # Resolved again, since commits could have been made since the last run.
+        self._heads.pop(toplevel, None)
+        if self.use_cache:
+            self._cache(toplevel).prune(self._head_of(toplevel))
+
     @staticmethod
     def _parse_log_line(line: bytes, filename: str) -> base.Contribution:
-        name, mail, date, change = line.split(b'##')
-        year = _year_from_date(date)
-        return base.Contribution(name, mail, year, change.decode(), filename)
+        name, mail, year, change = line.split(b'\0')
+        return base.Contribution(name, mail, int(year), change.decode(), filename)
 
     @staticmethod
-    def _raw_line_parse(command: typing.List[str],
-                        vcs_directory: str) -> typing.List[bytes]:
+    def _iter_output(command: typing.List[str], vcs_directory: str,
+                     separator: bytes = b'\n') -> typing.Iterator[bytes]:
+        """Run the given command, yielding the records of its output as they come."""
 
+        start = time.perf_counter()
         popen = subprocess.Popen(command, cwd=vcs_directory,
                                  stdout=subprocess.PIPE,
-                                 stderr=subprocess.PIPE)
-        out, _ = popen.communicate()
-        return out.splitlines()
+                                 stderr=subprocess.DEVNULL)
+        try:
+            yield from _iter_records(popen.stdout, separator)
+        finally:
+            popen.stdout.close()
+            if popen.poll() is None:
+                # The consumer stopped early.
+                popen.kill()
+            popen.wait()
+            metrics.current().subprocess(command[1], time.perf_counter() - start)
+
+    @staticmethod
+    async def _araw_line_parse(command: typing.List[str],
+                               vcs_directory: str,
+                               separator: bytes = b'\n') -> typing.List[bytes]:
+
+        import asyncio # pylint: disable=redefined-outer-name
+        start = time.perf_counter()
+        process = await asyncio.create_subprocess_exec(*command, cwd=vcs_directory,
+                                                       stdout=subprocess.PIPE,
+                                                       stderr=subprocess.DEVNULL)
+        out, _ = await process.communicate()
+        metrics.current().subprocess(command[1], time.perf_counter() - start)
+        return out.split(separator)
+
+    @classmethod
+    def _raw_line_parse(cls, command: typing.List[str],
+                        vcs_directory: str) -> typing.List[bytes]:
+        return list(cls._iter_output(command, vcs_directory))
 
     def _log_command(self, filename):
-        return [self.executable, 'log', '--follow', '--format="%an##%ae##%ad##%H"',
-                '--date=short', filename]
+        return [self.executable, 'log', '--follow', '--format=%an%x00%ae%x00%ad%x00%H',
+                '--date=format:%Y', filename]
 
     def _change_command(self, change, filename):
         return [self.executable, 'show', '--format=oneline', change, filename]
 
-    def _raw_file_logs(self, filename: str, vcs_directory: str) -> typing.List[bytes]:
+    def _commit_stats_command(self, change):
+        return [self.executable, 'diff-tree', '--numstat', '-z', '-r', '--root',
+                '--no-renames', '--no-commit-id', change]
+
+    def _changed_files_command(self, revision):
+        return [self.executable, 'diff', '--name-status', '-z', '-M', '--relative',
+                revision, 'HEAD']
+
+    def _raw_file_logs(self, filename: str, vcs_directory: str) -> typing.Iterator[bytes]:
         command = self._log_command(filename)
-        return self._raw_line_parse(command, vcs_directory)
+        return self._iter_output(command, vcs_directory)
 
     def _raw_file_change(self, filename: str,
                          change: str,
@@ -52,12 +244,69 @@ class GitBackend(base.VCSBackend):
         command = self._change_command(change, filename)
         return self._raw_line_parse(command, vcs_directory)
 
+    def revision(self, directory: str) -> typing.Optional[str]:
+        return _head(self.executable, _find_toplevel(directory))
+
+    def tracked_files(self, directory: str) -> typing.Optional[typing.List[str]]:
+        popen = subprocess.Popen([self.executable, 'ls-files', '-z'], cwd=directory,
+                                 stdout=subprocess.PIPE,
+                                 stderr=subprocess.DEVNULL)
+        out, _ = popen.communicate()
+        if popen.returncode:
+            return None
+        return [os.fsdecode(path) for path in out.split(b'\0') if path]
+
+    def changed_files(self, revision: str,
+                      directory: str) -> typing.Optional[typing.Set[str]]:
+        popen = subprocess.Popen(self._changed_files_command(revision), cwd=directory,
+                                 stdout=subprocess.PIPE,
+                                 stderr=subprocess.PIPE)
+        out, _ = popen.communicate()
+        if popen.returncode:
+            return None
+
+        changed = set()
+        tokens = iter(out.split(b'\0'))
+        for status in tokens:
+            if not status:
+                continue
+            changed.add(os.fsdecode(next(tokens)))
+            if status[:1] in (b'R', b'C'):
+                # Renames and copies are followed by the new name.
+                changed.add(os.fsdecode(next(tokens)))
+        return changed
+
+    def iter_file_contributions(self, filename: str,
+                                directory: str) -> typing.Iterator[base.Contribution]:
+        """Get the contributions for the given file, as git reports them."""
+
+        for line in self._raw_file_logs(filename, directory):
+            if line:
+                yield self._parse_log_line(line, filename)
+
+    def _file_contributions(self, filename: str,
+                            directory: str) -> typing.List[base.Contribution]:
+        return list(self.iter_file_contributions(filename, directory))
+
+    async def _afile_contributions(self, filename: str,
+                                   directory: str) -> typing.List[base.Contribution]:
+        lines = await self._araw_line_parse(self._log_command(filename), directory)
+        return [self._parse_log_line(line, filename) for line in lines if line]
+
     def file_contributions(self, filename: str, directory: str) -> typing.List[base.Contribution]:
         """Get a list of contributions for the given file."""
 
-        raw_lines = self._raw_file_logs(filename, directory)
-        logs = [self._parse_log_line(line[1:-1], filename) for line in raw_lines]
-        return list(filter(None, logs))
+        if not self.use_cache:
+            return self._file_contributions(filename, directory)
+
+        toplevel, path = _repository_path(filename, directory)
+        stats_cache = self._cache(toplevel)
+        head = self._head_of(toplevel)
+        contributions = stats_cache.contributions(head, path, filename)
+        if contributions is None:
+            contributions = self._file_contributions(filename, directory)
+            stats_cache.store_contributions(head, path, contributions)
+        return contributions
 
     def contribution_changes(self, contribution: base.Contribution,
                              directory: str) -> base.ChangeDiff:
@@ -74,4 +323,332 @@ class GitBackend(base.VCSBackend):
             elif line.startswith(b'-'):
                 negative.append(line)
         return base.ChangeDiff(positive, negative)
-        
\ No newline at end of file
+
+    def _fetch_commit_stats(self, change: str,
+                            toplevel: str) -> typing.Dict[str, base.DiffStat]:
+        command = self._commit_stats_command(change)
+        return _parse_commit_stats(self._iter_output(command, toplevel, b'\0'))
+
+    async def _afetch_commit_stats(self, change: str,
+                                   toplevel: str) -> typing.Dict[str, base.DiffStat]:
+        command = self._commit_stats_command(change)
+        return _parse_commit_stats(await self._araw_line_parse(command, toplevel, b'\0'))
+
+    def _commit_stats(self, contribution: base.Contribution,
+                      toplevel: str) -> typing.Dict[str, base.DiffStat]:
+        """Get the line counts of every path changed by the contribution's commit.
+
+        They are retrieved once per commit, for all the files of
+        the process. With the persistent cache, they are also
+        shared with the other workers and with later runs.
+        """
+        key = (toplevel, contribution.hash)
+        try:
+            _COMMIT_STATS.move_to_end(key) # type: ignore
+            return _COMMIT_STATS[key]
+        except KeyError:
+            pass
+
+        stats = self._cache(toplevel).commit_stats(contribution.hash) if self.use_cache else None
+        if stats is None:
+            stats = self._fetch_commit_stats(contribution.hash, toplevel)
+            if self.use_cache:
+                self._cache(toplevel).store_commit_stats(contribution, stats)
+        _memoize_commit_stats(key, stats)
+        return stats
+
+    async def _afetch_and_memoize(self, contribution: base.Contribution,
+                                  toplevel: str) -> typing.Dict[str, base.DiffStat]:
+        key = (toplevel, contribution.hash)
+        try:
+            stats = self._cache(toplevel).commit_stats(contribution.hash) \
+                if self.use_cache else None
+            if stats is None:
+                stats = await self._afetch_commit_stats(contribution.hash, toplevel)
+                if self.use_cache:
+                    self._cache(toplevel).store_commit_stats(contribution, stats)
+            _memoize_commit_stats(key, stats)
+            return stats
+        finally:
+            del _PENDING_COMMIT_STATS[key]
+
+    async def _acommit_stats(self, contribution: base.Contribution,
+                             toplevel: str) -> typing.Dict[str, base.DiffStat]:
+        key = (toplevel, contribution.hash)
+        try:
+            _COMMIT_STATS.move_to_end(key) # type: ignore
+            return _COMMIT_STATS[key]
+        except KeyError:
+            pass
+
+        # Files waiting on the same commit share the same git command.
+        if key not in _PENDING_COMMIT_STATS:
+            import asyncio # pylint: disable=redefined-outer-name
+            _PENDING_COMMIT_STATS[key] = asyncio.ensure_future(
+                self._afetch_and_memoize(contribution, toplevel))
+        return await _PENDING_COMMIT_STATS[key]
+
+    def _contribution_stats(self, contribution: base.Contribution,
+                            directory: str) -> base.DiffStat:
+        toplevel, path = _repository_path(contribution.filename, directory)
+        return self._commit_stats(contribution, toplevel).get(path, base.DiffStat(0, 0))
+
+    async def _acontribution_stats(self, contribution: base.Contribution,
+                                   directory: str) -> base.DiffStat:
+        toplevel, path = _repository_path(contribution.filename, directory)
+        stats = await self._acommit_stats(contribution, toplevel)
+        return stats.get(path, base.DiffStat(0, 0))
+
+    def contribution_stats(self, contribution: base.Contribution,
+                           directory: str) -> base.DiffStat:
+        """Get a DiffStat object from a given contribution.
+
+        The lines are counted by git itself, so this stays cheap
+        regardless of how big the change is.
+        """
+
+        if not self.use_cache:
+            return self._contribution_stats(contribution, directory)
+
+        toplevel, path = _repository_path(contribution.filename, directory)
+        stats_cache = self._cache(toplevel)
+        stats = stats_cache.stats(contribution.hash, path)
+        if stats is None:
+            stats = self._contribution_stats(contribution, directory)
+            stats_cache.store_stats(contribution, path, stats)
+        return stats
+
+    async def afile_contributions(self, filename: str,
+                                  directory: str) -> typing.List[base.Contribution]:
+        """Get a list of contributions for the given file, without blocking."""
+
+        if not self.use_cache:
+            return await self._afile_contributions(filename, directory)
+
+        toplevel, path = _repository_path(filename, directory)
+        stats_cache = self._cache(toplevel)
+        head = self._head_of(toplevel)
+        contributions = stats_cache.contributions(head, path, filename)
+        if contributions is None:
+            contributions = await self._afile_contributions(filename, directory)
+            stats_cache.store_contributions(head, path, contributions)
+        return contributions
+
+    async def acontribution_stats(self, contribution: base.Contribution,
+                                  directory: str) -> base.DiffStat:
+        """Get a DiffStat object from a given contribution, without blocking."""
+
+        if not self.use_cache:
+            return await self._acontribution_stats(contribution, directory)
+
+        toplevel, path = _repository_path(contribution.filename, directory)
+        stats_cache = self._cache(toplevel)
+        stats = stats_cache.stats(contribution.hash, path)
+        if stats is None:
+            stats = await self._acontribution_stats(contribution, directory)
+            stats_cache.store_stats(contribution, path, stats)
+        return stats
+
+
+class IndexedGitBackend(GitBackend):
+    """Git backend which answers every query from a whole-repository index.
+
+    Instead of running a ``git log`` for each file and a ``git show``
+    for each of its contributions, two ``git log --numstat`` are run
+    over the whole repository, from which an in-memory
+    :class:`~copyrite.vcs.index.HistoryIndex` is built. The first one
+    follows the renames, as ``git log --follow`` does for a single
+    file, while the second one counts the lines without them, as
+    :meth:`GitBackend.contribution_stats` does, so that both
+    backends give the same results.
+    """
+
+    def _history_command(self):
+        return [self.executable, 'log', '-z', '--numstat', '-M',
+                '--format=%x01%H%x00%an%x00%ae%x00%ad', '--date=format:%Y']
+
+    def _history_stats_command(self):
+        return [self.executable, 'log', '-z', '--numstat', '--no-renames',
+                '--format=%x01%H']
+
+    @staticmethod
+    def _parse_history(tokens: typing.Iterator[bytes]) -> index.HistoryIndex:
+        history = index.HistoryIndex()
+        contribution = None
+        for token in tokens:
+            if token.startswith(b'\x01'):
+                name, mail, year = next(tokens), next(tokens), next(tokens)
+                contribution = base.Contribution(name, mail, int(year),
+                                                 token[1:].decode(), None)
+                continue
+            token = token.lstrip(b'\n')
+            if not token or contribution is None:
+                continue
+
+            _, _, path = token.split(b'\t', 2)
+            if path:
+                old_path = new_path = path
+            else:
+                # A rename, the two paths are the following fields.
+                old_path, new_path = next(tokens), next(tokens)
+            history.add(contribution, os.fsdecode(old_path), os.fsdecode(new_path))
+        return history
+
+    @staticmethod
+    def _parse_history_stats(tokens: typing.Iterator[bytes],
+                             history: index.HistoryIndex) -> None:
+        change = None
+        for token in tokens:
+            if token.startswith(b'\x01'):
+                change = token[1:].decode()
+                continue
+            token = token.lstrip(b'\n')
+            if not token or change is None:
+                continue
+            added, removed, path = token.split(b'\t', 2)
+            history.set_changes(change, os.fsdecode(path),
+                                _numstat_count(added), _numstat_count(removed))
+
+    def history_index(self, directory: str) -> index.HistoryIndex:
+        """Get the history index of the repository which contains *directory*."""
+        toplevel = _find_toplevel(directory)
+        key = (toplevel, self._head_of(toplevel))
+        try:
+            return _HISTORY_INDEXES[key]
+        except KeyError:
+            pass
+
+        tokens = self._iter_output(self._history_command(), toplevel, b'\0')
+        history = self._parse_history(tokens)
+        tokens = self._iter_output(self._history_stats_command(), toplevel, b'\0')
+        self._parse_history_stats(tokens, history)
+        # The indexes of the older HEADs won't be needed anymore.
+        for stale in [stale for stale in _HISTORY_INDEXES if stale[0] == toplevel]:
+            del _HISTORY_INDEXES[stale]
+        _HISTORY_INDEXES[key] = history
+        return history
+
+    def prepare(self, directory: str) -> None:
+        # The index already needs a single pass over the history,
+        # there's nothing to cache.
+        self._heads.pop(_find_toplevel(directory), None)
+        self.history_index(directory)
+
+    def file_contributions(self, filename: str, directory: str) -> typing.List[base.Contribution]:
+        """Get a list of contributions for the given file, from the index."""
+
+        toplevel, path = _repository_path(filename, directory)
+        history = self.history_index(toplevel)
+        return [contribution._replace(filename=filename)
+                for contribution in history.contributions(path)]
+
+    def contribution_stats(self, contribution: base.Contribution,
+                           directory: str) -> base.DiffStat:
+        """Get a DiffStat object from a given contribution, from the index."""
+
+        toplevel, path = _repository_path(contribution.filename, directory)
+        return base.DiffStat(*self.history_index(toplevel).changes(contribution.hash, path))
+
+    async def afile_contributions(self, filename: str,
+                                  directory: str) -> typing.List[base.Contribution]:
+        # The index is in memory, there's nothing to wait for.
+        return self.file_contributions(filename, directory)
+
+    async def acontribution_stats(self, contribution: base.Contribution,
+                                  directory: str) -> base.DiffStat:
+        return self.contribution_stats(contribution, directory)
+
+
+class _GitPipe:
+    """A long-lived git process which answers queries over its standard streams.
+
+    The process has to echo back the lines it doesn't understand,
+    which is used for finding where the answer to a query ends.
+    """
+
+    _SENTINEL = b'copyrite-end-of-query'
+    _CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, command: typing.List[str], directory: str) -> None:
+        self._process = subprocess.Popen(command, cwd=directory,
+                                          stdin=subprocess.PIPE,
+                                          stdout=subprocess.PIPE,
+                                          stderr=subprocess.DEVNULL,
+                                          bufsize=0)
+
+    def query(self, line: bytes) -> bytes:
+        """Send the given line to the process and get its answer."""
+        start = time.perf_counter()
+        self._process.stdin.write(line + b'\n' + self._SENTINEL + b'\n')
+        terminator = self._SENTINEL + b'\n'
+        chunks = []
+        tail = b''
+        while True:
+            chunk = self._process.stdout.read(self._CHUNK_SIZE)
+            if not chunk:
+                raise OSError('%r exited unexpectedly' % self._process.args)
+            chunks.append(chunk)
+            tail = (tail + chunk)[-len(terminator):]
+            if tail == terminator:
+                break
+        metrics.current().subprocess(self._process.args[1] + ' query',
+                                     time.perf_counter() - start)
+        return b''.join(chunks)[:-len(terminator)]
+
+    def close(self) -> None:
+        """Stop the process, by closing its input."""
+        if self._process.poll() is None:
+            self._process.stdin.close()
+            self._process.wait()
+        self._process.stdout.close()
+
+
+def _close_pipes(pid: int) -> None:
+    for key in [key for key in _PIPES if key[0] == pid]:
+        _PIPES.pop(key).close()
+
+
+class PersistentGitBackend(GitBackend):
+    """Git backend which keeps a long-lived ``git diff-tree --stdin`` per process.
+
+    The line counts of every contribution are obtained by streaming
+    the commit to that process, instead of starting a new ``git show``.
+    The contributions of a file still need a ``git log --follow``,
+    since git can't follow renames through a batch interface.
+    The processes are stopped when the worker which owns them exits.
+    """
+
+    def _diff_tree_command(self):
+        return [self.executable, 'diff-tree', '--stdin', '--numstat',
+                '-z', '-r', '--root', '--no-renames']
+
+    def _pipe(self, toplevel: str) -> _GitPipe:
+        pid = os.getpid()
+        key = (pid, self.executable, toplevel)
+        try:
+            return _PIPES[key]
+        except KeyError:
+            pass
+
+        if not any(existing[0] == pid for existing in _PIPES):
+            # Workers don't run atexit handlers, but they do run these.
+            import multiprocessing.util
+            multiprocessing.util.Finalize(None, _close_pipes, args=(pid,),
+                                          exitpriority=10)
+        pipe = _PIPES[key] = _GitPipe(self._diff_tree_command(), toplevel)
+        return pipe
+
+    def _fetch_commit_stats(self, change: str,
+                            toplevel: str) -> typing.Dict[str, base.DiffStat]:
+        answer = self._pipe(toplevel).query(change.encode())
+        # The answer starts with the commit's hash.
+        return _parse_commit_stats(answer.split(b'\0')[1:])
+
+    async def _afetch_commit_stats(self, change: str,
+                                   toplevel: str) -> typing.Dict[str, base.DiffStat]:
+        # Queries to the long-lived process are answered quickly and
+        # they can't be interleaved, so they are done synchronously.
+        return self._fetch_commit_stats(change, toplevel)
+
+    def close(self) -> None:
+        _close_pipes(os.getpid())
@@ -0,0 +1,83 @@
+"""In-memory index of a repository's history, keyed by path."""
+
+import collections
+import typing
+
+from . import base
+
+
+# pylint: disable=invalid-name
+_ContributionsByPath = typing.Dict[str, typing.List[base.Contribution]]
+_ChangesByCommit = typing.Dict[typing.Tuple[str, str], typing.Tuple[int, int]]
+# pylint: enable=invalid-name
+
+
+class HistoryIndex:
+    """Index of every contribution from a repository, grouped by path.
+
+    The index is built from a single walk over the whole history,
+    newest commits first. Renames are resolved while walking, so
+    the contributions of a path include the ones made under its
+    older names, just as ``git log --follow`` would report them.
+    Paths are relative to the root of the repository.
+    """
+
+    def __init__(self):
+        self._contributions = collections.defaultdict(list) # type: _ContributionsByPath
+        self._changes = {} # type: _ChangesByCommit
+        # Maps a path, as it is named at the current point of the walk,
+        # to the path under which its contributions are recorded.
+        self._owners = {} # type: typing.Dict[str, str]
+
+    def add(self, contribution: base.Contribution,
+            old_path: str, new_path: str) -> None:
+        """Record a change from the given contribution.
+
+        The changes have to be added in the order of the history,
+        from the newest commit to the oldest one. *old_path* and
+        *new_path* differ only when the change is a rename.
+        Its line counts are set afterwards, by :meth:`set_changes`.
+        """
+        path = self._owners.get(new_path, new_path)
+        if old_path != new_path:
+            self._owners.pop(new_path, None)
+            self._owners[old_path] = path
+        self.record(contribution, path, 0, 0)
+
+    def set_changes(self, change: str, path: str, added: int, removed: int) -> None:
+        """Set the line counts of *path* in *change*, if it was recorded."""
+        key = (change, path)
+        if key in self._changes:
+            self._changes[key] = (added, removed)
+
+    def record(self, contribution: base.Contribution, path: str,
+               added: int, removed: int) -> None:
+        """Record a change of *path*, whose renames were already resolved."""
+        key = (contribution.hash, path)
+        if key in self._changes:
+            # The same commit touched two paths which are followed
+            # under the same name, count them only once.
+            prev_added, prev_removed = self._changes[key]
+            self._changes[key] = (prev_added + added, prev_removed + removed)
+            return
+
+        self._changes[key] = (added, removed)
+        self._contributions[path].append(contribution._replace(filename=path))
+
+    def paths(self) -> typing.Iterator[str]:
+        """Get the paths which have contributions."""
+        return iter(self._contributions)
+
+    def contributions(self, path: str) -> typing.List[base.Contribution]:
+        """Get the contributions for the given path, newest first."""
+        return self._contributions.get(path, [])
+
+    def changes(self, change: str, path: str) -> typing.Tuple[int, int]:
+        """Get the number of added and removed lines of *path* in *change*."""
+        return self._changes.get((change, path), (0, 0))
+
+    def __contains__(self, path):
+        return path in self._contributions
+
+    def __len__(self):
+        return len(self._contributions)
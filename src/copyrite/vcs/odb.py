@@ -0,0 +1,639 @@
+"""Backend which reads the git object database directly, without running git.
+
+Loose objects and packfiles are both supported, the latter being
+read through their ``.idx`` files and a memory map of the pack.
+"""
+
+import collections
+import datetime
+import difflib
+import heapq
+import mmap
+import os
+import struct
+import typing
+import zlib
+
+from . import base
+from . import cache
+from . import git
+
+
+_OBJ_COMMIT = 1
+_OBJ_TREE = 2
+_OBJ_BLOB = 3
+_OBJ_TAG = 4
+_OBJ_OFS_DELTA = 6
+_OBJ_REF_DELTA = 7
+_TYPE_NAMES = {b'commit': _OBJ_COMMIT, b'tree': _OBJ_TREE,
+               b'blob': _OBJ_BLOB, b'tag': _OBJ_TAG}
+_IDX_MAGIC = b'\xfftOc'
+_TREE_MODE = b'40000'
+_SUBMODULE_MODE = b'160000'
+# How many bytes are looked at for deciding if a blob is binary, as git does.
+_BINARY_PROBE = 8000
+# Modulus of the chunk hashes used for estimating similarity, as git does.
+_HASH_BASE = 107927
+
+Commit = collections.namedtuple('Commit', 'tree parents author mail year timestamp')
+
+# Databases are kept at module level, so that they are opened once per
+# process, instead of once per unpickled backend.
+_DATABASES = {} # type: typing.Dict[str, ObjectDatabase]
+
+
+def _apply_delta(source: bytes, delta: bytes) -> bytes:
+    def _varint(position):
+        value = shift = 0
+        while True:
+            byte = delta[position]
+            position += 1
+            value |= (byte & 0x7f) << shift
+            shift += 7
+            if not byte & 0x80:
+                return value, position
+
+    _, position = _varint(0)
+    target_size, position = _varint(position)
+    target = bytearray()
+    while position < len(delta):
+        opcode = delta[position]
+        position += 1
+        if opcode & 0x80:
+            offset = size = 0
+            for bit in range(4):
+                if opcode & (1 << bit):
+                    offset |= delta[position] << (8 * bit)
+                    position += 1
+            for bit in range(3):
+                if opcode & (0x10 << bit):
+                    size |= delta[position] << (8 * bit)
+                    position += 1
+            target += source[offset:offset + (size or 0x10000)]
+        elif opcode:
+            target += delta[position:position + opcode]
+            position += opcode
+        else:
+            raise ValueError('invalid delta opcode')
+    if len(target) != target_size:
+        raise ValueError('delta produced %d bytes instead of %d' % (len(target), target_size))
+    return bytes(target)
+
+
+class _Pack:
+    """A packfile, together with its version 2 index."""
+
+    _CHUNK_SIZE = 64 * 1024
+    _CACHE_SIZE = 256
+
+    def __init__(self, idx_path: str) -> None:
+        with open(idx_path, 'rb') as stream:
+            index = stream.read()
+        if index[:4] != _IDX_MAGIC or struct.unpack('>I', index[4:8])[0] != 2:
+            raise ValueError('unsupported pack index %r' % idx_path)
+
+        self._fanout = struct.unpack('>256I', index[8:8 + 1024])
+        count = self._fanout[-1]
+        names_start = 8 + 1024
+        offsets_start = names_start + count * 20 + count * 4
+        self._names = index[names_start:names_start + count * 20]
+        self._offsets = index[offsets_start:offsets_start + count * 4]
+        self._large_offsets = index[offsets_start + count * 4:]
+
+        with open(idx_path[:-len('.idx')] + '.pack', 'rb') as stream:
+            self._data = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._data)
+        self._cache = collections.OrderedDict() # type: typing.Dict[int, tuple]
+
+    def _offset(self, position: int) -> int:
+        offset, = struct.unpack_from('>I', self._offsets, position * 4)
+        if offset & 0x80000000:
+            large = (offset & 0x7fffffff) * 8
+            offset, = struct.unpack_from('>Q', self._large_offsets, large)
+        return offset
+
+    def find(self, oid: bytes) -> typing.Optional[int]:
+        """Get the offset of the given binary object id, if it is in this pack."""
+        first = oid[0]
+        low = self._fanout[first - 1] if first else 0
+        high = self._fanout[first]
+        while low < high:
+            middle = (low + high) // 2
+            candidate = self._names[middle * 20:middle * 20 + 20]
+            if candidate < oid:
+                low = middle + 1
+            elif candidate > oid:
+                high = middle
+            else:
+                return self._offset(middle)
+        return None
+
+    def _inflate(self, position: int, size: int) -> bytes:
+        decompressor = zlib.decompressobj()
+        chunks = []
+        while not decompressor.eof:
+            chunk = self._view[position:position + self._CHUNK_SIZE]
+            if not chunk:
+                break
+            chunks.append(decompressor.decompress(chunk))
+            position += self._CHUNK_SIZE
+        data = b''.join(chunks)
+        if len(data) != size:
+            raise ValueError('corrupted pack object')
+        return data
+
+    def read(self, offset: int, database: 'ObjectDatabase') -> typing.Tuple[int, bytes]:
+        """Read the object at the given offset, resolving its deltas."""
+        try:
+            self._cache.move_to_end(offset)
+            return self._cache[offset]
+        except KeyError:
+            pass
+
+        data = self._data
+        byte = data[offset]
+        kind = (byte >> 4) & 7
+        size = byte & 0x0f
+        shift = 4
+        position = offset + 1
+        while byte & 0x80:
+            byte = data[position]
+            position += 1
+            size |= (byte & 0x7f) << shift
+            shift += 7
+
+        if kind == _OBJ_OFS_DELTA:
+            byte = data[position]
+            position += 1
+            distance = byte & 0x7f
+            while byte & 0x80:
+                byte = data[position]
+                position += 1
+                distance = ((distance + 1) << 7) | (byte & 0x7f)
+            kind, source = self.read(offset - distance, database)
+            result = (kind, _apply_delta(source, self._inflate(position, size)))
+        elif kind == _OBJ_REF_DELTA:
+            source_oid = bytes(data[position:position + 20])
+            kind, source = database.read(source_oid)
+            result = (kind, _apply_delta(source, self._inflate(position + 20, size)))
+        else:
+            result = (kind, self._inflate(position, size))
+
+        self._cache[offset] = result
+        if len(self._cache) > self._CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return result
+
+
+class ObjectDatabase:
+    """Reader for the objects of a git repository."""
+
+    def __init__(self, git_directory: str) -> None:
+        self.git_directory = git_directory
+        common = os.path.join(git_directory, 'commondir')
+        if os.path.exists(common):
+            # A worktree, which shares everything except HEAD.
+            with open(common) as stream:
+                self.common_directory = os.path.join(git_directory, stream.read().strip())
+        else:
+            self.common_directory = git_directory
+        self._object_directories = self._find_object_directories()
+        self._packs = [] # type: typing.List[_Pack]
+        self._load_packs()
+
+    def _find_object_directories(self) -> typing.List[str]:
+        directories = [os.path.join(self.common_directory, 'objects')]
+        alternates = os.path.join(directories[0], 'info', 'alternates')
+        if os.path.exists(alternates):
+            with open(alternates) as stream:
+                for line in stream:
+                    line = line.strip()
+                    if line and not line.startswith('#'):
+                        directories.append(os.path.join(directories[0], line))
+        return directories
+
+    def _load_packs(self) -> None:
+        self._packs = []
+        for directory in self._object_directories:
+            pack_directory = os.path.join(directory, 'pack')
+            if not os.path.isdir(pack_directory):
+                continue
+            for name in sorted(os.listdir(pack_directory)):
+                if name.endswith('.idx'):
+                    self._packs.append(_Pack(os.path.join(pack_directory, name)))
+
+    def _read_loose(self, hexsha: str) -> typing.Optional[typing.Tuple[int, bytes]]:
+        for directory in self._object_directories:
+            path = os.path.join(directory, hexsha[:2], hexsha[2:])
+            try:
+                with open(path, 'rb') as stream:
+                    raw = zlib.decompress(stream.read())
+            except FileNotFoundError:
+                continue
+            header, _, content = raw.partition(b'\0')
+            kind, _ = header.split(b' ')
+            return _TYPE_NAMES[kind], content
+        return None
+
+    def read(self, oid: bytes) -> typing.Tuple[int, bytes]:
+        """Read the object with the given binary id, returning its type and content."""
+        for attempt in range(2):
+            for pack in self._packs:
+                offset = pack.find(oid)
+                if offset is not None:
+                    return pack.read(offset, self)
+            loose = self._read_loose(oid.hex())
+            if loose is not None:
+                return loose
+            if not attempt:
+                # The repository could have been repacked meanwhile.
+                self._load_packs()
+        raise KeyError(oid.hex())
+
+    def _read_ref(self, name: str) -> typing.Optional[str]:
+        for directory in (self.git_directory, self.common_directory):
+            try:
+                with open(os.path.join(directory, name)) as stream:
+                    return stream.read().strip()
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+
+        try:
+            with open(os.path.join(self.common_directory, 'packed-refs')) as stream:
+                for line in stream:
+                    if line.startswith(('#', '^')):
+                        continue
+                    value, _, ref = line.strip().partition(' ')
+                    if ref == name:
+                        return value
+        except FileNotFoundError:
+            pass
+        return None
+
+    def resolve(self, name: str = 'HEAD') -> bytes:
+        """Resolve the given ref, following symbolic refs, to a binary object id."""
+        value = self._read_ref(name)
+        while value is not None and value.startswith('ref:'):
+            value = self._read_ref(value[len('ref:'):].strip())
+        if value is None:
+            raise KeyError(name)
+        return bytes.fromhex(value)
+
+
+def _parse_commit(content: bytes) -> Commit:
+    headers, _, _ = content.partition(b'\n\n')
+    tree = None
+    parents = []
+    author = mail = b''
+    year = timestamp = 0
+    for line in headers.split(b'\n'):
+        key, _, value = line.partition(b' ')
+        if key == b'tree':
+            tree = bytes.fromhex(value.decode())
+        elif key == b'parent':
+            parents.append(bytes.fromhex(value.decode()))
+        elif key == b'author':
+            author, _, rest = value.partition(b' <')
+            mail, _, date = rest.partition(b'> ')
+            seconds, offset = date.split(b' ')
+            sign = -1 if offset.startswith(b'-') else 1
+            minutes = int(offset[1:3]) * 60 + int(offset[3:5])
+            local = int(seconds) + sign * minutes * 60
+            # The year in the author's time zone, as --date=short reports it.
+            year = (datetime.datetime(1970, 1, 1) + datetime.timedelta(seconds=local)).year
+        elif key == b'committer':
+            timestamp = int(value.rsplit(b' ', 2)[1])
+    return Commit(tree, tuple(parents), author, mail, year, timestamp)
+
+
+def _parse_tree(content: bytes) -> typing.Dict[bytes, typing.Tuple[bytes, bytes]]:
+    entries = {}
+    position = 0
+    while position < len(content):
+        space = content.index(b' ', position)
+        null = content.index(b'\0', space)
+        mode = content[position:space]
+        name = content[space + 1:null]
+        entries[name] = (mode, content[null + 1:null + 21])
+        position = null + 21
+    return entries
+
+
+def _is_binary(data: bytes) -> bool:
+    return b'\0' in data[:_BINARY_PROBE]
+
+
+def _span_hashes(data: bytes) -> typing.Dict[int, int]:
+    """Count the bytes of each chunk of *data*, as git's diffcore-delta does.
+
+    Chunks end at a newline or after 64 bytes.
+    """
+    is_text = not _is_binary(data)
+    counts = collections.defaultdict(int) # type: typing.Dict[int, int]
+    accum1 = accum2 = length = 0
+    size = len(data)
+    for position, char in enumerate(data):
+        if is_text and char == 13 and position + 1 < size and data[position + 1] == 10:
+            continue
+        old = accum1
+        accum1 = (((accum1 << 7) ^ (accum2 >> 25)) + char) & 0xffffffff
+        accum2 = ((accum2 << 7) ^ (old >> 25)) & 0xffffffff
+        length += 1
+        if length < 64 and char != 10:
+            continue
+        counts[((accum1 + accum2 * 0x61) & 0xffffffff) % _HASH_BASE] += length
+        accum1 = accum2 = length = 0
+    if length:
+        counts[((accum1 + accum2 * 0x61) & 0xffffffff) % _HASH_BASE] += length
+    return counts
+
+
+def _similarity(source: bytes, destination: bytes) -> float:
+    """Estimate how similar two blobs are, between 0 and 1, as git does."""
+    max_size = max(len(source), len(destination))
+    base_size = min(len(source), len(destination))
+    if not destination or base_size < (max_size - base_size):
+        # Can't reach the default rename threshold of 50%.
+        return 0.0
+    source_counts = _span_hashes(source)
+    destination_counts = _span_hashes(destination)
+    copied = sum(min(count, destination_counts.get(key, 0))
+                 for key, count in source_counts.items())
+    return copied / max_size
+
+
+class ObjectDatabaseBackend(base.VCSBackend):
+    """Backend for git which reads the object database directly.
+
+    No git process is ever started, so this backend works even where
+    git is not installed. Contributions are found by walking the history
+    from HEAD and comparing the blob ids of the file between each commit
+    and its parents, following renames like ``git log --follow`` does,
+    which leaves out the merge commits. The line counts are computed in Python, with :mod:`difflib`.
+    """
+
+    _RENAME_SIMILARITY = 0.5
+    # Bounds for the parsed objects kept in memory. Once reached,
+    # the parsed objects are simply dropped and parsed again on demand.
+    _MAX_COMMITS = 500000
+    _MAX_TREES = 100000
+
+    def __init__(self, use_cache: bool = False) -> None:
+        self.use_cache = use_cache
+        self._commits = {} # type: typing.Dict[bytes, Commit]
+        self._trees = {} # type: typing.Dict[bytes, dict]
+
+    def __getstate__(self):
+        # The parsed objects are only a per-process cache.
+        state = self.__dict__.copy()
+        state['_commits'] = {}
+        state['_trees'] = {}
+        return state
+
+    @property
+    def executable(self):
+        # Nothing is ever executed.
+        return None
+
+    @staticmethod
+    def _database(toplevel: str) -> ObjectDatabase:
+        git_directory = git._find_git_directory(toplevel) # pylint: disable=protected-access
+        try:
+            return _DATABASES[git_directory]
+        except KeyError:
+            database = _DATABASES[git_directory] = ObjectDatabase(git_directory)
+            return database
+
+    def _commit(self, database: ObjectDatabase, oid: bytes) -> Commit:
+        try:
+            return self._commits[oid]
+        except KeyError:
+            pass
+        kind, content = database.read(oid)
+        while kind == _OBJ_TAG:
+            oid = bytes.fromhex(content.split(b'\n', 1)[0].split(b' ')[1].decode())
+            kind, content = database.read(oid)
+        if len(self._commits) >= self._MAX_COMMITS:
+            self._commits.clear()
+        commit = self._commits[oid] = _parse_commit(content)
+        return commit
+
+    def _tree(self, database: ObjectDatabase, oid: bytes) -> dict:
+        try:
+            return self._trees[oid]
+        except KeyError:
+            pass
+        _, content = database.read(oid)
+        if len(self._trees) >= self._MAX_TREES:
+            self._trees.clear()
+        tree = self._trees[oid] = _parse_tree(content)
+        return tree
+
+    def _lookup(self, database: ObjectDatabase, tree: bytes,
+                path: str) -> typing.Optional[bytes]:
+        """Get the blob id of *path* in the given tree, if it exists."""
+        components = os.fsencode(path).split(b'/')
+        for component in components[:-1]:
+            entry = self._tree(database, tree).get(component)
+            if entry is None or entry[0] != _TREE_MODE:
+                return None
+            tree = entry[1]
+        entry = self._tree(database, tree).get(components[-1])
+        if entry is None or entry[0] in (_TREE_MODE, _SUBMODULE_MODE):
+            return None
+        return entry[1]
+
+    def _changed_blobs(self, database: ObjectDatabase,
+                       old_tree: typing.Optional[bytes], new_tree: typing.Optional[bytes],
+                       prefix: bytes = b'') -> typing.Iterator[tuple]:
+        """Compare two trees by their ids, yielding (path, old blob, new blob)."""
+        if old_tree == new_tree:
+            return
+        old = self._tree(database, old_tree) if old_tree else {}
+        new = self._tree(database, new_tree) if new_tree else {}
+        for name in old.keys() | new.keys():
+            old_mode, old_oid = old.get(name, (None, None))
+            new_mode, new_oid = new.get(name, (None, None))
+            if old_oid == new_oid:
+                continue
+            path = prefix + name
+            old_is_tree = old_mode == _TREE_MODE
+            new_is_tree = new_mode == _TREE_MODE
+            if old_is_tree or new_is_tree:
+                yield from self._changed_blobs(database,
+                                               old_oid if old_is_tree else None,
+                                               new_oid if new_is_tree else None,
+                                               path + b'/')
+            if not old_is_tree or not new_is_tree:
+                yield (os.fsdecode(path),
+                       None if old_is_tree else old_oid,
+                       None if new_is_tree else new_oid)
+
+    def _blob_lines(self, database: ObjectDatabase,
+                    oid: typing.Optional[bytes]) -> typing.Optional[typing.List[bytes]]:
+        if oid is None:
+            return []
+        _, content = database.read(oid)
+        if _is_binary(content):
+            return None
+        return content.splitlines()
+
+    def _find_rename(self, database: ObjectDatabase, commit: Commit,
+                     parent: Commit, blob: bytes) -> typing.Optional[str]:
+        """Find the path in *parent* from which *blob* was renamed or copied in *commit*.
+
+        The sources are the paths which were deleted or modified by
+        the commit, scored with the same similarity estimate as git.
+        Unlike ``git log --follow``, copies from files which the commit
+        didn't touch are not looked for.
+        """
+        sources = [(path, old) for path, old, _ in
+                   self._changed_blobs(database, parent.tree, commit.tree)
+                   if old is not None]
+        for path, old in sources:
+            if old == blob:
+                return path
+
+        _, content = database.read(blob)
+        best, best_score = None, self._RENAME_SIMILARITY
+        for path, old in sources:
+            _, old_content = database.read(old)
+            score = _similarity(old_content, content)
+            if score >= best_score:
+                best, best_score = path, score
+        return best
+
+    def _history(self, database: ObjectDatabase,
+                 path: str) -> typing.Iterator[typing.Tuple[bytes, Commit]]:
+        """Walk the history of *path* from HEAD, newest commits first."""
+        head = database.resolve('HEAD')
+        queue = [(-self._commit(database, head).timestamp, head)]
+        seen = {head}
+        while queue:
+            _, oid = heapq.heappop(queue)
+            commit = self._commit(database, oid)
+            blob = self._lookup(database, commit.tree, path)
+            parents = [self._commit(database, parent) for parent in commit.parents]
+            parent_blobs = [self._lookup(database, parent.tree, path) for parent in parents]
+
+            if blob in parent_blobs:
+                # Unchanged from one of the parents, follow only that one.
+                followed = [commit.parents[parent_blobs.index(blob)]]
+            else:
+                followed = list(commit.parents)
+                # As with git log --follow, merges are never listed.
+                if (blob is not None or any(parent_blobs)) and len(parents) <= 1:
+                    yield oid, commit
+                if blob is not None and len(parents) == 1 and parent_blobs[0] is None:
+                    renamed = self._find_rename(database, commit, parents[0], blob)
+                    if renamed is not None:
+                        path = renamed
+
+            for parent in followed:
+                if parent not in seen:
+                    seen.add(parent)
+                    heapq.heappush(queue, (-self._commit(database, parent).timestamp, parent))
+
+    def _file_contributions(self, filename: str,
+                            directory: str) -> typing.List[base.Contribution]:
+        toplevel, path = git._repository_path(filename, directory) # pylint: disable=protected-access
+        database = self._database(toplevel)
+        return [base.Contribution(commit.author, commit.mail, commit.year, oid.hex(), filename)
+                for oid, commit in self._history(database, path)]
+
+    def file_contributions(self, filename: str, directory: str) -> typing.List[base.Contribution]:
+        """Get a list of contributions for the given file."""
+        if not self.use_cache:
+            return self._file_contributions(filename, directory)
+
+        toplevel, path = git._repository_path(filename, directory) # pylint: disable=protected-access
+        stats_cache = self._cache(toplevel)
+        head = self.revision(toplevel)
+        contributions = stats_cache.contributions(head, path, filename)
+        if contributions is None:
+            contributions = self._file_contributions(filename, directory)
+            stats_cache.store_contributions(head, path, contributions)
+        return contributions
+
+    def contribution_changes(self, contribution: base.Contribution,
+                             directory: str) -> base.ChangeDiff:
+        """Get a ChangeDiff object from a given contribution."""
+        toplevel, path = git._repository_path(contribution.filename, directory) # pylint: disable=protected-access
+        database = self._database(toplevel)
+        commit = self._commit(database, bytes.fromhex(contribution.hash))
+        new = self._blob_lines(database, self._lookup(database, commit.tree, path))
+        old = []
+        if commit.parents:
+            parent = self._commit(database, commit.parents[0])
+            old = self._blob_lines(database, self._lookup(database, parent.tree, path))
+        if old is None or new is None:
+            return base.ChangeDiff([], [])
+
+        positive = []
+        negative = []
+        matcher = difflib.SequenceMatcher(None, old, new, autojunk=False)
+        for tag, old_start, old_end, new_start, new_end in matcher.get_opcodes():
+            if tag in ('replace', 'delete'):
+                negative.extend(b'-' + line for line in old[old_start:old_end])
+            if tag in ('replace', 'insert'):
+                positive.extend(b'+' + line for line in new[new_start:new_end])
+        return base.ChangeDiff(positive, negative)
+
+    def contribution_stats(self, contribution: base.Contribution,
+                           directory: str) -> base.DiffStat:
+        """Get a DiffStat object from a given contribution."""
+        if not self.use_cache:
+            return super().contribution_stats(contribution, directory)
+
+        toplevel, path = git._repository_path(contribution.filename, directory) # pylint: disable=protected-access
+        stats_cache = self._cache(toplevel)
+        stats = stats_cache.stats(contribution.hash, path)
+        if stats is None:
+            stats = super().contribution_stats(contribution, directory)
+            stats_cache.store_stats(contribution, path, stats)
+        return stats
+
+    @staticmethod
+    def _cache(toplevel: str) -> cache.StatsCache:
+        # The lines are counted and the renames are followed differently
+        # than by git, so the results aren't shared with the git backends.
+        path = os.path.join(git._find_git_directory(toplevel), # pylint: disable=protected-access
+                            'copyrite', 'odb-cache.sqlite')
+        return cache.StatsCache(path)
+
+    def prepare(self, directory: str) -> None:
+        if self.use_cache:
+            toplevel = git._find_toplevel(directory) # pylint: disable=protected-access
+            self._cache(toplevel).prune(self.revision(toplevel))
+
+    def revision(self, directory: str) -> typing.Optional[str]:
+        toplevel = git._find_toplevel(directory) # pylint: disable=protected-access
+        return self._database(toplevel).resolve('HEAD').hex()
+
+    def tracked_files(self, directory: str) -> typing.Optional[typing.List[str]]:
+        # The index isn't read, so these are the files from the last commit.
+        toplevel = git._find_toplevel(directory) # pylint: disable=protected-access
+        database = self._database(toplevel)
+        head = self._commit(database, database.resolve('HEAD'))
+
+        prefix = os.path.relpath(os.path.abspath(directory), toplevel).replace(os.sep, '/')
+        prefix = '' if prefix == '.' else prefix + '/'
+        return [path[len(prefix):]
+                for path, _, _ in self._changed_blobs(database, None, head.tree)
+                if path.startswith(prefix)]
+
+    def changed_files(self, revision: str,
+                      directory: str) -> typing.Optional[typing.Set[str]]:
+        toplevel = git._find_toplevel(directory) # pylint: disable=protected-access
+        database = self._database(toplevel)
+        try:
+            old = self._commit(database, bytes.fromhex(revision))
+        except (KeyError, ValueError):
+            return None
+        new = self._commit(database, database.resolve('HEAD'))
+
+        prefix = os.path.relpath(os.path.abspath(directory), toplevel).replace(os.sep, '/')
+        prefix = '' if prefix == '.' else prefix + '/'
+        return {path[len(prefix):]
+                for path, _, _ in self._changed_blobs(database, old.tree, new.tree)
+                if path.startswith(prefix)}
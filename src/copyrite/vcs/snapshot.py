@@ -0,0 +1,277 @@
+"""Offline snapshots of the history which is relevant for copyrights.
+
+A snapshot holds, for every file, the author, mail and year of each
+of its contributions and the lines they added and removed, with renames
+already resolved. It is exported once from a full clone and it can
+then be replayed by :class:`SnapshotBackend` without any git access.
+
+The file is a zlib stream with a small header, followed by columns of
+little-endian unsigned integers and tables of NUL terminated strings::
+
+    magic, version
+    root                         (the directory the snapshot was taken from)
+    authors, mails, paths        (string tables)
+    hashes                       (binary commit ids)
+    commit author, mail, year    (one column each, indexing the tables)
+    record path, commit, added, removed
+
+The paths, including the root, are relative to the root of the repository,
+so the snapshot can be replayed for any directory of another checkout.
+"""
+
+import array
+import collections
+import io
+import os
+import struct
+import sys
+import typing
+import zlib
+
+from . import base
+from . import git
+from . import index
+
+
+_MAGIC = b'CPYSNAP'
+_VERSION = 2
+_HEADER = struct.Struct('<7sB')
+_LENGTH = struct.Struct('<Q')
+# The columns are made of 32 bit unsigned integers.
+_COLUMN_TYPE = 'I' if array.array('I').itemsize == 4 else 'L'
+
+# The history of the files from *root*, a directory relative to the root
+# of the repository, which is empty for the root itself.
+Snapshot = collections.namedtuple('Snapshot', 'root history')
+
+# Snapshots are kept at module level, so that they are loaded once per
+# process, instead of once per unpickled backend.
+_SNAPSHOTS = {} # type: typing.Dict[str, Snapshot]
+
+
+def _write_column(stream: typing.BinaryIO, values: typing.Iterable[int]) -> None:
+    column = array.array(_COLUMN_TYPE, values)
+    if sys.byteorder == 'big':
+        column.byteswap()
+    stream.write(_LENGTH.pack(len(column)))
+    stream.write(column.tobytes())
+
+
+def _read_column(data: memoryview, position: int) -> typing.Tuple[array.array, int]:
+    count, = _LENGTH.unpack_from(data, position)
+    position += _LENGTH.size
+    column = array.array(_COLUMN_TYPE)
+    end = position + count * column.itemsize
+    column.frombytes(data[position:end])
+    if sys.byteorder == 'big':
+        column.byteswap()
+    return column, end
+
+
+def _write_blob(stream: typing.BinaryIO, blob: bytes) -> None:
+    stream.write(_LENGTH.pack(len(blob)))
+    stream.write(blob)
+
+
+def _read_blob(data: memoryview, position: int) -> typing.Tuple[bytes, int]:
+    length, = _LENGTH.unpack_from(data, position)
+    position += _LENGTH.size
+    return data[position:position + length].tobytes(), position + length
+
+
+def _write_strings(stream: typing.BinaryIO, values: typing.List[bytes]) -> None:
+    # Terminated instead of separated, so that a single empty string
+    # can be told apart from no strings at all.
+    _write_blob(stream, b''.join(value + b'\0' for value in values))
+
+
+def _read_strings(data: memoryview, position: int) -> typing.Tuple[typing.List[bytes], int]:
+    blob, position = _read_blob(data, position)
+    return blob.split(b'\0')[:-1], position
+
+
+class _Table:
+    """Assigns consecutive indexes to distinct values."""
+
+    def __init__(self):
+        self.indexes = {} # type: typing.Dict[typing.Any, int]
+
+    def __call__(self, value) -> int:
+        return self.indexes.setdefault(value, len(self.indexes))
+
+    def values(self) -> list:
+        """Get the values of the table, in the order of their indexes."""
+        return list(self.indexes)
+
+
+def write_snapshot(history: index.HistoryIndex, stream: typing.BinaryIO,
+                   root: str = '') -> int:
+    """Write the given history to *stream*, returning the number of files.
+
+    Only the paths under the directory *root*, relative to the
+    root of the repository, are written.
+    """
+    prefix = root + '/' if root else ''
+    authors, mails, paths, commits = _Table(), _Table(), _Table(), _Table()
+    commit_rows = []
+    records = ([], [], [], []) # type: typing.Tuple[list, list, list, list]
+    for path in sorted(history.paths()):
+        if not path.startswith(prefix):
+            continue
+        path_index = paths(os.fsencode(path))
+        for contribution in history.contributions(path):
+            commit_index = commits(contribution.hash)
+            if commit_index == len(commit_rows):
+                commit_rows.append((authors(contribution.author),
+                                    mails(contribution.mail),
+                                    contribution.date))
+            added, removed = history.changes(contribution.hash, path)
+            for column, value in zip(records, (path_index, commit_index, added, removed)):
+                column.append(value)
+
+    hashes = commits.values()
+    hash_size = len(hashes[0]) // 2 if hashes else 20
+    output = io.BytesIO()
+    _write_strings(output, [os.fsencode(root)])
+    for table in (authors, mails, paths):
+        _write_strings(output, table.values())
+    _write_blob(output, struct.pack('<B', hash_size) +
+                b''.join(bytes.fromhex(change) for change in hashes))
+    for position in range(3):
+        _write_column(output, (row[position] for row in commit_rows))
+    for column in records:
+        _write_column(output, column)
+    stream.write(_HEADER.pack(_MAGIC, _VERSION))
+    stream.write(zlib.compress(output.getvalue(), 9))
+    return len(paths.indexes)
+
+
+def read_snapshot(stream: typing.BinaryIO) -> Snapshot:
+    """Read a snapshot written by :func:`write_snapshot`."""
+    magic, version = _HEADER.unpack(stream.read(_HEADER.size))
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError('not a copyrite snapshot, or an unsupported version')
+    data = memoryview(zlib.decompress(stream.read()))
+
+    position = 0
+    (root,), position = _read_strings(data, position)
+    authors, position = _read_strings(data, position)
+    mails, position = _read_strings(data, position)
+    paths, position = _read_strings(data, position)
+    raw_hashes, position = _read_blob(data, position)
+    hash_size = raw_hashes[0]
+    hashes = [raw_hashes[start:start + hash_size].hex()
+              for start in range(1, len(raw_hashes), hash_size)]
+    commit_columns = []
+    for _ in range(3):
+        column, position = _read_column(data, position)
+        commit_columns.append(column)
+    record_columns = []
+    for _ in range(4):
+        column, position = _read_column(data, position)
+        record_columns.append(column)
+
+    commits = [base.Contribution(authors[author], mails[mail], year, change, None)
+               for change, author, mail, year in zip(hashes, *commit_columns)]
+    decoded_paths = [os.fsdecode(path) for path in paths]
+    history = index.HistoryIndex()
+    for path, commit, added, removed in zip(*record_columns):
+        history.record(commits[commit], decoded_paths[path], added, removed)
+    return Snapshot(os.fsdecode(root), history)
+
+
+def _repository_root(directory: str) -> str:
+    toplevel = git._find_toplevel(directory) # pylint: disable=protected-access
+    root = os.path.relpath(os.path.abspath(directory), toplevel).replace(os.sep, '/')
+    return '' if root == '.' else root
+
+
+def take_snapshot(directory: str, stream: typing.BinaryIO) -> int:
+    """Write a snapshot of the files from *directory* to *stream*.
+
+    The history is read from the git repository containing the
+    directory. Return the number of files which were written.
+    """
+    history = git.IndexedGitBackend().history_index(directory)
+    return write_snapshot(history, stream, _repository_root(directory))
+
+
+class SnapshotBackend(base.VCSBackend):
+    """Backend which replays the history from a snapshot file.
+
+    The directory given to :meth:`prepare` is located in the repository
+    through its git directory, if the checkout has one. Otherwise, it
+    has to be the directory the snapshot was taken from.
+    """
+
+    def __init__(self, snapshot: str) -> None:
+        self.snapshot = os.path.abspath(snapshot)
+        self.directory = None # type: typing.Optional[str]
+        # The directory, relative to the root of the repository.
+        self.root = None # type: typing.Optional[str]
+
+    @property
+    def executable(self):
+        # Nothing is ever executed.
+        return None
+
+    def _load(self) -> Snapshot:
+        try:
+            return _SNAPSHOTS[self.snapshot]
+        except KeyError:
+            pass
+        with open(self.snapshot, 'rb') as stream:
+            loaded = _SNAPSHOTS[self.snapshot] = read_snapshot(stream)
+        return loaded
+
+    def history_index(self) -> index.HistoryIndex:
+        """Get the history stored in the snapshot."""
+        return self._load().history
+
+    def prepare(self, directory: str) -> None:
+        loaded = self._load()
+        try:
+            root = _repository_root(directory)
+        except ValueError:
+            # Not a checkout, the paths can't be rebased.
+            root = loaded.root
+        self.directory = os.path.abspath(directory)
+        self.root = root
+
+        prefix = root + '/' if root else ''
+        if len(loaded.history) and not any(path.startswith(prefix)
+                                           for path in loaded.history.paths()):
+            raise ValueError('the snapshot %s, taken from %r, has no files from %s'
+                             % (self.snapshot, loaded.root or '.', directory))
+
+    def tracked_files(self, directory: str) -> typing.Optional[typing.List[str]]:
+        prefix = self._path('', directory).rstrip('/')
+        prefix = '' if prefix == '.' else prefix + '/'
+        return [path[len(prefix):] for path in self.history_index().paths()
+                if path.startswith(prefix)]
+
+    def _path(self, filename: str, directory: str) -> str:
+        if self.directory is None:
+            raise ValueError('prepare() has to be called before using the snapshot')
+        path = os.path.relpath(os.path.join(os.path.abspath(directory), filename),
+                               self.directory).replace(os.sep, '/')
+        if not self.root:
+            return path
+        return self.root if path == '.' else self.root + '/' + path
+
+    def file_contributions(self, filename: str, directory: str) -> typing.List[base.Contribution]:
+        """Get a list of contributions for the given file, from the snapshot."""
+        path = self._path(filename, directory)
+        return [contribution._replace(filename=filename)
+                for contribution in self.history_index().contributions(path)]
+
+    def contribution_changes(self, contribution: base.Contribution,
+                             directory: str) -> base.ChangeDiff:
+        """The snapshot doesn't store the lines, so the changes are always empty."""
+        return base.ChangeDiff([], [])
+
+    def contribution_stats(self, contribution: base.Contribution,
+                           directory: str) -> base.DiffStat:
+        """Get a DiffStat object from a given contribution, from the snapshot."""
+        path = self._path(contribution.filename, directory)
+        return base.DiffStat(*self.history_index().changes(contribution.hash, path))
@@ -0,0 +1,38 @@
+import os
+import subprocess
+
+import pytest
+
+
+def _git(repository, *args, name='John', mail='john@xyz.com', date='2014-01-01T00:00:00'):
+    env = dict(os.environ,
+               GIT_AUTHOR_NAME=name, GIT_AUTHOR_EMAIL=mail, GIT_AUTHOR_DATE=date,
+               GIT_COMMITTER_NAME=name, GIT_COMMITTER_EMAIL=mail, GIT_COMMITTER_DATE=date)
+    subprocess.check_call(['git'] + list(args), cwd=repository, env=env,
+                          stdout=subprocess.DEVNULL)
+
+
+def _write(path, content):
+    with open(path, 'w') as stream:
+        stream.write(content)
+
+
+@pytest.fixture
+def repository(tmpdir):
+    repository = str(tmpdir)
+    os.mkdir(os.path.join(repository, 'pkg'))
+    _git(repository, 'init', '-q')
+
+    _write(os.path.join(repository, 'pkg', 'a.py'), 'a\nb\nc\n')
+    _write(os.path.join(repository, 'pkg', 'b.py'), 'x\n')
+    _git(repository, 'add', '.')
+    _git(repository, 'commit', '-q', '-m', 'first')
+
+    _write(os.path.join(repository, 'pkg', 'a.py'), 'a\nb\nc\nd\ne\n')
+    _git(repository, 'commit', '-q', '-a', '-m', 'second',
+         name='Mika', mail='mika@abc.com', date='2015-01-01T00:00:00')
+
+    _git(repository, 'mv', 'pkg/a.py', 'pkg/renamed.py')
+    _git(repository, 'commit', '-q', '-m', 'rename',
+         name='Vic', mail='vic@abc.com', date='2016-01-01T00:00:00')
+    return repository
@@ -1,4 +1,7 @@
+import pickle
+
 from copyrite import alias
+from copyrite import mailmap
 from copyrite.vcs import Contribution
 
 import pytest
@@ -39,3 +42,108 @@ def test_candidates_replaced(aliases, contributions):
     assert len(xyz) == 2
     assert len(abc) == 3
     assert all(contribution.mail == 'a@abc.com' for contribution in abc)
+
+
+def test_index_gives_the_same_results(aliases, contributions):
+    index = alias.AliasIndex(aliases)
+
+    assert (sorted(alias.apply_aliases(contributions, index))
+            == sorted(alias.apply_aliases(contributions, aliases)))
+
+
+def test_index_copies_share_their_memo(aliases, contributions):
+    index = alias.AliasIndex(aliases)
+    # As the process engine sends it with each task.
+    first, second = (pickle.loads(pickle.dumps(index)) for _ in range(2))
+
+    other = pickle.loads(pickle.dumps(alias.AliasIndex(aliases)))
+
+    first.resolve('John', 'john@xyz.com')
+
+    # pylint: disable=protected-access
+    assert second._resolved is first._resolved
+    assert second._resolved == {('John', 'john@xyz.com'): ('ABC', 'a@abc.com')}
+    assert other._resolved == {}
+
+
+def test_index_domain_wildcards():
+    index = alias.AliasIndex([
+        alias.Alias(b'Vic', [b'vic@abc.com']),
+        alias.Alias(b'ABC', [b'*@abc.com'], b'team@abc.com'),
+    ])
+
+    assert index.find(b'vic@abc.com').name == b'Vic'
+    assert index.find(b'mika@abc.com').name == b'ABC'
+    assert index.find(b'mika@abc.com.org') is None
+    assert index.find(b'mika@xyz.com') is None
+
+
+def test_index_ignore_case():
+    aliases = [alias.Alias(b'Vic', [b'Vic@ABC.com']), alias.Alias(b'XYZ', [b'*@Xyz.com'])]
+
+    assert alias.AliasIndex(aliases).find(b'vic@abc.com') is None
+    index = alias.AliasIndex(aliases, ignore_case=True)
+    assert index.find(b'vic@abc.com').name == b'Vic'
+    assert index.find(b'JOHN@XYZ.COM').name == b'XYZ'
+
+
+def test_index_first_alias_wins():
+    index = alias.AliasIndex([alias.Alias(b'First', [b'a@b.com']),
+                              alias.Alias(b'Second', [b'a@b.com'])])
+
+    assert index.find(b'a@b.com').name == b'First'
+
+
+def test_parse_mailmap_forms():
+    entries = mailmap.parse_mailmap([
+        b'# A comment\n',
+        b'Proper Name <commit@a.com>\n',
+        b'<proper@b.com> <commit@b.com>\n',
+        b'Other Name <proper@c.com> <commit@c.com> # trailing comment\n',
+        b'Last Name <proper@d.com> Commit Name <commit@d.com>\n',
+        b'<lonely@mail.com>\n',
+        b'\n',
+    ])
+
+    assert entries == [
+        mailmap.MailmapEntry(b'Proper Name', None, None, b'commit@a.com'),
+        mailmap.MailmapEntry(None, b'proper@b.com', None, b'commit@b.com'),
+        mailmap.MailmapEntry(b'Other Name', b'proper@c.com', None, b'commit@c.com'),
+        mailmap.MailmapEntry(b'Last Name', b'proper@d.com', b'Commit Name', b'commit@d.com'),
+    ]
+
+
+def test_mailmap_resolve():
+    mapping = mailmap.Mailmap(mailmap.parse_mailmap([
+        b'Proper Name <commit@a.com>\n',
+        b'<proper@b.com> <Commit@B.com>\n',
+        b'Jane <jane@d.com> Commit Name <commit@d.com>\n',
+        b'Joe <joe@d.com> <commit@d.com>\n',
+    ]))
+
+    assert mapping.resolve(b'Name', b'commit@a.com') == (b'Proper Name', b'commit@a.com')
+    assert mapping.resolve(b'Name', b'commit@b.com') == (b'Name', b'proper@b.com')
+    assert mapping.resolve(b'commit name', b'commit@d.com') == (b'Jane', b'jane@d.com')
+    assert mapping.resolve(b'Someone', b'commit@d.com') == (b'Joe', b'joe@d.com')
+    assert mapping.resolve(b'Someone', b'unknown@d.com') == (b'Someone', b'unknown@d.com')
+
+
+def test_index_applies_mailmap_before_aliases():
+    mapping = mailmap.Mailmap(mailmap.parse_mailmap([
+        b'Vic <vic@abc.com> <old@vic.com>\n',
+        b'Johnny <john@xyz.com>\n',
+    ]))
+    index = alias.AliasIndex([alias.Alias(b'ABC', [b'vic@abc.com'], b'a@abc.com')],
+                             mailmap=mapping)
+    contributions = [
+        Contribution(b'Victor', b'old@vic.com', 2013, 'a', None),
+        Contribution(b'John', b'john@xyz.com', 2014, 'b', None),
+        Contribution(b'Mika', b'mika@abc.com', 2015, 'c', None),
+    ]
+
+    assert [(contribution.author, contribution.mail)
+            for contribution in alias.apply_aliases(contributions, index)] == [
+                (b'ABC', b'a@abc.com'),
+                (b'Johnny', b'john@xyz.com'),
+                (b'Mika', b'mika@abc.com'),
+            ]
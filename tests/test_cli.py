@@ -54,3 +54,43 @@ def test_with_copyrights_without_c():
     lines = cli.insert_copyrights(copyrights, lines_with_copyright)
 
     assert lines == copyrights + lines_with_copyright[1:]
+
+
+def test_write_copyrights_keeps_the_rest_of_the_file(tmpdir, monkeypatch):
+    monkeypatch.setattr(cli, '_HEADER_WINDOW', 16)
+    body = b''.join(b'line %d\n' % index for index in range(100))
+    path = tmpdir.join('module.py')
+    path.write_binary(b'# Copyright (c) 2014 John\n' + body)
+
+    assert cli.write_copyrights(str(path), [b'# Copyright (c) 2014-2015 John\n'])
+    assert path.read_binary() == b'# Copyright (c) 2014-2015 John\n' + body
+
+
+def test_write_copyrights_reads_all_the_notices(tmpdir, monkeypatch):
+    monkeypatch.setattr(cli, '_HEADER_WINDOW', 16)
+    path = tmpdir.join('module.py')
+    path.write_binary(b'# Copyright (c) 2014 John\n' * 5 + b'code\n')
+
+    assert cli.write_copyrights(str(path), [b'# Copyright (c) 2015 Mika\n'])
+    assert path.read_binary() == b'# Copyright (c) 2015 Mika\ncode\n'
+
+
+def test_write_copyrights_reads_the_whole_header(tmpdir, monkeypatch):
+    monkeypatch.setattr(cli, '_HEADER_WINDOW', 16)
+    path = tmpdir.join('module.py')
+    comments = b'# a long comment\n' * 10 + b'\n'
+    path.write_binary(comments + b'# Copyright (c) 2014 John\ncode\n')
+
+    assert cli.write_copyrights(str(path), [b'# Copyright (c) 2015 Mika\n'],
+                                process_missing=True)
+    assert path.read_binary() == comments + b'# Copyright (c) 2015 Mika\ncode\n'
+
+
+def test_write_copyrights_skips_unchanged_files(tmpdir):
+    path = tmpdir.join('module.py')
+    path.write_binary(b'# Copyright (c) 2014 John\ncode\n')
+    inode = path.stat().ino
+
+    assert not cli.write_copyrights(str(path), [b'# Copyright (c) 2014 John\n'])
+    assert path.stat().ino == inode
+    assert not cli.write_copyrights(str(tmpdir.join('empty.py').ensure()), [b'notice\n'])
@@ -1,5 +1,7 @@
 from copyrite import copyrite
-from copyrite.vcs import ChangeDiff
+from copyrite.vcs import ChangeDiff, Contribution, DiffStat
+
+import pytest
 
 
 def test_is_significant_change():
@@ -10,3 +12,31 @@ def test_is_significant_change():
 
     assert not copyrite.is_significant_change(good_diff,
                                               positive_threshold=4)
+
+
+def test_is_significant_change_from_stats():
+    stats = DiffStat(added=3, removed=0)
+
+    assert copyrite.is_significant_change(stats, positive_threshold=3)
+    assert not copyrite.is_significant_change(stats, positive_threshold=4)
+
+
+def test_contribution_spans_merges_interleaved_authors():
+    contributions = [
+        Contribution(b'John', b'john@xyz.com', 2014, 'a', None),
+        Contribution(b'Mika', b'mika@abc.com', 2015, 'b', None),
+        Contribution(b'John', b'john@xyz.com', 2016, 'c', None),
+        Contribution(b'John', b'john@xyz.com', 2015, 'd', None),
+    ]
+
+    assert copyrite.contribution_spans(contributions) == [
+        (b'John', b'john@xyz.com', [[2014, 2015, 2016]]),
+        (b'Mika', b'mika@abc.com', [[2015]]),
+    ]
+
+
+def test_contribution_spans_reject_years_before_the_epoch():
+    contributions = [Contribution(b'John', b'john@xyz.com', 1969, 'a', None)]
+
+    with pytest.raises(ValueError, match='years before 1970 are not supported: 1969'):
+        copyrite.contribution_spans(contributions)
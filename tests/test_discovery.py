@@ -0,0 +1,42 @@
+import os
+
+from copyrite import discovery
+from copyrite.vcs import git
+from copyrite.vcs import odb
+
+from conftest import _write
+
+import pytest
+
+
+def test_compile_patterns():
+    matcher = discovery.compile_patterns(['*.py', '*/docs/*.rst'])
+
+    assert matcher('pkg/a.py')
+    assert matcher('pkg/docs/index.rst')
+    assert not matcher('pkg/index.rst')
+    assert discovery.compile_patterns([]) is None
+
+
+@pytest.mark.parametrize('backend', [git.GitBackend(), odb.ObjectDatabaseBackend()])
+def test_only_tracked_files_are_found(repository, backend):
+    _write(os.path.join(repository, 'pkg', 'untracked.py'), 'u\n')
+    _write(os.path.join(repository, '.gitignore'), 'ignored.py\n')
+    _write(os.path.join(repository, 'pkg', 'ignored.py'), 'i\n')
+
+    found = discovery.iter_files(repository, backend, discovery.compile_patterns(['*.py']))
+
+    assert sorted(os.path.relpath(path, repository) for path in found) == [
+        os.path.join('pkg', 'b.py'), os.path.join('pkg', 'renamed.py')]
+
+
+def test_walk_skips_the_git_directory(repository):
+    class _Untracked(git.GitBackend):
+        def tracked_files(self, directory):
+            return None
+
+    found = discovery.iter_files(repository, _Untracked(),
+                                 exclude=discovery.compile_patterns(['*/b.py']))
+
+    assert sorted(os.path.relpath(path, repository) for path in found) == [
+        os.path.join('pkg', 'renamed.py')]
@@ -0,0 +1,157 @@
+import os
+import sys
+import threading
+
+import copyrite
+from copyrite import engine
+from copyrite import significance
+from copyrite.vcs import git
+
+import pytest
+
+from conftest import _git, _write
+
+
+@pytest.mark.parametrize('engine_type', sorted(engine.ENGINES))
+def test_engines_compute_the_same_copyrights(repository, engine_type):
+    directory = os.path.join(repository, 'pkg')
+    files = [(directory, filename, os.path.join(directory, filename))
+             for filename in ('b.py', 'renamed.py')]
+    results = {}
+
+    def _callback(filepath, spans):
+        results[os.path.basename(filepath)] = spans
+
+    executor = engine.ENGINES[engine_type](2, (git.GitBackend(), 10, 1, []))
+    executor.run(files, _callback)
+
+    assert results == {
+        'b.py': [(b'John', b'john@xyz.com', [[2014]])],
+        'renamed.py': [(b'John', b'john@xyz.com', [[2014]]),
+                       (b'Mika', b'mika@abc.com', [[2015]]),
+                       (b'Vic', b'vic@abc.com', [[2016]])],
+    }
+
+
+@pytest.mark.parametrize('engine_type', sorted(engine.ENGINES))
+def test_directory_copyrights_are_yielded(repository, engine_type):
+    stats = significance.EvaluationStats()
+
+    results = dict(copyrite.iter_directory_copyrights(
+        repository, git.GitBackend(), jobs=2, engine_type=engine_type, stats=stats))
+
+    assert sorted(os.path.relpath(path, repository) for path in results) == [
+        os.path.join('pkg', 'b.py'), os.path.join('pkg', 'renamed.py')]
+    assert results[os.path.join(repository, 'pkg', 'b.py')] == [
+        (b'John', b'john@xyz.com', [[2014]])]
+    assert stats.fetched + stats.skipped > 0
+
+
+def test_directory_copyrights_from_another_thread(repository):
+    results = []
+
+    def _consume():
+        try:
+            results.extend(copyrite.iter_directory_copyrights(
+                repository, git.GitBackend(), jobs=2, engine_type='asyncio'))
+        except RuntimeError as exc:
+            results.append(exc)
+
+    thread = threading.Thread(target=_consume)
+    thread.start()
+    thread.join()
+
+    if sys.version_info < (3, 8) and os.name == 'posix':
+        # The git processes couldn't be reaped from the loop of that thread.
+        assert len(results) == 1 and isinstance(results[0], RuntimeError)
+    else:
+        assert len(results) == 2
+
+
+class _ClosedGitBackend(git.GitBackend):
+
+    closed = 0
+
+    def close(self):
+        self.closed += 1
+
+
+@pytest.mark.parametrize('engine_type', sorted(engine.ENGINES))
+@pytest.mark.parametrize('backend_type', [_ClosedGitBackend, git.IndexedGitBackend])
+def test_directory_copyrights_see_new_commits(repository, engine_type, backend_type):
+    backend = backend_type(use_cache=True)
+    b_path = os.path.join(repository, 'pkg', 'b.py')
+    results = dict(copyrite.iter_directory_copyrights(repository, backend,
+                                                      engine_type=engine_type))
+    assert results[b_path] == [(b'John', b'john@xyz.com', [[2014]])]
+
+    _write(b_path, 'x\ny\n')
+    _git(repository, 'commit', '-q', '-a', '-m', 'b', name='Mika', mail='mika@abc.com',
+         date='2017-01-01T00:00:00')
+    results = dict(copyrite.iter_directory_copyrights(repository, backend,
+                                                      engine_type=engine_type))
+    assert results[b_path] == [(b'John', b'john@xyz.com', [[2014]]),
+                               (b'Mika', b'mika@abc.com', [[2017]])]
+    if backend_type is _ClosedGitBackend:
+        assert backend.closed == 2
+
+
+@pytest.mark.parametrize('engine_type', sorted(engine.ENGINES))
+def test_engines_bound_the_files_in_flight(repository, engine_type):
+    directory = os.path.join(repository, 'pkg')
+    taken = []
+    taken_at_callbacks = []
+
+    def _files():
+        for index in range(30):
+            taken.append(index)
+            yield directory, 'b.py', '%d.py' % index
+
+    def _callback(filepath, spans):
+        taken_at_callbacks.append(len(taken))
+
+    executor = engine.ENGINES[engine_type](2, (git.GitBackend(), 10, 1, []))
+    executor.run(_files(), _callback)
+
+    in_flight = getattr(executor, 'in_flight', executor.jobs)
+    assert len(taken_at_callbacks) == 30
+    # Each file is taken only once a previous one is done.
+    assert all(count <= in_flight + index + 1
+               for index, count in enumerate(taken_at_callbacks))
+    assert taken_at_callbacks[0] < 30
+
+
+class _SerialEngine(engine.Engine):
+    """Engine which calls back for each file in turn, failing for the missing ones."""
+
+    def run(self, files, callback):
+        for dirpath, filename, filepath in files:
+            if not os.path.exists(filepath):
+                raise FileNotFoundError(filepath)
+            callback(filepath, [])
+
+
+def test_iter_results_stops_with_its_consumer(repository):
+    directory = os.path.join(repository, 'pkg')
+    submitted = []
+
+    def _files():
+        for _ in range(100):
+            submitted.append(True)
+            yield directory, 'b.py', os.path.join(directory, 'b.py')
+
+    results = _SerialEngine(1, ()).iter_results(_files(), maxsize=1)
+    next(results)
+    results.close()
+
+    assert len(submitted) < 100
+
+
+def test_iter_results_raises_the_errors_of_the_engine(repository):
+    results = _SerialEngine(1, ()).iter_results([
+        (repository, 'a.py', os.path.join(repository, 'pkg', 'b.py')),
+        (repository, 'missing.py', os.path.join(repository, 'missing.py'))])
+
+    assert next(results)[0] == os.path.join(repository, 'pkg', 'b.py')
+    with pytest.raises(FileNotFoundError):
+        next(results)
@@ -0,0 +1,255 @@
+import io
+import os
+import subprocess
+import threading
+
+from copyrite import copyrite
+from copyrite import vcs
+from copyrite.vcs import git
+from copyrite.vcs import odb
+
+from conftest import _git
+from conftest import _write
+
+import pytest
+
+
+def _summary(backend, filename, directory):
+    contributions = backend.file_contributions(filename, directory)
+    return [(contribution.author, contribution.mail, contribution.date,
+             backend.contribution_stats(contribution, directory).added)
+            for contribution in contributions]
+
+
+def test_indexed_backend_follows_renames(repository):
+    directory = os.path.join(repository, 'pkg')
+    backend = git.IndexedGitBackend()
+
+    # As for GitBackend, the lines are counted without renames,
+    # so the rename adds the whole file under its new name.
+    assert _summary(backend, 'renamed.py', directory) == [
+        (b'Vic', b'vic@abc.com', 2016, 5),
+        (b'Mika', b'mika@abc.com', 2015, 0),
+        (b'John', b'john@xyz.com', 2014, 0),
+    ]
+    assert _summary(backend, 'b.py', directory) == [
+        (b'John', b'john@xyz.com', 2014, 1),
+    ]
+
+
+def test_indexed_backend_agrees_with_git_backend(repository):
+    directory = os.path.join(repository, 'pkg')
+    indexed = git.IndexedGitBackend().file_contributions('renamed.py', directory)
+    plain = git.GitBackend().file_contributions('renamed.py', directory)
+
+    assert indexed == plain
+
+
+@pytest.mark.parametrize('backend_type', [git.IndexedGitBackend, git.PersistentGitBackend,
+                                          odb.ObjectDatabaseBackend])
+def test_backends_count_the_lines_of_renamed_files_alike(repository, backend_type):
+    _write(os.path.join(repository, 'pkg', 'c.py'), 'c\n' * 20)
+    _git(repository, 'add', '.')
+    _git(repository, 'commit', '-q', '-m', 'c', name='Alice', mail='alice@abc.com')
+    _write(os.path.join(repository, 'pkg', 'c.py'), 'c\n' * 40)
+    _git(repository, 'commit', '-q', '-a', '-m', 'more c', name='Bob', mail='bob@abc.com')
+    _git(repository, 'mv', 'pkg/c.py', 'pkg/d.py')
+    _git(repository, 'commit', '-q', '-m', 'rename c', name='Carol', mail='carol@abc.com')
+    directory = os.path.join(repository, 'pkg')
+    backend = backend_type()
+    try:
+        assert _summary(backend, 'd.py', directory) == \
+            _summary(git.GitBackend(), 'd.py', directory)
+    finally:
+        backend.close()
+
+
+@pytest.mark.parametrize('backend', [git.IndexedGitBackend(), git.GitBackend(use_cache=True)])
+def test_backends_see_new_commits(repository, backend):
+    directory = os.path.join(repository, 'pkg')
+    backend.prepare(directory)
+    assert len(backend.file_contributions('b.py', directory)) == 1
+
+    _write(os.path.join(directory, 'b.py'), 'x\ny\n')
+    _git(repository, 'commit', '-q', '-a', '-m', 'b', name='Mika', mail='mika@abc.com')
+    backend.prepare(directory)
+
+    assert len(backend.file_contributions('b.py', directory)) == 2
+    assert len([key for key in git._HISTORY_INDEXES if key[0] == repository]) <= 1
+
+
+def test_indexed_backend_unknown_file(repository):
+    backend = git.IndexedGitBackend()
+
+    assert backend.file_contributions('missing.py', repository) == []
+
+
+def test_contribution_stats_are_counted(repository):
+    directory = os.path.join(repository, 'pkg')
+    backend = git.GitBackend()
+    contributions = backend.file_contributions('b.py', directory)
+
+    assert [backend.contribution_stats(contribution, directory)
+            for contribution in contributions] == [(1, 0)]
+
+
+def test_contribution_stats_match_changes(repository):
+    directory = os.path.join(repository, 'pkg')
+    backend = git.GitBackend()
+    contribution = backend.file_contributions('b.py', directory)[0]
+
+    changes = backend.contribution_changes(contribution, directory)
+    stats = backend.contribution_stats(contribution, directory)
+    # The diff header (+++ b/pkg/b.py) is counted as a positive line.
+    assert stats.added == len(changes.positive) - 1 == 1
+
+
+def test_cached_backend_reuses_results(repository, monkeypatch):
+    directory = os.path.join(repository, 'pkg')
+    backend = git.GitBackend(use_cache=True)
+    backend.prepare(directory)
+    expected = _summary(backend, 'b.py', directory)
+    # Only HEAD is resolved by a later run, when it is prepared.
+    later = git.GitBackend(use_cache=True)
+    later.prepare(directory)
+
+    def _fail(*args):
+        raise AssertionError('git should not be called')
+
+    monkeypatch.setattr(git.subprocess, 'Popen', _fail)
+    assert _summary(later, 'b.py', directory) == expected
+    assert os.path.exists(os.path.join(repository, '.git', 'copyrite', 'cache.sqlite'))
+
+
+def test_cached_backend_from_another_thread(repository):
+    directory = os.path.join(repository, 'pkg')
+    backend = git.GitBackend(use_cache=True)
+    backend.prepare(directory)
+    expected = _summary(backend, 'b.py', directory)
+    results = []
+
+    thread = threading.Thread(target=lambda: results.append(_summary(backend, 'b.py', directory)))
+    thread.start()
+    thread.join()
+
+    assert results == [expected]
+
+
+def test_changed_files_include_renames(repository):
+    backend = git.GitBackend()
+    first = subprocess.check_output(['git', 'rev-list', '--max-parents=0', 'HEAD'],
+                                    cwd=repository).strip().decode()
+
+    assert backend.changed_files(first, repository) == {'pkg/a.py', 'pkg/renamed.py'}
+    assert backend.changed_files('HEAD', repository) == set()
+    assert backend.changed_files('unknown', repository) is None
+
+
+def test_persistent_backend_agrees_with_git_backend(repository):
+    directory = os.path.join(repository, 'pkg')
+    backend = git.PersistentGitBackend()
+    try:
+        for filename in ('b.py', 'renamed.py'):
+            assert _summary(backend, filename, directory) == \
+                _summary(git.GitBackend(), filename, directory)
+    finally:
+        backend.close()
+    assert not git._PIPES
+
+
+def _merge(repository):
+    path = os.path.join(repository, 'pkg', 'renamed.py')
+    _git(repository, 'checkout', '-q', '-b', 'side')
+    _write(path, 'A\nb\nc\nd\ne\n')
+    _git(repository, 'commit', '-q', '-a', '-m', 'side',
+         name='Bob', mail='bob@abc.com', date='2017-01-01T00:00:00')
+    _git(repository, 'checkout', '-q', '-')
+    _write(path, 'a\nb\nc\nd\nE\n')
+    _git(repository, 'commit', '-q', '-a', '-m', 'main',
+         name='Carol', mail='carol@abc.com', date='2018-01-01T00:00:00')
+    _git(repository, 'merge', '-q', '--no-edit', 'side',
+         name='Alice', mail='alice@abc.com', date='2019-01-01T00:00:00')
+
+
+@pytest.mark.parametrize('packed', [False, True])
+@pytest.mark.parametrize('merged', [False, True])
+def test_object_database_backend_agrees_with_git_backend(repository, packed, merged):
+    if merged:
+        _merge(repository)
+    if packed:
+        _git(repository, 'gc', '-q', '--aggressive')
+    directory = os.path.join(repository, 'pkg')
+    backend = odb.ObjectDatabaseBackend()
+
+    for filename in ('b.py', 'renamed.py', 'missing.py'):
+        assert backend.file_contributions(filename, directory) == \
+            git.GitBackend().file_contributions(filename, directory)
+    assert _summary(backend, 'renamed.py', directory) == \
+        _summary(git.GitBackend(), 'renamed.py', directory)
+    assert backend.revision(repository) == git.GitBackend().revision(repository)
+
+
+def test_object_database_backend_has_its_own_cache(repository, monkeypatch):
+    directory = os.path.join(repository, 'pkg')
+    expected = _summary(git.GitBackend(), 'renamed.py', directory)
+    # Counted differently, so that mixed results would be noticed.
+    monkeypatch.setattr(odb.ObjectDatabaseBackend, 'contribution_changes',
+                        lambda self, contribution, directory: vcs.ChangeDiff([b'+'] * 42, []))
+    backend = odb.ObjectDatabaseBackend(use_cache=True)
+    backend.prepare(directory)
+    _summary(backend, 'renamed.py', directory)
+
+    backend = git.GitBackend(use_cache=True)
+    backend.prepare(directory)
+
+    assert _summary(backend, 'renamed.py', directory) == expected
+
+
+def test_iter_records_across_chunks(monkeypatch):
+    monkeypatch.setattr(git, '_CHUNK_SIZE', 3)
+    stream = io.BytesIO(b'first\nsecond\n\nthird')
+
+    assert list(git._iter_records(stream)) == [b'first', b'second', b'', b'third']
+
+
+def test_parse_log_line():
+    line = b'John\0john@xyz.com\x002014\0deadbeef'
+
+    assert git.GitBackend._parse_log_line(line, 'a.py') == \
+        (b'John', b'john@xyz.com', 2014, 'deadbeef', 'a.py')
+
+
+def test_commit_stats_are_fetched_once_per_commit(repository, monkeypatch):
+    directory = os.path.join(repository, 'pkg')
+    backend = git.GitBackend()
+    fetched = []
+    fetch = backend._fetch_commit_stats
+
+    def _fetch(change, toplevel):
+        fetched.append(change)
+        return fetch(change, toplevel)
+
+    monkeypatch.setattr(backend, '_fetch_commit_stats', _fetch)
+    first = backend.file_contributions('b.py', directory)[0]
+    other = first._replace(filename='renamed.py')
+
+    assert backend.contribution_stats(first, directory) == (1, 0)
+    assert backend.contribution_stats(other, directory) == (0, 0)
+    assert fetched == [first.hash]
+
+
+@pytest.mark.parametrize('backend', [git.GitBackend(), git.IndexedGitBackend(),
+                                     git.PersistentGitBackend()])
+def test_change_threshold_counts_only_the_added_lines(repository, backend):
+    # John added a single line to b.py. The header of the diff, ``+++ b/pkg/b.py``,
+    # used to be counted as well, so a threshold of 2 included him.
+    directory = os.path.join(repository, 'pkg')
+    backend.prepare(directory)
+
+    def _authors(threshold):
+        return [author for author, _, _ in copyrite.file_copyrights(
+            directory, 'b.py', backend, threshold, 10, [])]
+
+    assert _authors(1) == [b'John']
+    assert _authors(2) == []
+    backend.close()
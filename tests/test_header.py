@@ -0,0 +1,68 @@
+from copyrite import cli
+from copyrite import header
+
+import pytest
+
+
+@pytest.mark.parametrize('filename, style', [
+    ('module.py', header.HASH),
+    ('main.GO', header.SLASHES),
+    ('lib.c', header.BLOCK),
+    ('index.html', header.MARKUP),
+    ('query.sql', header.DASHES),
+    ('Makefile', header.HASH),
+])
+def test_comment_style(filename, style):
+    assert header.comment_style(filename) == style
+
+
+def test_detector_stops_at_the_end_of_the_header():
+    detector = header.HeaderDetector(header.default_header_marks(header.HASH))
+    lines = [b'#!/usr/bin/env python\n', b'# Copyright (c) 2014 John\n', b'\n',
+             b'# Copyright 2015 Mika\n', b'import os\n', b'# Copyright 2016 Vic\n']
+
+    assert detector.find(lines) == [1, 3]
+
+
+def test_detector_skips_block_comments():
+    detector = header.detector(tuple(header.default_header_marks(header.BLOCK)), header.BLOCK)
+    lines = [b'/*\n', b' * Some license\n', b' */\n', b'/* Copyright (c) 2014 John */\n',
+             b'int main() {}\n', b'/* Copyright (c) 2015 Mika */\n']
+
+    assert detector.find(lines) == [3]
+
+
+def test_detector_finds_the_notices_inside_block_comments():
+    detector = header.detector(tuple(header.default_header_marks(header.BLOCK)), header.BLOCK)
+    lines = [b'/*\n', b' * Copyright (c) 2015 A\n', b' * Some license\n', b' */\n',
+             b'int main() {}\n', b' * Copyright (c) 2016 B\n']
+
+    assert detector.find(lines) == [1]
+    assert detector.continuation(lines) == b' * '
+    assert detector.continuation([b'/* Copyright (c) 2015 A */\n']) is None
+
+
+@pytest.mark.parametrize('filename', ['lib.c', 'main.js'])
+def test_write_copyrights_inside_block_comments(tmpdir, filename):
+    style = header.comment_style(filename)
+    notice = header.default_copyright_pattern(style) % ('2015-2016', 'A')
+    path = tmpdir.join(filename)
+    path.write_binary(b'/*\n * Copyright (c) 2015 A\n */\nint a;\n')
+
+    assert cli.write_copyrights(str(path), [notice.encode() + b'\n'], process_missing=True)
+    assert path.read_binary() == b'/*\n * Copyright (c) 2015-2016 A\n */\nint a;\n'
+
+
+@pytest.mark.parametrize('filename, body', [
+    ('page.html', b'<!DOCTYPE html>\n<!-- Copyright (c) 2014 John -->\n<html/>\n'),
+    ('main.js', b'// Copyright (c) 2014 John\nvar a;\n'),
+    ('query.sql', b'-- Copyright (c) 2014 John\nSELECT 1;\n'),
+])
+def test_write_copyrights_in_the_style_of_the_file(tmpdir, filename, body):
+    style = header.comment_style(filename)
+    notice = header.default_copyright_pattern(style) % ('2014-2015', 'John')
+    path = tmpdir.join(filename)
+    path.write_binary(body)
+
+    assert cli.write_copyrights(str(path), [notice.encode() + b'\n'])
+    assert path.read_binary() == body.replace(b'2014', b'2014-2015')
@@ -0,0 +1,82 @@
+import os
+
+from copyrite import incremental
+from copyrite import span
+from copyrite import vcs
+
+import pytest
+
+
+class _Backend:
+
+    def __init__(self, changed):
+        self.changed = changed
+
+    def changed_files(self, revision, directory):
+        return self.changed
+
+
+@pytest.fixture
+def state_path(tmpdir):
+    path = str(tmpdir.join('state.json'))
+    state = incremental.IncrementalState(path, 'fingerprint')
+    for name in ('a.py', 'b.py'):
+        state.update(os.path.join('root', name), 'root',
+                     [span.ContributionSpan(b'John', b'', [[2014]])])
+    state.save('deadbeef')
+    return path
+
+
+def test_unchanged_files_are_not_stale(state_path):
+    state = incremental.IncrementalState.load(state_path, 'fingerprint',
+                                              _Backend({'a.py'}), 'root')
+
+    assert state.is_stale(os.path.join('root', 'a.py'), 'root')
+    assert not state.is_stale(os.path.join('root', 'b.py'), 'root')
+    assert state.is_stale(os.path.join('root', 'c.py'), 'root')
+    assert state.spans(os.path.join('root', 'b.py'), 'root') == [
+        span.ContributionSpan(b'John', b'', [[2014]])
+    ]
+
+
+def test_different_fingerprint_discards_state(state_path):
+    state = incremental.IncrementalState.load(state_path, 'other',
+                                              _Backend(set()), 'root')
+
+    assert state.is_stale(os.path.join('root', 'b.py'), 'root')
+
+
+def test_unknown_revision_discards_state(state_path):
+    state = incremental.IncrementalState.load(state_path, 'fingerprint',
+                                              _Backend(None), 'root')
+
+    assert state.is_stale(os.path.join('root', 'b.py'), 'root')
+
+
+def test_missing_state(tmpdir):
+    state = incremental.IncrementalState.load(str(tmpdir.join('missing')), 'fingerprint',
+                                              _Backend(set()), 'root')
+
+    assert state.is_stale(os.path.join('root', 'b.py'), 'root')
+
+
+def test_backends_without_changed_files_discard_state(state_path):
+    class _Untracked(vcs.VCSBackend):
+        executable = None
+        file_contributions = contribution_changes = None
+
+    state = incremental.IncrementalState.load(state_path, 'fingerprint',
+                                              _Untracked(), 'root')
+
+    assert state.is_stale(os.path.join('root', 'b.py'), 'root')
+
+
+def test_files_which_were_not_checked_are_forgotten(state_path):
+    state = incremental.IncrementalState.load(state_path, 'fingerprint',
+                                              _Backend(set()), 'root')
+
+    assert not state.is_stale(os.path.join('root', 'b.py'), 'root')
+    state.retain_checked()
+
+    assert state.is_stale(os.path.join('root', 'a.py'), 'root')
+    assert not state.is_stale(os.path.join('root', 'b.py'), 'root')
@@ -0,0 +1,48 @@
+import io
+import os
+
+from click.testing import CliRunner
+
+from copyrite import cli
+from copyrite import manifest
+from copyrite import span
+
+import pytest
+
+
+def test_entries_round_trip():
+    entry = manifest.Entry('pkg/a.py',
+                           [span.ContributionSpan(b'J\xc3\xa9r\xff', b'j@xyz.com', [[2014, 2015]])],
+                           [b'# Copyright (c) 2014-2015 J\xc3\xa9r\xff <j@xyz.com>\n'])
+    stream = io.StringIO(manifest.dump_entry(entry) + '\n\n')
+
+    assert list(manifest.load_entries(stream)) == [entry]
+
+
+def test_invalid_entries_are_reported():
+    with pytest.raises(ValueError, match='line 2'):
+        list(manifest.load_entries(io.StringIO('{"path": "a.py", "spans": [], "notices": []}\n'
+                                               '{"path": "b.py"}\n')))
+
+
+def test_plan_then_apply(repository, tmpdir):
+    plan = str(tmpdir.join('plan.jsonl'))
+    path = os.path.join(repository, 'pkg', 'b.py')
+    with open(path, 'rb') as stream:
+        original = stream.read()
+    runner = CliRunner()
+
+    result = runner.invoke(cli.main, ['plan', '--backend-type', 'git', '--output', plan, repository])
+    assert result.exit_code == 0, result.output
+    with open(path, 'rb') as stream:
+        assert stream.read() == original
+    with open(plan) as stream:
+        entries = {entry.path: entry for entry in manifest.load_entries(stream)}
+    assert sorted(entries) == ['pkg/b.py', 'pkg/renamed.py']
+    assert entries['pkg/b.py'].notices == [b'# Copyright (c) 2014 John <john@xyz.com>\n']
+
+    result = runner.invoke(cli.main, ['apply', '--process-missing', 'true', plan, repository])
+    assert result.exit_code == 0, result.output
+    assert 'Wrote 2 files' in result.output
+    with open(path, 'rb') as stream:
+        assert stream.read() == b'# Copyright (c) 2014 John <john@xyz.com>\n' + original
@@ -0,0 +1,78 @@
+import json
+import os
+import pickle
+import threading
+
+from click.testing import CliRunner
+
+from copyrite import cli
+from copyrite import engine
+from copyrite import metrics
+from copyrite.vcs import git
+
+import pytest
+
+
+def test_metrics_are_merged():
+    first, second = metrics.Metrics(), metrics.Metrics()
+    with first.timer('history'):
+        pass
+    first.subprocess('log', 0.003)
+    second.subprocess('log', 0.5)
+    second.count('files', 2)
+    for index in range(30):
+        second.file('file%d.py' % index, index)
+
+    first.update(pickle.loads(pickle.dumps(second)))
+    report = first.report()
+
+    assert report['phases']['history']['count'] == 1
+    assert report['subprocesses']['log']['count'] == 2
+    assert report['subprocesses']['log']['max'] == 0.5
+    assert report['subprocesses']['log']['histogram']['<=5ms'] == 1
+    assert report['subprocesses']['log']['histogram']['<=500ms'] == 1
+    assert report['counters'] == {'files': 2}
+    assert [item['path'] for item in report['slowest_files'][:2]] == ['file29.py', 'file28.py']
+    assert len(report['slowest_files']) == 20
+
+
+def test_nothing_is_recorded_by_default():
+    metrics.current().count('files')
+    with metrics.current().timer('history'):
+        pass
+    assert metrics.current().report()['counters'] == {}
+
+    with metrics.activate(metrics.Metrics()) as active:
+        metrics.current().count('files')
+        other_thread = threading.Thread(target=lambda: metrics.current().count('files'))
+        other_thread.start()
+        other_thread.join()
+    assert active.counters['files'] == 1
+    assert metrics.current().report()['counters'] == {}
+
+
+@pytest.mark.parametrize('engine_type', sorted(engine.ENGINES))
+def test_engines_gather_the_metrics_of_the_files(repository, engine_type):
+    directory = os.path.join(repository, 'pkg')
+    files = [(directory, filename, os.path.join(directory, filename))
+             for filename in ('b.py', 'renamed.py')]
+
+    executor = engine.ENGINES[engine_type](2, (git.GitBackend(), 10, 1, []), profile=True)
+    executor.run(files, lambda filepath, spans: None)
+
+    assert executor.metrics.phases['history'].count == 2
+    assert executor.metrics.subprocesses['log'].count == 2
+    assert len(executor.metrics.files) == 2
+
+
+def test_profile_report(repository, tmpdir):
+    report_path = str(tmpdir.join('profile.json'))
+    result = CliRunner().invoke(cli.main, ['--backend-type', 'git', '--profile', report_path,
+                                           os.path.join(repository, 'pkg')])
+    assert result.exit_code == 0, result.output
+
+    with open(report_path) as stream:
+        report = json.load(stream)
+    assert report['counters']['files'] == 2
+    assert {'history', 'format', 'write'} <= set(report['phases'])
+    assert report['wall_time'] > 0
@@ -0,0 +1,42 @@
+import threading
+
+from copyrite import pipeline
+
+import pytest
+
+
+def test_stage_processes_every_item():
+    seen = []
+    lock = threading.Lock()
+
+    def _record(item):
+        with lock:
+            seen.append(item)
+
+    with pipeline.Stage(_record, workers=4, maxsize=2) as stage:
+        for item in range(100):
+            stage.put(item)
+
+    assert sorted(seen) == list(range(100))
+
+
+def test_stages_can_be_chained():
+    results = []
+
+    with pipeline.Stage(results.append) as last:
+        with pipeline.Stage(lambda item: last.put(item * 2)) as first:
+            for item in range(10):
+                first.put(item)
+
+    assert results == [item * 2 for item in range(10)]
+
+
+def test_stage_raises_the_first_error():
+    def _fail(item):
+        raise ValueError(item)
+
+    stage = pipeline.Stage(_fail, workers=2)
+    for item in range(10):
+        stage.put(item)
+    with pytest.raises(ValueError):
+        stage.close()
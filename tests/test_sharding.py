@@ -0,0 +1,90 @@
+from click.testing import CliRunner
+
+from copyrite import cli
+from copyrite import sharding
+
+import pytest
+
+
+def _manifests(paths, count):
+    partitions = [sharding.Partition(sharding.Shard(index, count))
+                  for index in range(1, count + 1)]
+    for partition in partitions:
+        for path in paths:
+            partition.owns(path)
+    return [partition.manifest() for partition in partitions]
+
+
+def test_parse():
+    assert sharding.parse('2/8') == sharding.Shard(2, 8)
+    for text in ('0/4', '5/4', '1', 'a/b'):
+        with pytest.raises(ValueError):
+            sharding.parse(text)
+
+
+def test_shards_are_disjoint_and_stable():
+    paths = ['pkg/module%d.py' % index for index in range(200)]
+    manifests = _manifests(paths, 4)
+
+    assert sorted(path for manifest in manifests for path in manifest['files']) == sorted(paths)
+    assert all(manifest['files'] for manifest in manifests)
+    assert sharding.shard_index('pkg/module1.py', 4) == sharding.shard_index('pkg/module1.py', 4)
+    assert sharding.verify(manifests) == []
+
+
+def test_verify_finds_missing_and_repeated_shards():
+    paths = ['pkg/module%d.py' % index for index in range(60)]
+    first, second, _ = _manifests(paths, 3)
+
+    problems = sharding.verify([first, second, second])
+
+    assert 'shard 3/3 is missing' in problems
+    assert 'shard 2/3 was given 2 times' in problems
+    assert any(problem.endswith('was processed by the shards 2, 2') for problem in problems)
+
+
+def test_digest_does_not_depend_on_the_order_of_discovery():
+    paths = ['pkg/module%d.py' % index for index in range(20)]
+    forward = _manifests(paths, 2)
+    backward = _manifests(paths[::-1], 2)
+
+    assert forward[0]['digest'] == backward[0]['digest'] == sharding._digest(paths)
+    assert forward[0]['discovered'] == 20
+    assert sharding.verify([forward[0], backward[1]]) == []
+
+
+def test_verify_finds_different_checkouts():
+    first, _ = _manifests(['a.py', 'b.py'], 2)
+    _, second = _manifests(['a.py', 'b.py', 'c.py'], 2)
+
+    assert 'the shards discovered different files' in sharding.verify([first, second])
+
+
+def test_verify_compares_the_processed_files():
+    first, second = _manifests(['pkg/module%d.py' % index for index in range(20)], 2)
+    second['files'].pop()
+    first['files'].append('other.py')
+
+    assert sharding.verify([first, second]) == [
+        'the 20 processed files are not the 20 discovered files']
+
+
+def test_shards_cover_the_repository(repository, tmpdir):
+    runner = CliRunner()
+    manifests = []
+    for index in (1, 2):
+        manifest = str(tmpdir.join('shard%d.json' % index))
+        result = runner.invoke(cli.main, [
+            '--backend-type', 'git', '--engine', 'asyncio',
+            '--shard', '%d/2' % index, '--shard-manifest', manifest, repository])
+        assert result.exit_code == 0, result.output
+        manifests.append(manifest)
+
+    merged = str(tmpdir.join('merged.json'))
+    result = runner.invoke(cli.main, ['merge-shards', '--output', merged] + manifests)
+    assert result.exit_code == 0, result.output
+    assert sharding.load_manifest(merged)['files'] == ['pkg/b.py', 'pkg/renamed.py']
+
+    result = runner.invoke(cli.main, ['merge-shards', manifests[0]])
+    assert result.exit_code == 1
+    assert 'shard 2/2 is missing' in result.output
@@ -0,0 +1,58 @@
+import asyncio
+
+from copyrite import significance
+from copyrite.vcs import Contribution, DiffStat
+
+import pytest
+
+
+@pytest.fixture
+def contributions():
+    return [Contribution('John', 'john@xyz.com', 2013 + index, str(index), None)
+            for index in range(3)]
+
+
+def _fetcher(added):
+    fetched = []
+
+    def _fetch(contribution):
+        fetched.append(contribution)
+        return DiffStat(added[int(contribution.hash)], 0)
+    return _fetch, fetched
+
+
+def test_count_policy_never_fetches(contributions):
+    fetch, fetched = _fetcher([0, 0, 0])
+    policy = significance.CountPolicy(10, 3)
+
+    assert policy.is_significant(contributions, fetch)
+    assert not fetched
+
+
+def test_line_policy_stops_at_first_significant_change(contributions):
+    fetch, fetched = _fetcher([1, 20, 30])
+    policy = significance.LinePolicy(10, 1)
+
+    assert policy.is_significant(contributions, fetch)
+    assert fetched == contributions[:2]
+
+
+def test_combined_policy_fetches_only_when_count_is_not_enough(contributions):
+    fetch, fetched = _fetcher([1, 2, 3])
+
+    assert significance.CombinedPolicy(10, 3).is_significant(contributions, fetch)
+    assert not fetched
+
+    assert not significance.CombinedPolicy(10, 4).is_significant(contributions, fetch)
+    assert fetched == contributions
+
+
+def test_async_line_policy(contributions):
+    fetch, fetched = _fetcher([1, 20, 30])
+
+    async def _fetch(contribution):
+        return fetch(contribution)
+
+    policy = significance.LinePolicy(10, 1)
+    assert asyncio.run(policy.ais_significant(contributions, _fetch))
+    assert fetched == contributions[:2]
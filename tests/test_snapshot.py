@@ -0,0 +1,109 @@
+import io
+import os
+import pickle
+
+from click.testing import CliRunner
+
+from copyrite import cli
+from copyrite import vcs
+from copyrite.vcs import index
+from copyrite.vcs import git
+from copyrite.vcs import snapshot
+
+import pytest
+
+
+def _summary(backend, filename, directory):
+    contributions = backend.file_contributions(filename, directory)
+    return [(contribution.author, contribution.mail, contribution.date,
+             contribution.hash, backend.contribution_stats(contribution, directory))
+            for contribution in contributions]
+
+
+def test_snapshot_round_trip(repository):
+    history = git.IndexedGitBackend().history_index(repository)
+    stream = io.BytesIO()
+    assert snapshot.write_snapshot(history, stream) == 2
+
+    stream.seek(0)
+    root, loaded = snapshot.read_snapshot(stream)
+
+    assert root == ''
+
+    assert sorted(loaded.paths()) == ['pkg/b.py', 'pkg/renamed.py']
+    for path in history.paths():
+        assert loaded.contributions(path) == history.contributions(path)
+        for contribution in history.contributions(path):
+            assert (loaded.changes(contribution.hash, path)
+                    == history.changes(contribution.hash, path))
+
+
+def test_snapshot_backend_replays_without_repository(repository, tmpdir):
+    directory = os.path.join(repository, 'pkg')
+    output = str(tmpdir.join('history.snapshot'))
+    with open(output, 'wb') as stream:
+        assert snapshot.take_snapshot(directory, stream) == 2
+
+    expected = _summary(git.IndexedGitBackend(), 'renamed.py', directory)
+    os.rename(os.path.join(repository, '.git'), os.path.join(repository, 'moved'))
+
+    backend = snapshot.SnapshotBackend(output)
+    backend.prepare(directory)
+    # The backend is sent to the worker processes after being prepared.
+    backend = pickle.loads(pickle.dumps(backend))
+    assert _summary(backend, 'renamed.py', directory) == expected
+    assert _summary(backend, 'missing.py', directory) == []
+
+
+def test_snapshot_with_empty_strings():
+    history = index.HistoryIndex()
+    history.record(vcs.Contribution(b'', b'', 2014, 'ab' * 20, None), 'a.py', 1, 0)
+    stream = io.BytesIO()
+    snapshot.write_snapshot(history, stream)
+
+    stream.seek(0)
+    _, loaded = snapshot.read_snapshot(stream)
+
+    assert loaded.contributions('a.py') == history.contributions('a.py')
+
+
+def test_snapshot_backend_rebases_the_paths(repository, tmpdir):
+    output = str(tmpdir.join('history.snapshot'))
+    with open(output, 'wb') as stream:
+        snapshot.take_snapshot(os.path.join(repository, 'pkg'), stream)
+    expected = _summary(git.IndexedGitBackend(), 'renamed.py', os.path.join(repository, 'pkg'))
+
+    backend = snapshot.SnapshotBackend(output)
+    backend.prepare(repository)
+    assert backend.tracked_files(repository) == ['pkg/b.py', 'pkg/renamed.py']
+    assert _summary(backend, os.path.join('pkg', 'renamed.py'), repository) == expected
+
+    os.mkdir(os.path.join(repository, 'other'))
+    with pytest.raises(ValueError):
+        backend.prepare(os.path.join(repository, 'other'))
+
+
+def test_snapshot_rejects_other_files():
+    with pytest.raises(ValueError):
+        snapshot.read_snapshot(io.BytesIO(b'not a snapshot at all'))
+
+
+def test_snapshot_command(repository, tmpdir):
+    directory = os.path.join(repository, 'pkg')
+    output = str(tmpdir.join('history.snapshot'))
+    runner = CliRunner()
+
+    result = runner.invoke(cli.main, ['snapshot', '--output', output, directory])
+    assert result.exit_code == 0, result.output
+
+    result = runner.invoke(cli.main, ['--backend-type', 'snapshot', '--snapshot', output,
+                                      '--process-missing', 'true', directory])
+    assert result.exit_code == 0, result.output
+    with open(os.path.join(directory, 'renamed.py'), 'rb') as stream:
+        assert stream.readline() == b'# Copyright (c) 2014 John <john@xyz.com>\n'
+
+    result = runner.invoke(cli.main, ['--backend-type', 'snapshot', directory])
+    assert result.exit_code != 0
+    result = runner.invoke(cli.main, ['--backend-type', 'snapshot', '--snapshot', output,
+                                      '--cache', directory])
+    assert result.exit_code != 0
@@ -36,3 +36,24 @@ def test_format_span_copyright_header():
     assert formatted == copyright_header.encode() % (
         b"2001, 2005-2008", b"test <something>"
     )
+
+
+def test_year_set_runs():
+    years = span.YearSet.from_years([2008, 2001, 2005, 2002, 2006, 2007, 2001])
+
+    assert list(years.runs()) == [(2001, 2002), (2005, 2008)]
+    assert years.spans() == [[2001, 2002], [2005, 2006, 2007, 2008]]
+    assert years.first == 2001
+    assert years == [[2001, 2002], [2005, 2006, 2007, 2008]]
+    assert years != [[2001]]
+    assert span.YearSet.from_spans(years.spans()) == years
+
+
+def test_serializable_round_trip():
+    contribution_span = span.ContributionSpan(
+        b'test \xff', b'something', span.YearSet.from_years([2001, 2003, 2004]))
+
+    data = span.to_serializable(contribution_span)
+
+    assert data[2] == [[2001], [2003, 2004]]
+    assert span.from_serializable(data) == contribution_span
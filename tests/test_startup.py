@@ -0,0 +1,64 @@
+import os
+import subprocess
+import sys
+
+from copyrite import alias
+from copyrite import cli
+from copyrite import engine
+
+import jsonschema
+import pytest
+
+
+# Modules which are slow to import and which are needed only by some runs.
+# uuid isn't among them, since click imports it.
+_LAZY_MODULES = {'jsonschema', 'asyncio', 'concurrent.futures', 'multiprocessing',
+                 'copyrite.vcs.odb', 'sqlite3', 'hashlib',
+                 'copyrite.engine', 'copyrite.incremental', 'copyrite.sharding',
+                 'copyrite.manifest', 'copyrite.pipeline', 'copyrite.vcs.snapshot'}
+# How long importing copyrite.cli can take, click included, in milliseconds.
+# It takes about 75ms on a development machine, the budget leaving room
+# for slower ones. benchmarks/suite.py compares it with a baseline instead.
+_STARTUP_BUDGET_MS = 250
+
+
+def _import_times(module):
+    """Get the cumulative import time of every module imported by *module*, in us."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+                             stderr=subprocess.PIPE, env=env, check=True)
+    times = {}
+    for line in process.stderr.decode().splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason='-X importtime needs Python 3.7')
+def test_cli_startup_imports():
+    times = _import_times('copyrite.cli')
+
+    assert 'copyrite.cli' in times
+    assert not _LAZY_MODULES & set(times)
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason='-X importtime needs Python 3.7')
+def test_cli_startup_time():
+    # The best of a few runs, since the first one might find cold caches.
+    best = min(_import_times('copyrite.cli')['copyrite.cli'] for _ in range(3))
+
+    assert best / 1000 < _STARTUP_BUDGET_MS
+
+
+def test_engine_types_are_the_known_engines():
+    # pylint: disable=protected-access
+    assert sorted(cli._ENGINE_TYPES) == sorted(engine.ENGINES)
+
+
+def test_alias_validator_is_built_once():
+    # pylint: disable=protected-access
+    assert alias._alias_validator() is alias._alias_validator()
+    with pytest.raises(jsonschema.ValidationError):
+        alias.build_from_json([{'name': 'missing mails'}])